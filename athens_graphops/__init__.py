@@ -13,15 +13,31 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-import os
+from typing import Any
 
-from .dataset import CORPUS_DATA, CORPUS_SCHEMA, BATTERY_TABLE, MOTOR_TABLE, PROPELLER_TABLE
+import os
 
 # these can be overwritten in __main__
 CONFIG = {
     "hostname": "localhost",
     # "hostname": "laplace.isis.vanderbilt.edu",
     "timeout": 30,
+    # number of design operations sent in one request, 0 disables batching
+    "batch_size": 0,
+    # a batch is flushed once its script grows over this many bytes, the
+    # gremlin server rejects requests over maxContentLength (65536 bytes by
+    # default), so this leaves room for the last operation and the bindings
+    "batch_bytes": 48 * 1024,
+    # number of idle connections kept open per host for reuse
+    "pool_size": 4,
+    # designs are created in memory instead of the graph database
+    "offline": False,
+    # the result sizes of the submitted scripts are measured for the statistics
+    "stats": False,
+    # the submitted scripts are recorded into this json lines file
+    "record": None,
+    # the tracing spans are written into this chrome trace json file
+    "trace": None,
     "script_dirs": [
         '.',
         os.path.abspath(os.path.join(os.path.dirname(__file__), 'scripts')),
@@ -44,3 +60,13 @@ CONFIG = {
     "miniobucket": "symbench",
     "miniodir": "C:\\NewDeploy\\minioData"
 }
+
+
+def __getattr__(name: str) -> Any:
+    # the corpus is only loaded when it is first used
+    if name in ["CORPUS_DATA", "CORPUS_INDEX", "CORPUS_SCHEMA",
+                "BATTERY_TABLE", "MOTOR_TABLE", "PROPELLER_TABLE"]:
+        from . import dataset
+        return getattr(dataset, name)
+    raise AttributeError(
+        "module {} has no attribute {}".format(__name__, name))
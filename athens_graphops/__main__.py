@@ -14,36 +14,54 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+from typing import List
+
 import argparse
+import atexit
+import importlib
 import sys
 
 from . import CONFIG
-from . import export
-from . import dataset
-from . import query
-from . import validate
-from . import platform
-from . import workflow
-from . import json_designer
+
+# subcommand -> (module, function), the module is imported only when the
+# subcommand is executed, so each command loads only what it needs
+COMMANDS = {
+    "autograph": ("export", "run_autograph"),
+    "autoseed": ("export", "run_autoseed"),
+    "benchmark": ("benchmark", "run"),
+    "dataset": ("dataset", "run"),
+    "query": ("query", "run"),
+    "replay": ("replay", "run"),
+    "results": ("result_store", "run"),
+    "validate": ("validate", "run"),
+    "json-designer": ("json_designer", "run"),
+    "platform": ("platform", "run"),
+    "workflow": ("workflow", "run"),
+    "update": ("export", "run_update_design"),
+}
+
+
+def import_command(command: str):
+    module, function = COMMANDS[command]
+    module = importlib.import_module("." + module, __package__)
+    return getattr(module, function)
+
+
+def command_position(argv: List[str]) -> int:
+    """
+    Returns the position after the subcommand, the remaining arguments
+    (which may contain other command names) belong to the subcommand.
+    """
+    for pos, arg in enumerate(argv):
+        if pos > 0 and arg in COMMANDS:
+            return pos + 1
+    return len(argv)
 
 
 def run():
     # hack the subcommands
-    commands = [
-        "autograph",
-        "autoseed",
-        "dataset",
-        "query",
-        "validate",
-        "json-designer",
-        "platform",
-        "workflow",
-        "update",
-    ]
-    pos = len(sys.argv)
-    for cmd in commands:
-        if cmd in sys.argv:
-            pos = sys.argv.index(cmd) + 1
+    commands = list(COMMANDS)
+    pos = command_position(sys.argv)
 
     parser = argparse.ArgumentParser(
         formatter_class=argparse.ArgumentDefaultsHelpFormatter)
@@ -51,6 +69,14 @@ def run():
                         help="sets the host address of the gremlin database")
     parser.add_argument('--timeout', type=float, metavar='SEC',
                         help="sets the timeout in seconds for each query")
+    parser.add_argument('--batch-size', type=int, metavar='NUM',
+                        help="sends design operations in batches of this size")
+    parser.add_argument('--record', type=str, metavar='FILE',
+                        help="records the submitted scripts into a json lines trace file")
+    parser.add_argument('--stats', action='store_true',
+                        help="prints the count, latency and result size of the submitted scripts at exit")
+    parser.add_argument('--trace', type=str, metavar='FILE',
+                        help="writes the timeline of the run into a chrome trace json file")
     parser.add_argument('--jenkinsuser', type=str, metavar='user',
                         help="sets the Jenkins username for workflow runs")
     parser.add_argument('--jenkinspwd', type=str, metavar='pwd',
@@ -80,6 +106,19 @@ def run():
         CONFIG["hostname"] = args.host
     if args.timeout:
         CONFIG["timeout"] = args.timeout
+    if args.batch_size:
+        CONFIG["batch_size"] = args.batch_size
+    if args.record:
+        CONFIG["record"] = args.record
+    if args.trace:
+        CONFIG["trace"] = args.trace
+        from .tracing import write_trace
+        atexit.register(write_trace)
+    if args.stats:
+        CONFIG["stats"] = True
+        # imported only here, since it loads the gremlin driver
+        from .query import print_stats
+        atexit.register(print_stats)
     if args.jenkinsuser:
         CONFIG["jenkinsuser"] = args.jenkinsuser
     if args.jenkinspwd:
@@ -96,24 +135,8 @@ def run():
     if args.aws:
         CONFIG["miniodir"] = "//opt//minio"
 
-    if args.command == "query":
-        query.run(args=sys.argv[pos:])
-    elif args.command == "validate":
-        validate.run(args=sys.argv[pos:])
-    elif args.command == "autograph":
-        export.run_autograph(args=sys.argv[pos:])
-    elif args.command == "autoseed":
-        export.run_autoseed(args=sys.argv[pos:])
-    elif args.command == "dataset":
-        dataset.run(args=sys.argv[pos:])
-    elif args.command == "json-designer":
-        json_designer.run(args=sys.argv[pos:])
-    elif args.command == "platform":
-        platform.run(args=sys.argv[pos:])
-    elif args.command == "workflow":
-        workflow.run(args=sys.argv[pos:])
-    elif args.command == "update":
-        export.run_update_design(args=sys.argv[pos:])
+    if args.command in COMMANDS:
+        import_command(args.command)(args=sys.argv[pos:])
     else:
         parser.print_help()
 
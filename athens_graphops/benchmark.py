@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# Copyright (C) 2022, Miklos Maroti
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#===============================================================================
+# Benchmarks that track the performance of the command line tool
+
+
+from typing import Dict, List, Optional
+
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+STARTUP_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+from athens_graphops.__main__ import import_command
+import_command(sys.argv[1])
+print(time.perf_counter() - start)
+"""
+
+
+def startup_times(commands: Optional[List[str]] = None,
+                  repeat: int = 5) -> Dict[str, Dict[str, float]]:
+    """
+    Measures the time it takes to import the modules of each subcommand in
+    a fresh interpreter, and the wall clock time of the whole process.
+    Returns the median times in milliseconds for each command.
+    """
+    from .__main__ import COMMANDS
+    if commands is None:
+        commands = [cmd for cmd in COMMANDS if cmd != "benchmark"]
+
+    results = dict()
+    for command in commands:
+        imports = []
+        totals = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            output = subprocess.run(
+                [sys.executable, "-c", STARTUP_SCRIPT, command],
+                check=True, stdout=subprocess.PIPE, universal_newlines=True)
+            totals.append(time.perf_counter() - start)
+            imports.append(float(output.stdout.split()[-1]))
+
+        results[command] = {
+            "import_ms": statistics.median(imports) * 1000,
+            "process_ms": statistics.median(totals) * 1000,
+        }
+    return results
+
+
+def design_times(designs: Optional[List[str]] = None,
+                 repeat: int = 5) -> Dict[str, Dict[str, float]]:
+    """
+    Measures the time of creating the given (or all) platform designs with
+    the Designer on the in-memory stand-in of the graph database, so the
+    design writing code paths are measured without a server. Returns the
+    median times in milliseconds and the size of each design.
+    """
+    import contextlib
+    import io
+
+    from . import CONFIG
+    from .offline import DESIGNS
+    from .platform import __discover_designs as discover_designs
+
+    platform_designs = discover_designs()
+    if designs is None:
+        designs = sorted(name for name in platform_designs
+                         if name != "random_design")
+
+    hostname = CONFIG["hostname"]
+    CONFIG["hostname"] = "memory"
+    try:
+        results = dict()
+        for design in designs:
+            times = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    design_name = platform_designs[design]()[0]
+                times.append(time.perf_counter() - start)
+
+            data = DESIGNS.pop(design_name)
+            results[design] = {
+                "design_ms": statistics.median(times) * 1000,
+                "instances": len(data.instances),
+                "connections": len(data.connections) // 2,
+            }
+    finally:
+        CONFIG["hostname"] = hostname
+    return results
+
+
+def run(args=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('--startup', metavar='CMD', nargs='*',
+                        help="measures the import time of the given (or all) subcommands")
+    parser.add_argument('--designs', metavar='NAME', nargs='*',
+                        help="measures the creation of the given (or all) platform designs in memory")
+    parser.add_argument('--repeat', type=int, metavar='NUM', default=5,
+                        help="number of measurements to take the median of")
+    parser.add_argument('--output', metavar='FILE',
+                        help="saves the results as json to this file")
+    args = parser.parse_args(args)
+
+    results = dict()
+    if args.startup is not None:
+        results["startup"] = startup_times(
+            args.startup or None, repeat=args.repeat)
+        print("{:20} {:>10} {:>10}".format("command", "import ms", "total ms"))
+        for command, times in results["startup"].items():
+            print("{:20} {:10.1f} {:10.1f}".format(
+                command, times["import_ms"], times["process_ms"]))
+
+    if args.designs is not None:
+        results["designs"] = design_times(
+            args.designs or None, repeat=args.repeat)
+        print("{:30} {:>10} {:>10} {:>12}".format(
+            "design", "design ms", "instances", "connections"))
+        for design, times in results["designs"].items():
+            print("{:30} {:10.1f} {:10} {:12}".format(
+                design, times["design_ms"], times["instances"], times["connections"]))
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    run()
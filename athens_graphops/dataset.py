@@ -18,44 +18,227 @@
 # These functions relate to pulling information from the corpus data information
 # and randomizing the data/components
 
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
 import json
 import os
+import pickle
 import random
 import copy
 
+import numpy as np
+
 DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+CACHE_DIR = os.path.join(
+    os.environ.get("XDG_CACHE_HOME",
+                   os.path.join(os.path.expanduser("~"), ".cache")),
+    "athens_graphops")
 
 
 def load_json(filename: str) -> Any:
+    """
+    Loads a json file from the data directory. The parsed content is also
+    pickled into the cache directory and reused as long as the size and
+    modification time of the json file do not change.
+    """
     try:
-        with open(os.path.join(DATA_DIR, filename), 'r') as file:
-            return json.load(file)
+        filepath = os.path.join(DATA_DIR, filename)
+        stat = os.stat(filepath)
+        key = (filename, stat.st_size, stat.st_mtime_ns)
+        cachepath = os.path.join(
+            CACHE_DIR, os.path.splitext(filename)[0] + ".pickle")
+
+        try:
+            with open(cachepath, 'rb') as file:
+                cached_key, data = pickle.load(file)
+            if cached_key == key:
+                return data
+        except Exception:
+            pass
+
+        with open(filepath, 'r') as file:
+            data = json.load(file)
+
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            temppath = "{}.{}".format(cachepath, os.getpid())
+            with open(temppath, 'wb') as file:
+                pickle.dump((key, data), file, pickle.HIGHEST_PROTOCOL)
+            os.replace(temppath, cachepath)
+        except OSError:
+            pass
+
+        return data
     except:
         print("failed to load %s" % filename)
         return []
 
 
-CORPUS_DATA = load_json('corpus_data.json')
-CORPUS_SCHEMA = load_json('corpus_schema.json')
-NACA_DATA = load_json('aero_info.json')
+# The corpus is loaded on first access of these module attributes, so
+# commands that do not need it do not pay for parsing it.
+LAZY_DATA = {
+    "CORPUS_DATA": lambda: load_json('corpus_data.json'),
+    "CORPUS_SCHEMA": lambda: load_json('corpus_schema.json'),
+    "NACA_DATA": lambda: load_json('aero_info.json'),
+    "CORPUS_INDEX": lambda: CorpusIndex(lazy_data("CORPUS_DATA")),
+    "TYPED_CORPUS": lambda: [TypedModel(data, lazy_data("CORPUS_SCHEMA"))
+                             for data in lazy_data("CORPUS_DATA")],
+    "TYPED_MODELS": lambda: typed_models(lazy_data("TYPED_CORPUS")),
+    "BATTERY_TABLE": lambda: property_table("Battery"),
+    "MOTOR_TABLE": lambda: property_table("Motor"),
+    "PROPELLER_TABLE": lambda: property_table("Propeller"),
+}
+
+
+def lazy_data(name: str) -> Any:
+    if name not in globals():
+        globals()[name] = LAZY_DATA[name]()
+    return globals()[name]
+
+
+def __getattr__(name: str) -> Any:
+    if name in LAZY_DATA:
+        return lazy_data(name)
+    raise AttributeError(
+        "module {} has no attribute {}".format(__name__, name))
+
+
+class CorpusIndex():
+    """
+    Hash based lookups of corpus models by model name, by class and by
+    (class, model) pairs. Secondary indexes on properties (for example
+    the SHAFT_DIAMETER of motors) are built on first use. When a model
+    name appears more than once, the first entry wins, as with a linear
+    scan of the corpus.
+    """
+
+    def __init__(self, corpus: List[Dict[str, Any]]):
+        self.models = dict()
+        self.classes = dict()
+        self.class_models = dict()
+        self.property_indexes = dict()
+
+        for data in corpus:
+            self.models.setdefault(data["model"], data)
+            self.classes.setdefault(data["class"], []).append(data)
+            self.class_models.setdefault((data["class"], data["model"]), data)
+
+    def get_model(self, model: str) -> Optional[Dict[str, Any]]:
+        return self.models.get(model)
+
+    def get_class(self, classification: str) -> List[Dict[str, Any]]:
+        return self.classes.get(classification, [])
+
+    def get_class_model(self, classification: str, model: str) -> Optional[Dict[str, Any]]:
+        return self.class_models.get((classification, model))
+
+    def property_index(self, classification: str, prop: str) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Returns the models of the given class grouped by the value of the
+        given property, in corpus order. Models without the property are
+        left out.
+        """
+        key = (classification, prop)
+        if key not in self.property_indexes:
+            index = dict()
+            for data in self.get_class(classification):
+                if prop in data["properties"]:
+                    index.setdefault(data["properties"][prop], []).append(data)
+            self.property_indexes[key] = index
+        return self.property_indexes[key]
+
+    def with_property(self, classification: str, prop: str, value: str) -> List[Dict[str, Any]]:
+        return self.property_index(classification, prop).get(value, [])
+
+
+def convert_value(value: Any, value_type: str) -> Any:
+    """
+    Converts a corpus value to the given schema type ("float", "int" or
+    "str"). Returns the original value if that is not possible.
+    """
+    try:
+        if value_type == "float":
+            return float(value)
+        elif value_type == "int":
+            return int(value)
+    except (TypeError, ValueError):
+        pass
+    return value
+
+
+class TypedModel():
+    """
+    The properties and parameters (assigned, minimum and maximum values)
+    of a corpus model converted once to the types of the corpus schema.
+    Parameters missing from the schema are treated as floats, properties
+    as strings. Values that do not match their schema type are kept as
+    strings and their names are collected in invalid.
+    """
+
+    def __init__(self, data: Dict[str, Any], schema: Dict[str, Any]):
+        self.data = data
+        self.model = data["model"]
+        self.classification = data["class"]
+        self.invalid = []
+
+        model_class = schema.get(self.classification, {})
+        if self.classification == "Battery" and model_class:
+            corpus = data["properties"].get("CORPUS")
+            model_class = model_class["UAV" if corpus == "UAV" else "UAM"]
+        prop_types = model_class.get("properties", {})
+        param_types = model_class.get("parameters", {})
+
+        self.properties = dict()
+        for name, value in data["properties"].items():
+            self.properties[name] = self.convert(
+                name, value, prop_types.get(name), "str")
+
+        self.parameters = dict()
+        for name, fields in data["parameters"].items():
+            self.parameters[name] = {
+                field: self.convert(name, value, param_types.get(name), "float")
+                for field, value in fields.items()}
+
+    def convert(self, name: str, value: Any, value_type: Optional[str],
+                default_type: str) -> Any:
+        converted = convert_value(value, value_type or default_type)
+        if value_type not in [None, "str"] and converted is value \
+                and name not in self.invalid:
+            self.invalid.append(name)
+        return converted
+
+    def get_property(self, prop: str) -> Any:
+        return self.properties[prop]
+
+    def get_parameter(self, param: str, field: str = "assigned") -> Any:
+        return self.parameters[param][field]
+
+
+def typed_models(typed_corpus: List[TypedModel]) -> Dict[str, TypedModel]:
+    models = dict()
+    for typed in typed_corpus:
+        models.setdefault(typed.model, typed)
+    return models
+
+
+def get_typed_model(model: str, classification: Optional[str] = None) -> TypedModel:
+    typed = lazy_data("TYPED_MODELS").get(model)
+    if typed is None or (classification is not None and
+                         typed.classification != classification):
+        raise ValueError("unknown model name " + model)
+    return typed
 
 
 def get_model_data(model: str) -> Dict[str, Any]:
-    for data in CORPUS_DATA:
-        if data["model"] == model:
-            return data
-    else:
+    data = lazy_data("CORPUS_INDEX").get_model(model)
+    if data is None:
         raise ValueError("unknown model name " + model)
+    return data
 
 
 def property_table(classification: str) -> List[Dict[str, Any]]:
     result = []
-    for mod in CORPUS_DATA:
-        if mod["class"] != classification:
-            continue
-
+    for mod in lazy_data("CORPUS_INDEX").get_class(classification):
         entry = dict(mod["properties"])
         #assert "MODEL" not in entry or entry["MODEL"] == mod["model"]
         if "MODEL" not in entry:
@@ -71,22 +254,38 @@ def property_table(classification: str) -> List[Dict[str, Any]]:
     return result
 
 
-BATTERY_TABLE = property_table("Battery")
-MOTOR_TABLE = property_table("Motor")
-PROPELLER_TABLE = property_table("Propeller")
+COMPONENT_TABLES = dict()
+
+
+def component_table(classification: str) -> 'ComponentTable':
+    """
+    Returns the columnar table of the numeric properties of the models of
+    the given class, built on first use.
+    """
+    if classification not in COMPONENT_TABLES:
+        from .tables import ComponentTable
+        typed_models = [typed for typed in lazy_data("TYPED_CORPUS")
+                        if typed.classification == classification]
+        COMPONENT_TABLES[classification] = ComponentTable.from_typed(
+            classification, typed_models)
+    return COMPONENT_TABLES[classification]
 
 
-def get_component_parameters(classification: str, model: str) -> List[str]:
+def get_component_parameters(classification: str, model: str, typed: bool = False) -> List[str]:
     """
-    Return the parameter list for the component specified given the parameter name
+    Return the parameter list for the component specified given the parameter name.
+    With typed set the values are already converted to their schema types.
     """
     result = []
-    for mod in CORPUS_DATA:
-        if (mod["class"] == classification) and (mod["model"] == model):
-            entry = dict(mod["parameters"])
-            result.append(entry)
-            # print(mod["model"])
-            break
+    mod = lazy_data("CORPUS_INDEX").get_class_model(classification, model)
+    if mod is not None:
+        if typed:
+            params = get_typed_model(model, classification).parameters
+        else:
+            params = mod["parameters"]
+        # copy the fields, so randomizing them leaves the corpus intact
+        entry = {name: dict(fields) for name, fields in params.items()}
+        result.append(entry)
 
     if len(result) == 0:
         print("Model {} (class {}) is not a component of the corpus data!".format(
@@ -101,31 +300,33 @@ def random_component_selection(classification: str) -> str:
 
     Example usage:
         battery_model = random_component_selection("Battery")
-    """
-    if classification == "Battery":
-        select_table = BATTERY_TABLE
-    elif classification == "Motor":
-        select_table = MOTOR_TABLE
-    elif classification == "Propeller":
-        select_table = PROPELLER_TABLE
-    else:
-        print("Only classifications available for random selection are Battery, Motor and Propeller")
 
-    assert select_table
-    selected_component = random.choice(select_table)
+    Batteries are selected only from the UAM batteries of BATTERY_TABLE
+    (the UAV batteries have a MODEL property and are left out of it).
 
-    # print(selected_component)
+    To select from a subset, filter the component table first:
+        props = component_table("Propeller")
+        prop_model = props.between("DIAMETER", 300, 500).random_model()
+    """
+    select_table = component_table(classification)
+    if classification == "Battery":
+        select_table = select_table.restrict(
+            entry["MODEL"] for entry in lazy_data("BATTERY_TABLE"))
+    if len(select_table) == 0:
+        print("No models of classification {} are available for random selection".format(
+            classification))
 
-    return selected_component["MODEL"]
+    assert len(select_table) > 0
+    return select_table.random_model()
 
 
 def get_component_min_max(classification: str, component_model: str, parameter: str, max_multiply_factor=1) -> Any:
     """
     Pull the min/max value from the corpus_data.json file for the specific classification/component model
     """
-    params = get_component_parameters(classification, component_model)
-    selected_params = params[0]
-    #print("Component Parmeters: {}".format(params))
+    selected_params = get_typed_model(
+        component_model, classification).parameters
+    #print("Component Parmeters: {}".format(selected_params))
     #print("Parameter desired: {}".format(parameter))
 
     if parameter in selected_params:
@@ -133,23 +334,22 @@ def get_component_min_max(classification: str, component_model: str, parameter:
         desired_param = selected_params[parameter]
         #print("Retrieved parameter: {}".format(desired_param))
         if 'minimum' in desired_param:
-            min_value = float(desired_param["minimum"])
+            min_value = desired_param["minimum"]
             if 'maximum' in desired_param:
-                max_value = float(desired_param["maximum"])
+                max_value = desired_param["maximum"]
             else:
-                max_value = float(
-                    desired_param["assigned"]) * max_multiply_factor
+                max_value = desired_param["assigned"] * max_multiply_factor
                 print("{} does not have a maximum value, set max to {}".format(
                     component_model, max_value))
         else:
             if parameter == "LENGTH":
                 min_value = 1.0
-                max_value = float(desired_param["assigned"])
+                max_value = desired_param["assigned"]
                 print("{} does not have a minimum value, set min to 1.0 and max to {}".format(
                     component_model, max_value))
             else:
-                min_value = float(desired_param["assigned"])
-                max_value = float(desired_param["assigned"])
+                min_value = desired_param["assigned"]
+                max_value = desired_param["assigned"]
                 print(
                     "{} does not have a minimum value, set min/max to {}".format(component_model, min_value))
 
@@ -158,7 +358,12 @@ def get_component_min_max(classification: str, component_model: str, parameter:
     return min_value, max_value
 
 
-def randomize_parameters(component_params: List[Dict[str, Any]]) -> Dict[str, Any]:
+def as_float(value: Any) -> float:
+    return value if isinstance(value, float) else float(value)
+
+
+def randomize_parameters(component_params: List[Dict[str, Any]],
+                         rng: Optional[np.random.Generator] = None) -> Dict[str, Any]:
     """
     Randomize the parameter values.  If no maximum is specified, arbritarily
     create one by using a multiplication factor (max_multiply_factor).
@@ -173,44 +378,55 @@ def randomize_parameters(component_params: List[Dict[str, Any]]) -> Dict[str, An
         * NACA_Port_Connector: BOTTOM_CONNECTION_DISP
         * Wing: NACA_Profile
 
+    The parameters can be typed (see get_component_parameters), then the
+    values are not parsed again and the result is typed as well. All values
+    are drawn at once from the given numpy Generator, pass a seeded one
+    (see platform.randomize_design.spawn_generators) for reproducible results.
+
     Example usage:  
         # Randomize wing parameters
         wing_params = get_component_parameters("Wing", "naca_wing")
-        rand_wing_params = randomize_parameters(wing_params)
+        rand_wing_params = randomize_parameters(wing_params, np.random.default_rng(1))
         wing_chord = round(float(rand_wing_params[0]["CHORD_1"]["assigned"]))
         wing_span = round(float(rand_wing_params[0]["SPAN"]["assigned"]))
         wing_load = round(float(rand_wing_params[0]["LOAD"]["assigned"]))
     """
-    max_multiply_factor = 2
-    for key in component_params[0]:
-        # print(key)
-        # print("Original Value: %s" % component_params[0][key]["assigned"])
+    if rng is None:
+        rng = np.random.default_rng()
 
-        if 'minimum' not in component_params[0][key]:
+    max_multiply_factor = 2
+    keys = list(component_params[0])
+    low = np.empty(len(keys))
+    high = np.empty(len(keys))
+    for index, key in enumerate(keys):
+        fields = component_params[0][key]
+        if 'minimum' not in fields:
             if key == "LENGTH":
-                min_value = 1
-                max_value = float(
-                    component_params[0][key]["assigned"])
+                low[index] = 1
+                high[index] = as_float(fields["assigned"])
             else:
-                min_value = float(component_params[0][key]["assigned"])
-                max_value = float(component_params[0][key]["assigned"])
+                low[index] = as_float(fields["assigned"])
+                high[index] = as_float(fields["assigned"])
         else:
-            min_value = float(component_params[0][key]["minimum"])
-            if 'maximum' in component_params[0][key]:
-                max_value = float(component_params[0][key]["maximum"])
+            low[index] = as_float(fields["minimum"])
+            if 'maximum' in fields:
+                high[index] = as_float(fields["maximum"])
             else:
-                max_value = float(
-                    component_params[0][key]["assigned"]) * max_multiply_factor
-
-        # Note that some component parameters have a "minimum" value of 1, yet the
-        # assigned is 0.  So the max value in this case will be 0.
-        if (max_value == 0 and (min_value > max_value)):
-            rand_param = float(component_params[0][key]["assigned"])
+                high[index] = as_float(fields["assigned"]) * max_multiply_factor
+
+    # Note that some component parameters have a "minimum" value of 1, yet the
+    # assigned is 0.  So the max value in this case will be 0.
+    keep = (high == 0) & (low > high)
+    # like random.uniform, the bounds may come in either order
+    values = rng.uniform(np.minimum(low, high), np.maximum(low, high))
+
+    for key, value, kept in zip(keys, values.tolist(), keep):
+        fields = component_params[0][key]
+        rand_param = as_float(fields["assigned"]) if kept else value
+        if isinstance(fields["assigned"], str):
+            fields["assigned"] = str(rand_param)
         else:
-            rand_param = float(random.uniform(min_value, max_value))
-
-        # print("Random value: %d" % rand_param)
-        component_params[0][key]["assigned"] = str(rand_param)
+            fields["assigned"] = rand_param
 
     return component_params
 
@@ -220,7 +436,7 @@ def random_naca_profile_selection() -> str:
     From the SwRI provided aero_info.json file, select a random NACA profile and return the
     number portion of the "Name".
     """
-    naca_data_keys = [*NACA_DATA]
+    naca_data_keys = [*lazy_data("NACA_DATA")]
     # print(naca_data_keys)
     random_naca_profile = random.choice(naca_data_keys)
 
@@ -266,12 +482,26 @@ def run(args=None):
         formatter_class=argparse.ArgumentDefaultsHelpFormatter)
     parser.add_argument('--property-table', metavar='CLS',
                         help="prints out the property table for specified class (i.e. Battery, Motor, Propeller)")
+    parser.add_argument('--component-table', metavar='CLS',
+                        help="prints out the numeric properties of the models of the specified class")
+    parser.add_argument('--sort', metavar='PROP',
+                        help="sorts the component table by the given property in descending order")
+    parser.add_argument('--top', metavar='NUM', type=int,
+                        help="prints only the top NUM models of the sorted component table")
     args = parser.parse_args(args)
 
     if args.property_table:
         data = property_table(args.property_table)
         print(json.dumps(data, indent=2, sort_keys=True))
 
+    if args.component_table:
+        table = component_table(args.component_table)
+        if args.sort and args.top is not None:
+            table = table.top_k(args.sort, args.top)
+        elif args.sort:
+            table = table.sort(args.sort, descending=True)
+        print(json.dumps(table.to_dicts(), indent=2, sort_keys=True))
+
 
 if __name__ == '__main__':
     run()
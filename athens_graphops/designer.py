@@ -22,8 +22,11 @@
 import math
 from typing import Optional, Tuple, Union, Any, List, Dict
 
-from .query import Client
+from . import CONFIG
+from .query import Batch, connect
+from .offline import MemoryClient, OfflineClient
 from .dataset import get_model_data
+from .tracing import span
 
 
 class Instance():
@@ -48,18 +51,45 @@ class StudyParam:
         
         
 class Designer():
-    def __init__(self):
+    def __init__(self, batch_size: Optional[int] = None,
+                 offline: Optional[bool] = None):
+        """
+        With a positive batch_size the design operations are collected and
+        sent to the server in batches of that size, the remaining ones are
+        sent when the design is closed or flush is called. With offline
+        (CONFIG["offline"] by default) the design is created in memory by
+        an OfflineClient instead of the graph database.
+        """
         self.client = None
+        self.writer = None
+
+        if batch_size is None:
+            batch_size = CONFIG["batch_size"]
+        self.batch_size = batch_size
+
+        if offline is None:
+            offline = CONFIG["offline"]
+        self.offline = offline
 
     def create_design(self, design: str):
         assert self.client is None
-        self.client = Client()
+        if self.offline:
+            self.client = OfflineClient()
+            self.writer = self.client
+        else:
+            self.client = connect()
+            # the in-memory stand-in has nothing to save by batching
+            if self.batch_size > 0 and not isinstance(self.client, MemoryClient):
+                self.writer = Batch(self.client, self.batch_size)
+            else:
+                self.writer = self.client
         self.instances = dict()
         self.nextid = 1
 
         self.design = design
+        self.span = span("create design", design=design).start()
         print("Creating design", self.design)
-        self.client.create_design(self.design)
+        self.writer.create_design(self.design)
 
         self.fuselage = None
 
@@ -83,7 +113,7 @@ class Designer():
         self.instances[name] = instance
 
         print("Creating", model, name)
-        self.client.create_instance(self.design, model, name)
+        self.writer.create_instance(self.design, model, name)
 
         return instance
 
@@ -95,7 +125,7 @@ class Designer():
 
         print("Creating connection from", instance1.name, connector1,
               "to", instance2.name, connector2)
-        self.client.create_connection(
+        self.writer.create_connection(
             self.design, instance1.name, connector1, instance2.name, connector2)
 
     def set_parameter(self, instance: Instance, param: str, value: Union[float, str]):
@@ -104,16 +134,20 @@ class Designer():
 
         if not isinstance(value, StudyParam):
             param_name = instance.name + "_" + param
-            self.client.create_parameter(self.design, param_name, value)
+            self.writer.create_parameter(self.design, param_name, value)
         else:
             param_name = value.name
         
-        self.client.assign_parameter(
+        self.writer.assign_parameter(
             self.design, instance.name, param, param_name)
 
+    def flush(self):
+        if self.writer is not self.client:
+            self.writer.flush()
+
     def set_study_param(self, param, value, param_type="Structural"):
         assert self.client and self.design
-        self.client.create_parameter(self.design, param, value)
+        self.writer.create_parameter(self.design, param, value)
         return StudyParam(param, value, param_type)
     
     @classmethod
@@ -127,17 +161,17 @@ class Designer():
     #          see how json_designer uses this and if that function is kept
     def set_named_parameter(self, instance: List[Instance], named_param: str, param: str, value: Union[float, str], param_exist=False):
         if not param_exist:
-            self.client.create_parameter(self.design, named_param, value)
+            self.writer.create_parameter(self.design, named_param, value)
         for inst in instance:
             assert isinstance(inst, Instance)
-            self.client.assign_parameter(
+            self.writer.assign_parameter(
                 self.design, inst.name, param, named_param)
 
     # MM TODO: used for FDM parameters (can replace with set_study_param) and using in json_designer.py
     #          when architect designs are move to platform, this will mostly be removed
     #          see how json_designer uses this and if that function is kept
     def set_config_param(self, param: str, value: Union[float, str]):
-        self.client.create_parameter(self.design, param, value)
+        self.writer.create_parameter(self.design, param, value)
 
     def add_fuselage_uam(self,
                          length: float,
@@ -768,20 +802,26 @@ class Designer():
 
     def close_design(self,
                      corpus: str = "uam",
-                     orient_z_angle: int = 90):
+                     orient_z_angle: int = 90,
+                     add_orient: bool = True):
+        """
+        Adds the Orient instance (unless add_orient is False, e.g. when the
+        design already has one) and sends the pending operations.
+        """
         assert self.client and self.design
-        assert self.fuselage is not None
 
-        orient = self.add_instance("Orient", "Orient")
-        if corpus == "uam":
-            self.connect(orient, "ORIENTCONN", self.fuselage, "ORIENT")
-        # uav corpus
-        else:
-            self.set_parameter(orient, "Z_ANGLE", orient_z_angle)
-            self.connect(orient, "ORIENTCONN",
-                         self.main_hub, "Orient_Connector")
+        if add_orient:
+            assert self.fuselage is not None
+            orient = self.add_instance("Orient", "Orient")
+            if corpus == "uam":
+                self.connect(orient, "ORIENTCONN", self.fuselage, "ORIENT")
+            # uav corpus
+            else:
+                self.set_parameter(orient, "Z_ANGLE", orient_z_angle)
+                self.connect(orient, "ORIENTCONN",
+                             self.main_hub, "Orient_Connector")
 
-        self.client.orient_design(self.design, orient.name)
+            self.writer.orient_design(self.design, orient.name)
 
         print("Closing design", self.design)
         if corpus == "uam":
@@ -790,8 +830,11 @@ class Designer():
             self.main_hub = None
         self.design = None
 
+        self.flush()
+        self.writer = None
         self.client.close()
         self.client = None
+        self.span.stop()
 
 
 def run(args=None):
@@ -21,6 +21,7 @@
 import ssl
 from typing import Any, List
 
+import asyncio
 import importlib.util
 import json
 import os
@@ -29,6 +30,7 @@ import shutil
 
 from . import CONFIG
 from . import query
+from .tracing import traced
 
 
 def import_autoseed():
@@ -40,6 +42,7 @@ def import_autoseed():
     return autoseed
 
 
+@traced("autograph")
 def autograph(batchfile: str) -> List[Any]:
     for dir in CONFIG["batch_dirs"]:
         filename = os.path.join(dir, batchfile)
@@ -49,7 +52,7 @@ def autograph(batchfile: str) -> List[Any]:
         raise ValueError("batchfile {} not found".format(batchfile))
 
     all_results = []
-    client = query.Client()
+    client = query.connect()
 
     print("Reading {}".format(filename))
     with open(filename) as file:
@@ -77,17 +80,19 @@ def autograph(batchfile: str) -> List[Any]:
     return all_results
 
 
+@traced("autoseed")
 def autoseed(design: str, batchfile: str):
     print("Dumping {} to {}".format(design, batchfile))
 
     batchfile = os.path.abspath(batchfile)
     newname = os.path.splitext(os.path.basename(batchfile))[0]
 
-    client = query.Client()
+    client = query.connect()
 
-    if design not in client.get_design_names():
+    names = client.get_design_names()
+    client.close()
+    if design not in names:
         print("Design {} not found".format(design))
-        client.close()
         return
 
     print("Importing autoseed module")
@@ -95,23 +100,31 @@ def autoseed(design: str, batchfile: str):
 
     tempdir = tempfile.TemporaryDirectory(prefix="athens_graphops_")
 
-    for idx, script in enumerate([
-            "info_paramMap",
-            "info_componentMap",
-            "info_connectionMap",
-            "info_corpusComponents"]):
+    # the info scripts are independent, so run them concurrently
+    scripts = [
+        "info_paramMap",
+        "info_componentMap",
+        "info_connectionMap",
+        "info_corpusComponents"]
+
+    async def submit_scripts():
+        return await asyncio.gather(*[
+            async_client.submit_script(
+                ("better_" if script == "info_corpusComponents" else "") +
+                script + ".groovy", __SOURCEDESIGN__=design)
+            for script in scripts])
+
+    async_client = query.AsyncClient(max_concurrency=len(scripts))
+    results = asyncio.run(submit_scripts())
+    async_client.close()
+
+    for idx, (script, result) in enumerate(zip(scripts, results)):
         fname = os.path.join(tempdir.name,
                              "{}{}.json".format(script, idx+1))
         print("Generating {}".format(fname))
-        if script == "info_corpusComponents":
-            script = "better_" + script
-        result = client.submit_script(script + ".groovy",
-                                      __SOURCEDESIGN__=design)
         with open(fname, "w") as file:
             json.dump(result[0], file)
 
-    client.close()
-
     print("Running autoseed {}".format(newname))
     olddir = os.getcwd()
     os.chdir(tempdir.name)
@@ -125,6 +138,7 @@ def autoseed(design: str, batchfile: str):
             ofile.write(ifile.read())
 
 # MM TODO:  Keep???
+@traced("update design")
 def update_design(design_folder: str, design: str):
     """ 
     Update a design graph to match the parameters indicated in the 
@@ -155,7 +169,7 @@ def update_design(design_folder: str, design: str):
     5) re-create the <design name>_design_data.json file (prove change reflected in graph)
     """
     print("Updating {} design graph".format(design))
-    client = query.Client()
+    client = query.connect()
 
     # Make sure result folder includes needed input json files which
     # describe the design and translate names to autoseed expected filenames
@@ -270,7 +284,7 @@ def update_design(design_folder: str, design: str):
 
         # Recreate design_data file for the design
         # Open up the query client again to pull a new design data json
-        newClient = query.Client()
+        newClient = query.connect()
         design_json = newClient.get_design_data(design)
         designdata_file = os.path.join(
             design_folder, design + "_design_data.json")
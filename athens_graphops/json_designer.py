@@ -4,7 +4,7 @@ from typing import Any, Dict, List, Optional
 from pydantic import BaseModel, Field
 
 from athens_graphops.designer import Designer, Instance
-from athens_graphops.query import Client
+from athens_graphops.query import connect
 
 
 class Assignment(BaseModel):
@@ -186,7 +186,7 @@ class JSONUAVDesign(BaseModel):
         overwrite=False,
     ) -> None:
         graph_guid = new_name if new_name is not None else self.design
-        client = Client()
+        client = connect()
         all_design_names = set(client.get_design_names())  # Assume Unique Design Names
 
         if overwrite and (graph_guid in all_design_names):
@@ -236,8 +236,8 @@ class JSONUAVDesign(BaseModel):
                     f"Created unused global parameter {parameter.name} whose value is {parameter.value}"
                 )
 
-        designer.client.close()
-        designer.client = None
+        # the json design has its own Orient instance
+        designer.close_design(add_orient=False)
 
 
 def run(args=None):
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+# Copyright (C) 2022, Miklos Maroti
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#===============================================================================
+# An offline design backend, which keeps the designs created by the Designer
+# in memory instead of the graph database. The design data has the same form
+# as the result of design_data.groovy, so designs can be generated, compared
+# and validated without a gremlin server, and uploaded later with the json
+# designer. The MemoryClient stand-in interprets the design scripts on these
+# designs, so code written against Client runs without a server as well.
+
+from typing import Any, Dict, List, Optional
+
+import json
+import os
+
+from .query import Client, DesignWriter, ScriptStats, instrumented
+
+
+class OfflineDesign():
+    def __init__(self, name: str):
+        self.name = name
+        # instance name -> model
+        self.instances: Dict[str, str] = dict()
+        # instance name -> model parameter -> design parameter
+        self.assignments: Dict[str, Dict[str, str]] = dict()
+        self.parameters: Dict[str, str] = dict()
+        # (instance1, connector1, instance2, connector2) in both directions
+        self.connections = set()
+        self.orient: Optional[str] = None
+
+    def check_instance(self, instance: str):
+        if instance not in self.instances:
+            raise ValueError("instance {} does not exist in design {}".format(
+                instance, self.name))
+
+    def design_data(self) -> Dict[str, Any]:
+        """
+        Returns the design in the form of a design_data.groovy result.
+        """
+        return {
+            "design": self.name,
+            "instances": [{
+                "name": name,
+                "model": self.instances[name],
+                "assignment": dict(self.assignments[name]),
+            } for name in sorted(self.instances)],
+            "parameters": dict(self.parameters),
+            "connections": [{
+                "instance1": instance1,
+                "connector1": connector1,
+                "connector2": connector2,
+                "instance2": instance2,
+            } for instance1, connector1, instance2, connector2 in sorted(
+                self.connections, key=lambda c: (c[0], c[2], c[1], c[3]))],
+        }
+
+
+# the designs of all offline clients, like the graph database they outlive
+# the clients that created them
+DESIGNS: Dict[str, OfflineDesign] = dict()
+
+
+class OfflineClient(DesignWriter):
+    """
+    The design modifying operations of Client, but executed on in-memory
+    designs. Operations on missing designs, instances or parameters raise
+    a ValueError, so broken designs are caught before they are uploaded.
+
+    Example usage:
+        CONFIG["offline"] = True
+        create_test_quad()
+        design_json = OfflineClient().get_design_data("TestQuadVU")
+    """
+
+    def __init__(self, designs: Optional[Dict[str, OfflineDesign]] = None):
+        self.designs = DESIGNS if designs is None else designs
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        pass
+
+    def get_design(self, design: str) -> OfflineDesign:
+        if design not in self.designs:
+            raise ValueError("design {} does not exist".format(design))
+        return self.designs[design]
+
+    def delete_design(self, design: str):
+        self.designs.pop(design, None)
+
+    def create_design(self, design: str):
+        self.designs[design] = OfflineDesign(design)
+
+    def create_instance(self, design: str, model: str, instance: str):
+        data = self.get_design(design)
+        if instance in data.instances:
+            raise ValueError("instance {} already exists in design {}".format(
+                instance, design))
+        data.instances[instance] = model
+        data.assignments[instance] = dict()
+
+    def create_connection(self, design: str,
+                          instance1: str, connector1: str,
+                          instance2: str, connector2: str):
+        data = self.get_design(design)
+        data.check_instance(instance1)
+        data.check_instance(instance2)
+        data.connections.add((instance1, connector1, instance2, connector2))
+        data.connections.add((instance2, connector2, instance1, connector1))
+
+    def create_parameter(self, design: str, parameter: str, value: str):
+        self.get_design(design).parameters[parameter] = str(value)
+
+    def assign_parameter(self, design: str, instance: str, model_param: str, parameter: str):
+        data = self.get_design(design)
+        data.check_instance(instance)
+        if parameter not in data.parameters:
+            raise ValueError("parameter {} does not exist in design {}".format(
+                parameter, design))
+        data.assignments[instance][model_param] = parameter
+
+    def orient_design(self, design: str, instance: str):
+        data = self.get_design(design)
+        data.check_instance(instance)
+        data.orient = instance
+
+    def get_design_names(self) -> List[str]:
+        return sorted(self.designs)
+
+    def get_design_data(self, design: str) -> List[Dict[str, Any]]:
+        return [self.get_design(design).design_data()]
+
+
+class MemoryClient(Client):
+    """
+    A stand-in for Client (selected with the "memory" host) that executes
+    the groovy scripts it knows by name on the in-memory designs of the
+    OfflineClient, instead of sending them to a gremlin server. The script
+    parameters and results are the same as with the server, so Designer,
+    autograph and the json designer work unchanged. Raw queries and other
+    scripts raise a ValueError.
+    """
+
+    def __init__(self,
+                 host: Optional[str] = None,
+                 timeout: Optional[float] = None,
+                 designs: Optional[Dict[str, OfflineDesign]] = None):
+        self.addr = "memory"
+        self.client = None
+        self.broken = False
+        self.timeout = timeout
+        self.offline = OfflineClient(designs)
+        self.statistics = ScriptStats()
+
+        # memoize
+        self.model_to_class = dict()
+
+    def close(self):
+        pass
+
+    def submit_query(self, query: str,
+                     bindings: Optional[Dict[str, Any]] = None) -> Any:
+        raise ValueError("raw queries are not supported without a server")
+
+    @instrumented
+    def submit_script(self, script: str, **params) -> List[Any]:
+        name = os.path.splitext(os.path.basename(script))[0]
+        method = getattr(self, "script_" + name, None)
+        if method is None:
+            raise ValueError("script {} is not supported without a server".format(script))
+        params = {var: str(val) for var, val in params.items()}
+        return method(params)
+
+    # the results are lists with one entry for each statement of the script
+
+    def script_clearDesign(self, params: Dict[str, str]) -> List[Any]:
+        self.offline.delete_design(params["__DESTDESIGN__"])
+        return [[]]
+
+    def script_addBlankDesign(self, params: Dict[str, str]) -> List[Any]:
+        self.offline.create_design(params["__DESTDESIGN__"])
+        return [[]]
+
+    def script_instantiateComponent(self, params: Dict[str, str]) -> List[Any]:
+        self.offline.create_instance(params["__DESIGN__"], params["__COMPONENT__"],
+                                     params["__COMPONENT_INSTANCE__"])
+        return [[]]
+
+    def script_cloneCIOpt(self, params: Dict[str, str]) -> List[Any]:
+        # the model of the seed instance is only known for in-memory seed
+        # designs, older autograph files swap the model right after this
+        source = self.offline.designs.get(params["__SOURCEDESIGN__"])
+        model = params["__SOURCENAME__"]
+        if source is not None and model in source.instances:
+            model = source.instances[model]
+        self.offline.create_instance(params["__DESTDESIGN__"], model,
+                                     params["__DESTNAME__"])
+        return [[]]
+
+    def script_swap(self, params: Dict[str, str]) -> List[Any]:
+        data = self.offline.get_design(params["__DESIGN__"])
+        data.check_instance(params["__COMPONENT_INSTANCE__"])
+        data.instances[params["__COMPONENT_INSTANCE__"]] = params["__NEW_COMPONENT__"]
+        return [[]]
+
+    def script_addConn(self, params: Dict[str, str]) -> List[Any]:
+        self.offline.create_connection(
+            params["__SOURCEDESIGN__"],
+            params["__SOURCECOMP__"], params["__SOURCECONN__"],
+            params["__DESTCOMP__"], params["__DESTCONN__"])
+        return [[]]
+
+    def script_addNewPropMM(self, params: Dict[str, str]) -> List[Any]:
+        self.offline.create_parameter(params["__SOURCEDESIGN__"], params["__PROPNAME__"],
+                                      params["__PROPVAL__"])
+        return [[]]
+
+    script_addNewPropx = script_addNewPropMM
+
+    def script_addPropConnl(self, params: Dict[str, str]) -> List[Any]:
+        self.offline.assign_parameter(params["__SOURCEDESIGN__"], params["__DESTCOMP__"],
+                                      params["__DESTPI__"], params["__SOURCEPROP__"])
+        return [[]]
+
+    def script_addRefCoordSysx(self, params: Dict[str, str]) -> List[Any]:
+        self.offline.orient_design(params["__SOURCEDESIGN__"], params["__ORIENTNAME__"])
+        return [[]]
+
+    def script_info_designList(self, params: Dict[str, str]) -> List[Any]:
+        return [self.offline.get_design_names()]
+
+    def script_design_data(self, params: Dict[str, str]) -> List[Any]:
+        design = params["__SOURCEDESIGN__"]
+        if design not in self.offline.designs:
+            return [[]]
+        return [self.offline.get_design_data(design)]
+
+    def script_corpus_data(self, params: Dict[str, str]) -> List[Any]:
+        from .dataset import lazy_data
+        return [lazy_data("CORPUS_DATA")]
+
+    def script_corpus_model(self, params: Dict[str, str]) -> List[Any]:
+        from .dataset import lazy_data
+        data = lazy_data("CORPUS_INDEX").get_model(params["__MODELNAME__"])
+        return [[data] if data is not None else []]
+
+    def script_get_model_class(self, params: Dict[str, str]) -> List[Any]:
+        from .dataset import lazy_data
+        data = lazy_data("CORPUS_INDEX").get_model(params["__MODELNAME__"])
+        return [[data["class"]] if data is not None else []]
+
+
+def write_design_data(design: str, filename: Optional[str] = None) -> str:
+    """
+    Writes the design data of an offline design into a json file, which
+    can be uploaded to the graph database with the json-designer command.
+    """
+    if filename is None:
+        filename = design + ".json"
+    with open(filename, "w") as file:
+        json.dump(OfflineClient().get_design_data(design), file,
+                  indent=2, sort_keys=True)
+    print("Design data written to {}.".format(filename))
+    return filename
@@ -25,14 +25,20 @@ import inspect
 import time
 import yaml
 import os
-from csv import DictWriter
+import csv
+import gzip
+import shutil
+import numpy as np
 from collections.abc import Sequence
 from itertools import chain
-from typing import Any, Dict, List, Optional
-from ..workflow import JenkinsClient
-from ..query import Client
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from ..workflow import BuildOrchestrator, JenkinsClient
+from ..query import connect
 from .. import CONFIG
 from ..designer import StudyParam
+from ..offline import write_design_data
+from ..tracing import span, traced
+from ..result_cache import ResultCache, design_fingerprint, read_study_file, write_study_file
 
 
 def __discover_designs():
@@ -47,25 +53,33 @@ def __discover_designs():
 
     return designs
 
-def write_study_params(design_name: str, params: Dict):
-    """Write study parameters to a .csv file for use in Jenkins runs."""
+@traced("write study params")
+def write_study_params(design_name: str, params: List[StudyParam], compress: bool = False):
+    """
+    Write study parameters to a .csv file for use in Jenkins runs.
+    The rows are streamed from iter_study_rows, so the memory use does not
+    depend on the size of the study. With compress the file is gzipped.
+    """
     study_filename = f"{design_name}_study.csv"
+    if compress:
+        study_filename += ".gz"
 
-    n_studies = len(next(iter(params.values())))
-    with open(study_filename, "w", newline="") as study_file:
-        writer = DictWriter(study_file, fieldnames=params.keys())
-        writer.writeheader()
-        for i in range(n_studies):
-            writer.writerow({k: v[i] for k, v in params.items()})
+    fieldnames, rows = iter_study_rows(params)
+    opener = gzip.open if compress else open
+    with opener(study_filename, "wt", newline="") as study_file:
+        writer = csv.writer(study_file)
+        writer.writerow(fieldnames)
+        writer.writerows(rows)
 
     print(f"Study parameters written to {study_filename}.")
     return study_filename
 
-def align_study_params(params: List[StudyParam]):
+def iter_study_rows(params: List[StudyParam]) -> Tuple[List[str], Iterator[List[Any]]]:
     """
-    Align the study parameters to the same number of runs.
-    This allows having single values and lists of parameter values.
-    All study_params entries should be the "StudyParam" class.
+    Expand the study parameters to one row for each Jenkins run, 
+    returns the column names and a generator of the rows (lists of values
+    in column order). This allows having single values and lists of 
+    parameter values. All study_params entries should be the "StudyParam" class.
     CargoMass (if available) could have one or two values and should be 
         applied across all sets of FDM parameters (if a list).
     For randomized designs, the structural parameters will have a list of values
@@ -81,14 +95,13 @@ def align_study_params(params: List[StudyParam]):
     the parameter information vs. rebuilding the model in Creo every time.
     """
     # Create dictionaries of study parameters separated by param_type
-    n_cargo = 0
+    cargo_values = []
     fdm_params = {}
     structural_params = {}
     for val in params:
         if isinstance(val, StudyParam):
             if val.param_type == "CargoMass":
                 cargo_values = val.value
-                n_cargo = len(cargo_values)
             elif val.param_type == "FDM":
                 fdm_params[val.name] = val.value
             elif val.param_type == "Structural":
@@ -108,11 +121,6 @@ def align_study_params(params: List[StudyParam]):
         n_fdm_studies = max(n_fdm_studies)
     else:
         n_fdm_studies = 1
-        
-    if n_cargo == 0:
-        fdm_sets = 1
-    else:
-        fdm_sets = n_cargo
 
     n_design_studies = [len(v) for v in structural_params.values() if isinstance(v, Sequence)]
     if n_design_studies:
@@ -120,49 +128,141 @@ def align_study_params(params: List[StudyParam]):
     else:
         n_design_studies = 1
 
-    # Flatten to create an entry for each Jenkins run
+    for fdm_name, values in fdm_params.items():
+        if isinstance(values, Sequence) and len(values) != n_fdm_studies:
+            raise ValueError(
+                f"Parameter {fdm_name} has {len(values)} values, "
+                f"but {n_fdm_studies} values are expected."
+            )
+    for struct_name, values in structural_params.items():
+        if isinstance(values, Sequence) and len(values) != n_design_studies:
+            raise ValueError(
+                f"Parameter {struct_name} has {len(values)} values, "
+                f"but {n_design_studies} values are expected."
+            )
+
+    def column(values, count):
+        return values if isinstance(values, Sequence) else [values] * count
+
+    fdm_columns = [column(v, n_fdm_studies) for v in fdm_params.values()]
+    structural_columns = [column(v, n_design_studies) for v in structural_params.values()]
+    fdm_rows = list(zip(*fdm_columns)) if fdm_columns else [()] * n_fdm_studies
+
     # To minimize the Creo parameter updates in randomized designs, all 
     # FDM parameter sets will be run for a structural design before moving
     # to the next structural design set.  If cargo is involved, it will also
     # be varied before changing the structural design parameters.
-    aligned_params = {}
-    if n_cargo == 1:
-        cargo_value_set = [cargo_values[0]] * (n_fdm_studies * n_design_studies)
-        aligned_params["CargoMass"] = cargo_value_set
-    elif n_cargo == 2:
-        cargo_value_set = ([cargo_values[0]] * n_fdm_studies + [cargo_values[1]] * n_fdm_studies) * n_design_studies
-        aligned_params["CargoMass"] = cargo_value_set
-
-    for fdm_name in fdm_params:
-        if isinstance(fdm_params[fdm_name], Sequence):
-            if len(fdm_params[fdm_name]) != n_fdm_studies:
-                raise ValueError(
-                    f"Parameter {fdm_name} has {len(fdm_params[fdm_name])} values, "
-                    f"but {n_fdm_studies} values are expected."
-                )
-            
-            fdm_params_set = fdm_params[fdm_name] * (fdm_sets * n_design_studies)
-        else:
-            fdm_params_set = [fdm_params[fdm_name]] * (n_fdm_studies * fdm_sets * n_design_studies)
-
-        aligned_params[fdm_name] = fdm_params_set
-
-    for struct_name in structural_params:
-        values = structural_params[struct_name]
-        structural_params_set = []
-        if isinstance(values, Sequence):
-            for i in range(len(values)):
-                for j in range(fdm_sets * n_fdm_studies):
-                    structural_params_set.append(values[i])
-        else:
-            for i in range(fdm_sets * n_fdm_studies):
-                structural_params_set.append(values)
+    def rows():
+        for i in range(n_design_studies):
+            design_row = [values[i] for values in structural_columns]
+            for cargo in cargo_values or [None]:
+                cargo_row = [] if cargo is None else [cargo]
+                for fdm_row in fdm_rows:
+                    yield cargo_row + list(fdm_row) + design_row
+
+    fieldnames = (["CargoMass"] if cargo_values else []) + \
+        list(fdm_params) + list(structural_params)
+    return fieldnames, rows()
 
-        aligned_params[struct_name] = structural_params_set
+def align_study_params(params: List[StudyParam]):
+    """
+    Align the study parameters to the same number of runs, returns a 
+    dictionary of the columns of iter_study_rows.  This materializes the 
+    whole study, use iter_study_rows for large studies.
+    """
+    fieldnames, rows = iter_study_rows(params)
+    aligned_params = {name: [] for name in fieldnames}
+    for row in rows:
+        for name, value in zip(fieldnames, row):
+            aligned_params[name].append(value)
 
     #print(aligned_params)
     return aligned_params
 
+def structural_changes(samples: np.ndarray) -> int:
+    """Number of parameter values that change between consecutive samples (rows)."""
+    return int(np.count_nonzero(samples[1:] != samples[:-1]))
+
+# larger sample sets are ordered in blocks of this size, see greedy_sample_order
+GREEDY_BLOCK_SIZE = 2000
+
+def greedy_walk(samples: np.ndarray, scaled: np.ndarray, rows: np.ndarray, first: int) -> np.ndarray:
+    """
+    Order the given rows starting from rows[first], always continuing with the
+    remaining row that differs in the fewest parameters (Hamming distance),
+    breaking ties by the distance of the values scaled to the parameter ranges.
+    """
+    order = np.zeros(len(rows), dtype=int)
+    remaining = np.ones(len(rows), dtype=bool)
+    current = first
+    for i in range(len(rows)):
+        order[i] = rows[current]
+        remaining[current] = False
+        if i + 1 == len(rows):
+            break
+        candidates = np.flatnonzero(remaining)
+        hamming = np.count_nonzero(samples[rows[candidates]] != samples[rows[current]], axis=1)
+        closeness = np.abs(scaled[rows[candidates]] - scaled[rows[current]]).sum(axis=1)
+        # lexicographic minimum, closeness is at most the number of parameters
+        best = np.argmin(hamming * (samples.shape[1] + 1.0) + closeness)
+        current = candidates[best]
+
+    return order
+
+def greedy_sample_order(samples: np.ndarray, block_size: int = GREEDY_BLOCK_SIZE) -> np.ndarray:
+    """
+    Order the samples (rows) so that few parameters change between consecutive
+    samples, see greedy_walk.  The walk takes quadratic time, so above 
+    block_size samples the samples are sorted lexicographically first, and 
+    the walk is done within consecutive blocks of block_size samples, each 
+    block starting with its sample closest to the end of the previous block.
+    """
+    n_samples = len(samples)
+    spread = np.ptp(samples, axis=0) if n_samples else np.zeros(0)
+    scaled = (samples - samples.min(axis=0, initial=0)) / np.where(spread > 0, spread, 1)
+    if n_samples <= block_size:
+        return greedy_walk(samples, scaled, np.arange(n_samples), 0)
+
+    presorted = np.lexsort(samples.T[::-1])
+    blocks = []
+    for start in range(0, n_samples, block_size):
+        rows = presorted[start:start + block_size]
+        first = 0
+        if blocks:
+            last = blocks[-1][-1]
+            hamming = np.count_nonzero(samples[rows] != samples[last], axis=1)
+            closeness = np.abs(scaled[rows] - scaled[last]).sum(axis=1)
+            first = int(np.argmin(hamming * (samples.shape[1] + 1.0) + closeness))
+        blocks.append(greedy_walk(samples, scaled, rows, first))
+
+    return np.concatenate(blocks)
+
+@traced("order study params")
+def order_study_params(params: List[StudyParam]):
+    """
+    Reorder the randomized structural samples to minimize the structural
+    parameter changes between consecutive designs, see align_study_params
+    why this saves Creo run time.  The values are reordered in place and 
+    the estimated savings are printed.
+    """
+    structural = [val for val in params 
+                  if val.param_type == "Structural" and isinstance(val.value, Sequence)]
+    n_samples = set(len(val.value) for val in structural)
+    if len(n_samples) != 1 or n_samples == {1}:
+        return
+
+    samples = np.array([val.value for val in structural], dtype=float).T
+    order = greedy_sample_order(samples)
+    before = structural_changes(samples)
+    after = structural_changes(samples[order])
+    for val in structural:
+        val.value = [val.value[i] for i in order]
+
+    saved = 100.0 * (before - after) / before if before else 0.0
+    print(f"Structural parameter changes between designs reduced from {before} to {after} "
+          f"({saved:.0f}% fewer Creo parameter updates).")
+
+@traced("create design config")
 def create_design_config(design_name: str, description: str, corpus_type: str, num_samples: int, params: List[StudyParam]):
     """Write design/study parameter information into a yaml file to allow randomization of the study parameters."""
 
@@ -225,10 +325,12 @@ def load_config_file(config_filename: str):
     # 3) corpus_type
     # 4) num_samples
     # 5) list of StudyParams (combine "cargo_mass", "fdm" and "params" with types indicated)
+    # 6) sampling method of the structural parameters (random if not given)
     design_name = config_params["design_name"]
     description = config_params["description"]
     corpus_type = config_params["corpus_type"]
     num_samples = config_params["num_samples"]
+    sampling = config_params.get("sampling", "random")
     params_list = []
     if corpus_type == "UAV":
         if "cargo_mass" in config_params.keys():
@@ -245,46 +347,127 @@ def load_config_file(config_filename: str):
         for key, value in entry.items():
             params_list.append(StudyParam(key, value, "Structural"))
 
-    return design_name, description, corpus_type, num_samples, params_list
+    return design_name, description, corpus_type, num_samples, params_list, sampling
 
-def run_design(design_name, study_filename):
+def unique_study_names(studies: List[Tuple[str, List[StudyParam], Optional[str]]]) -> List[str]:
+    """
+    Names of the study files and results of the (design name, study params, 
+    configuration file) studies. The name is the design name, unless several 
+    studies run the same design, then it is suffixed with the name of the 
+    configuration file (or the position of the study) to keep them apart.
+    """
+    counts = {}
+    for design_name, _, _ in studies:
+        counts[design_name] = counts.get(design_name, 0) + 1
+
+    names = []
+    for index, (design_name, _, configfile) in enumerate(studies):
+        name = design_name
+        if counts[design_name] > 1:
+            if configfile is not None:
+                suffix = os.path.splitext(os.path.basename(configfile))[0]
+            else:
+                suffix = str(index + 1)
+            name = f"{design_name}_{suffix}"
+            if name in names:
+                name = f"{name}_{index + 1}"
+        names.append(name)
+    return names
+
+@traced("run design")
+def run_design(design_name, study_filename, use_cache=True, 
+               jenkins_client=None, orchestrator=None, study_name=None):
     """
     This will run the Jenkins uam_direct2cad workflow 
     for the design created.  The results will be
     retrieved and stored in the results folder of this
     repository.  A json file defining the design is added
     to the data.zip
+
+    With use_cache, the study rows that were already evaluated for the 
+    same design graph are taken from the result cache in the results 
+    folder, only the other rows are sent to Jenkins.
+
+    When a BuildOrchestrator is given, the build is queued on it and the 
+    future of the results is returned, the results are retrieved by the
+    orchestrator as soon as the build is finished.
+
+    The results are saved as <study_name>_data.zip, the study name is the
+    design name by default, see unique_study_names.
     """
-    jenkins_client = JenkinsClient()
-    query_client = Client()
+    if study_name is None:
+        study_name = design_name
+    if jenkins_client is None:
+        jenkins_client = JenkinsClient()
+    query_client = connect()
+    design_json = query_client.get_design_data(design_name)
+    query_client.close()
+
+    zip_filename = os.path.join(jenkins_client.results_dir, study_name + "_data.zip")
+    run_filename = study_filename
+    cache = None
+    if use_cache:
+        cache = ResultCache(os.path.join(jenkins_client.results_dir, "result_cache.sqlite"))
+        design_key = design_fingerprint(design_json)
+        fieldnames, rows = read_study_file(study_filename)
+        with span("result cache lookup", rows=len(rows)):
+            cached, evaluated = cache.split_rows(design_key, fieldnames, rows)
+        print(f"Results of {len(cached)} of {len(rows)} study rows are cached.")
+        if cached and evaluated:
+            run_filename = os.path.splitext(study_filename)[0] + "_uncached.csv"
+            write_study_file(run_filename, fieldnames, [rows[i] for i in evaluated])
+
+    def finish(build):
+        artifacts_exist = False
+        if build is not None and jenkins_client.wait_for_artifacts(build):
+            artifacts_exist = jenkins_client.save_results_from_build(build, study_name)
+
+        if cache is not None:
+            if artifacts_exist:
+                with span("result cache store", rows=len(evaluated)):
+                    cache.store_results(design_key, fieldnames, 
+                                        [rows[i] for i in evaluated], zip_filename)
+            if cached and (artifacts_exist or not evaluated):
+                with span("result cache merge", rows=len(rows)):
+                    cache.merge_results(design_key, fieldnames, rows, evaluated,
+                                        zip_filename if artifacts_exist else None, zip_filename)
+                print(f"Merged cached results into {zip_filename}")
+                artifacts_exist = True
+            cache.close()
+
+        # Create json of all design information and add it to the Jenkins data.zip file
+        if artifacts_exist:
+            jenkins_client.add_design_json_to_results(study_name, design_json)
+            # keep the study file with the results, the result store reads
+            # the study parameters of the runs from it
+            shutil.copyfile(study_filename, os.path.join(
+                jenkins_client.results_dir, study_name + "_study.csv"))
+        return artifacts_exist
+
+    if cache is not None and not evaluated:
+        return finish(None)
 
     # Copy study parameter file to the minio location
-    jenkins_client.studyfile_to_minio(study_filename)
+    jenkins_client.studyfile_to_minio(run_filename)
 
     workflow = "uam_direct2cad"
-    result_file = design_name + ".zip"
+    result_file = study_name + ".zip"
     jenkins_parameters = {
         "graphGUID": design_name,
         "minioBucket": CONFIG["miniobucket"],
-        "paramFile": study_filename,
+        "paramFile": run_filename,
         "resultsFileName": result_file
     }
 
+    if orchestrator is not None:
+        return orchestrator.submit(workflow, jenkins_parameters, finish)
     build = jenkins_client.build_and_wait(workflow, jenkins_parameters)
-    # add time to allow Jenkins to make artifacts available
-    time.sleep(10)
-    artifacts_exist = jenkins_client.save_results_from_build(build, design_name)
-
-    # Create json of all design information and add it to the Jenkins data.zip file
-    if artifacts_exist:
-        design_json = query_client.get_design_data(design_name)
-        jenkins_client.add_design_json_to_results(design_name, design_json)
-
-    query_client.close()
+    return finish(build)
 
 
 def run(args=None):
     import argparse
+    from .randomize_design import spawn_generators
 
     designs = __discover_designs()
     parser = argparse.ArgumentParser(
@@ -292,31 +475,83 @@ def run(args=None):
     )
     parser.add_argument(
         "design",
+        nargs="+",
         choices=designs.keys(),
     )
-    parser.add_argument("--configfile", type=str, metavar='configuration filename',
-                        help="indicates the configuration filename to use for the random design")
+    parser.add_argument("--configfile", type=str, nargs="+", metavar='configuration filename',
+                        help="indicates the configuration filenames to use for the random design, one study for each")
+    parser.add_argument("--seed", type=int, metavar='NUM',
+                        help="seeds the random values of the random design")
+    parser.add_argument("--keep-order", action="store_true",
+                        help="keeps the order of the random design samples instead of minimizing the structural changes")
+    parser.add_argument("--compress", action="store_true",
+                        help="writes a gzip compressed study file (cannot be used with --run)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="runs every study row, even if its results are in the result cache")
+    parser.add_argument("--max-builds", type=int, metavar='NUM',
+                        help="maximum number of concurrent Jenkins builds when running several designs (default: online executor nodes)")
+    parser.add_argument("--offline", action="store_true",
+                        help="creates the designs in memory and writes their design data into <design>.json files instead of the graph database (cannot be used with --run)")
     parser.add_argument(
         "-r", "--run", action="store_true", help="Run the design."
     )
 
     args = parser.parse_args(args)
-    if args.design == "random_design":
-        if args.configfile:
-            design_name, description, corpus_type, study_params, num_samples = designs[args.design](args.configfile)
-        else:
-            raise ValueError("For random designs, a configuration file (yaml) must be specified (--configfile)")
-    # All other designs
-    else: 
-        design_name, description, corpus_type, study_params = designs[args.design]()
-        num_samples = 1
-        create_design_config(design_name, description, corpus_type, num_samples, study_params)
-
-    study_params = align_study_params(study_params)
-    study_filename = write_study_params(design_name, study_params)
-
-    if args.run:
-        run_design(design_name, study_filename)
+    if args.compress and args.run:
+        raise ValueError("The Jenkins workflow expects an uncompressed study file, do not use --compress with --run")
+    if args.offline and args.run:
+        raise ValueError("The Jenkins workflow reads the design from the graph database, upload the offline design with json-designer before running it")
+    if args.offline:
+        CONFIG["offline"] = True
+
+    studies = []
+    for design in args.design:
+        if design == "random_design":
+            if args.configfile:
+                # every configuration file gets its own random stream
+                rngs = spawn_generators(args.seed, len(args.configfile))
+                for configfile, rng in zip(args.configfile, rngs):
+                    with span("platform design", design=design, configfile=configfile):
+                        design_name, description, corpus_type, study_params, num_samples = designs[design](configfile, rng)
+                    studies.append((design_name, study_params, configfile))
+            else:
+                raise ValueError("For random designs, a configuration file (yaml) must be specified (--configfile)")
+        # All other designs
+        else: 
+            with span("platform design", design=design):
+                design_name, description, corpus_type, study_params = designs[design]()
+            if design_name in [name for name, _, _ in studies]:
+                raise ValueError(f"Design {design_name} is created more than once, or used by a random design study, the later one would replace the earlier one")
+            num_samples = 1
+            create_design_config(design_name, description, corpus_type, num_samples, study_params)
+            studies.append((design_name, study_params, None))
+
+    design_names = [name for name, _, _ in studies]
+    shared = sorted(set(name for name in design_names if design_names.count(name) > 1))
+    if args.run and shared:
+        # the concurrent builds would set the parameters of the same graph design
+        raise ValueError(f"Design {', '.join(shared)} would be run by several concurrent studies, give the configuration files different design names or run them one at a time")
+
+    study_names = unique_study_names(studies)
+    study_filenames = []
+    for (design_name, study_params, _), study_name in zip(studies, study_names):
+        if not args.keep_order:
+            order_study_params(study_params)
+        study_filenames.append(write_study_params(study_name, study_params, args.compress))
+        if args.offline:
+            write_design_data(design_name)
+
+    if args.run and len(studies) == 1:
+        run_design(studies[0][0], study_filenames[0], not args.no_cache,
+                   study_name=study_names[0])
+    elif args.run:
+        jenkins_client = JenkinsClient()
+        with BuildOrchestrator(jenkins_client, args.max_builds) as orchestrator:
+            for (design_name, _, _), study_name, study_filename in zip(studies, study_names, study_filenames):
+                run_design(design_name, study_filename, not args.no_cache,
+                           jenkins_client, orchestrator, study_name)
+            orchestrator.wait()
+        jenkins_client.close()
 
 
 if __name__ == "__main__":
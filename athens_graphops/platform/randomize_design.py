@@ -20,16 +20,62 @@
 # configuration (YAML) file defined with the randomization parameters 
 # and information to allow creation of a csv file
 
-import random
+from typing import List, Optional, Tuple
+
+import numpy as np
 from ..designer import Designer, StudyParam
 from . import load_config_file
+from .sampling import sample_bounds
+
+
+def create_random_design(configfile: str, rng: Optional[np.random.Generator] = None):
+    return randomization_platform("Random", configfile, rng)
+
+
+def structural_bounds(study_params: List[StudyParam]) -> Tuple[List[str], np.ndarray, np.ndarray]:
+    """
+    Collect the min/max values of the structural parameters of a configuration
+    file, returns the parameter names and the arrays of the lower and upper
+    bounds (the configuration files do not always list max before min).
+    """
+    names = []
+    low = []
+    high = []
+    for val in study_params:
+        if val.param_type == "Structural":
+            max_value = min_value = 0
+            for i in range(len(val.value)):
+                for key, value in val.value[i].items():
+                    if key == "max":
+                        max_value = value
+                    elif key == "min":
+                        min_value = value
+                    else:
+                        raise ValueError(
+                            f"Structural parameter should only have max/min in configuration file,"
+                            f"Entry {val.value[i]} was found."
+                        )
+            names.append(val.name)
+            low.append(min(min_value, max_value))
+            high.append(max(min_value, max_value))
 
+    return names, np.array(low, dtype=float), np.array(high, dtype=float)
 
-def create_random_design(configfile: str):
-    return randomization_platform("Random", configfile)
 
+def spawn_generators(seed: Optional[int], count: int) -> List[np.random.Generator]:
+    """
+    Independent random streams (one for each configuration file of a run, or
+    for each worker process), reproducible from the seed. The seed is printed
+    when none is given so that the run can be reproduced.
+    """
+    seed_sequence = np.random.SeedSequence(seed)
+    if seed is None:
+        print("Random seed: {}".format(seed_sequence.entropy))
+    return [np.random.default_rng(child) for child in seed_sequence.spawn(count)]
 
-def randomization_platform(variant: str, configfile: str):
+
+def randomization_platform(variant: str, configfile: str,
+                           rng: Optional[np.random.Generator] = None):
     """
     Given an existing design graph (in Janusgraph), randomize parameters 
     that are defined in a yaml file.
@@ -42,29 +88,28 @@ def randomization_platform(variant: str, configfile: str):
     If you want to run an existing design (in graphDB already) multiple times with 
     same values, use the configuration files created when the design was created. 
     These files have the min/max at the same value.
+
+    The sampling method (random, lhs, sobol, halton or grid) is given by the
+    "sampling" entry of the configuration file. The random values are drawn 
+    from the given numpy generator (see spawn_generators), or from a freshly
+    seeded one whose seed is printed.
     """
-    design_name, description, corpus_type, num_samples, study_params = load_config_file(configfile)
+    design_name, description, corpus_type, num_samples, study_params, sampling = load_config_file(configfile)
+
+    if rng is None:
+        rng = spawn_generators(None, 1)[0]
 
     # Adjust the structural parameters to select a random value between min/max value provided
-    # in the configuration file.  Keep values rounded up to get integers.
+    # in the configuration file, using the sampling method of the configuration file.
+    # Keep values rounded up to get integers.
+    names, low, high = structural_bounds(study_params)
+    samples = np.rint(sample_bounds(sampling, low, high, num_samples, rng)).astype(int)
+    if len(samples) != num_samples:
+        print("{} sampling created {} samples".format(sampling, len(samples)))
+        num_samples = len(samples)
+    columns = dict(zip(names, samples.T.tolist()))
     for val in study_params:
         if val.param_type == "Structural":
-            rand_param = []
-            for n in range(num_samples):
-                max_value = min_value = 0
-                for i in range(len(val.value)):
-                    for key, value in val.value[i].items():
-                        if key == "max":
-                            max_value = value
-                        elif key == "min":
-                            min_value = value
-                        else:
-                            raise ValueError(
-                                f"Structural parameter should only have max/min in configuration file,"
-                                f"Entry {val.value[i]} was found."
-                            )
-                
-                rand_param.append(round(random.uniform(min_value, max_value)))
-            val.value = rand_param
+            val.value = columns[val.name]
   
-    return design_name, description, corpus_type, study_params, num_samples
\ No newline at end of file
+    return design_name, description, corpus_type, study_params, num_samples
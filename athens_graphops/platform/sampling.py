@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# Copyright (C) 2022, Peter Volgyesi
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#===============================================================================
+# Sampling methods for the random design studies. Each method returns points
+# of the unit cube, which are scaled to the min/max bounds of the structural
+# parameters. The space filling methods (Latin hypercube, Sobol, Halton) cover
+# the design space more evenly than independent uniform samples, so fewer
+# Jenkins runs are needed for the same coverage.
+
+from typing import List
+
+import numpy as np
+
+# Primitive polynomials (degree, coefficients) and initial direction numbers
+# of the Sobol sequence for dimensions 2 and up, from Joe and Kuo.
+SOBOL_DIRECTIONS = [
+    (1, 0, [1]),
+    (2, 1, [1, 3]),
+    (3, 1, [1, 3, 1]),
+    (3, 2, [1, 1, 1]),
+    (4, 1, [1, 1, 3, 3]),
+    (4, 4, [1, 3, 5, 13]),
+    (5, 2, [1, 1, 5, 5, 17]),
+    (5, 4, [1, 1, 5, 5, 5]),
+    (5, 7, [1, 1, 7, 11, 19]),
+    (5, 11, [1, 1, 5, 1, 1]),
+    (5, 13, [1, 1, 1, 3, 11]),
+    (5, 14, [1, 3, 5, 5, 31]),
+    (6, 1, [1, 3, 3, 9, 7, 49]),
+    (6, 13, [1, 1, 1, 15, 21, 21]),
+    (6, 16, [1, 3, 1, 13, 27, 49]),
+    (6, 19, [1, 1, 1, 15, 7, 5]),
+    (6, 22, [1, 3, 1, 15, 13, 25]),
+    (6, 25, [1, 1, 5, 5, 19, 61]),
+    (7, 1, [1, 3, 7, 11, 23, 15, 103]),
+    (7, 4, [1, 3, 7, 13, 13, 15, 69]),
+]
+
+SOBOL_BITS = 30
+
+
+def random_points(num_samples: int, dim: int, rng: np.random.Generator) -> np.ndarray:
+    return rng.random((num_samples, dim))
+
+
+def lhs_points(num_samples: int, dim: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Latin hypercube: each parameter range is cut into num_samples equal
+    intervals and every interval is sampled exactly once.
+    """
+    strata = rng.permuted(np.tile(np.arange(num_samples), (dim, 1)), axis=1).T
+    return (strata + rng.random((num_samples, dim))) / num_samples
+
+
+def sobol_directions(dim: int) -> np.ndarray:
+    """
+    The direction numbers of the first dim Sobol dimensions as integers
+    with SOBOL_BITS bits, returns a (dim x SOBOL_BITS) array.
+    """
+    if dim > len(SOBOL_DIRECTIONS) + 1:
+        raise ValueError(
+            f"Sobol sampling supports at most {len(SOBOL_DIRECTIONS) + 1} varied parameters, "
+            f"use lhs or halton sampling for {dim} parameters")
+
+    directions = np.zeros((dim, SOBOL_BITS), dtype=np.int64)
+    # the first dimension is the van der Corput sequence
+    if dim > 0:
+        directions[0] = [1 << (SOBOL_BITS - 1 - j) for j in range(SOBOL_BITS)]
+
+    for d in range(1, dim):
+        degree, coeffs, initial = SOBOL_DIRECTIONS[d - 1]
+        m = list(initial)
+        for j in range(degree, SOBOL_BITS):
+            value = m[j - degree] ^ (m[j - degree] << degree)
+            for k in range(1, degree):
+                if (coeffs >> (degree - 1 - k)) & 1:
+                    value ^= m[j - k] << k
+            m.append(value)
+        directions[d] = [m[j] << (SOBOL_BITS - 1 - j) for j in range(SOBOL_BITS)]
+
+    return directions
+
+
+def scramble_directions(directions: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    """
+    Linear matrix scrambling: multiplies the generator matrix of each dimension
+    with a random lower triangular binary matrix with unit diagonal.
+    """
+    dim = directions.shape[0]
+    lower = np.tril(rng.integers(0, 2, size=(dim, SOBOL_BITS, SOBOL_BITS)), -1)
+    lower[:, np.arange(SOBOL_BITS), np.arange(SOBOL_BITS)] = 1
+
+    # bits[d, j, i] is bit i (most significant first) of direction j
+    shifts = np.arange(SOBOL_BITS - 1, -1, -1)
+    bits = (directions[:, :, None] >> shifts) & 1
+    scrambled = np.einsum("dik,djk->dji", lower, bits) & 1
+    return (scrambled << shifts).sum(axis=2)
+
+
+def sobol_points(num_samples: int, dim: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Scrambled Sobol sequence (linear matrix scrambling and a random digital
+    shift). Taking a power of two samples gives the best balance.
+    """
+    directions = scramble_directions(sobol_directions(dim), rng)
+
+    # the point of index n is the xor of the directions of its gray code bits
+    index = np.arange(num_samples, dtype=np.int64)
+    gray = index ^ (index >> 1)
+    points = np.zeros((num_samples, dim), dtype=np.int64)
+    for j in range(min(SOBOL_BITS, max(num_samples - 1, 0).bit_length())):
+        mask = ((gray >> j) & 1).astype(bool)
+        points[mask] ^= directions[:, j]
+
+    points ^= rng.integers(0, 1 << SOBOL_BITS, size=dim)
+    return (points + rng.random((num_samples, dim))) / float(1 << SOBOL_BITS)
+
+
+def primes(count: int) -> List[int]:
+    result = []
+    candidate = 2
+    while len(result) < count:
+        if all(candidate % p != 0 for p in result if p * p <= candidate):
+            result.append(candidate)
+        candidate += 1
+    return result
+
+
+def halton_points(num_samples: int, dim: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Scrambled Halton sequence, the digits in each prime base are permuted
+    randomly, which removes the correlation of the higher dimensions.
+    """
+    points = np.zeros((num_samples, dim))
+    index = np.arange(1, num_samples + 1)
+    for d, base in enumerate(primes(dim)):
+        perm = rng.permutation(base)
+        rest = index.copy()
+        scale = 1.0
+        for _ in range(int(np.log(num_samples + 1) / np.log(base)) + 2):
+            scale /= base
+            points[:, d] += perm[rest % base] * scale
+            rest //= base
+        # randomize within the finest cell
+        points[:, d] += rng.random(num_samples) * scale
+    return points
+
+
+def grid_points(num_samples: int, dim: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Full factorial grid with the largest number of levels per parameter
+    (at least two) that keeps the grid within num_samples points. Raises
+    a ValueError when even the two level grid has more points.
+    """
+    if 2 ** dim > num_samples:
+        raise ValueError(
+            f"Full factorial grid of {dim} parameters has at least {2 ** dim} points, "
+            f"more than the {num_samples} samples, use another sampling method")
+    levels = 2
+    while (levels + 1) ** dim <= num_samples:
+        levels += 1
+
+    axis = np.linspace(0.0, 1.0, levels)
+    mesh = np.meshgrid(*[axis] * dim, indexing="ij")
+    return np.stack([m.ravel() for m in mesh], axis=1).reshape(-1, dim)
+
+
+SAMPLING_METHODS = {
+    "random": random_points,
+    "lhs": lhs_points,
+    "sobol": sobol_points,
+    "halton": halton_points,
+    "grid": grid_points,
+}
+
+
+def sample_bounds(method: str, low: np.ndarray, high: np.ndarray,
+                  num_samples: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Sample the box given by the lower and upper bounds with the given method,
+    returns a (samples x params) array. Parameters with equal bounds are
+    kept fixed and do not count as dimensions of the sampled space.
+    """
+    if method not in SAMPLING_METHODS:
+        raise ValueError(
+            f"Unknown sampling method {method}, choose from {', '.join(SAMPLING_METHODS)}")
+
+    varied = np.flatnonzero(low < high)
+    if len(varied) == 0:
+        unit = np.zeros((num_samples, 0))
+    else:
+        unit = SAMPLING_METHODS[method](num_samples, len(varied), rng)
+
+    samples = np.tile(low, (len(unit), 1))
+    samples[:, varied] += unit * (high[varied] - low[varied])
+    return samples
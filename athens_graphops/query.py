@@ -18,57 +18,72 @@
 # The Client class is the query/submit interface into the the gremlin database. 
 
 
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
+import asyncio
+import atexit
 import csv
+import functools
 import json
+import math
 import os
+import re
 import sys
+import threading
+import time
 
 from gremlin_python.driver import client as gremlin_client
+from gremlin_python.driver.protocol import GremlinServerError
 
 from . import CONFIG
+from .tracing import span
+
+
+# the host name of the in-memory stand-in of the gremlin server
+MEMORY_HOST = "memory"
+
+# placeholders look like __SOURCEDESIGN__ or __COMPONENT_INSTANCE__
+PLACEHOLDER = re.compile(r"__[A-Za-z0-9]+(?:_[A-Za-z0-9]+)*__")
+QUOTED_PLACEHOLDER = re.compile(
+    r"(['\"])(__[A-Za-z0-9]+(?:_[A-Za-z0-9]+)*__)\1")
+
+
+class Statement():
+    """
+    A single top level statement of a groovy script. Placeholders that
+    appear only as complete string literals (e.g. '__SOURCEDESIGN__') are
+    turned into request bindings, so the text sent to the server does not
+    change between calls and the server compiles it only once. All other
+    occurrences are still substituted into the text.
+    """
+
+    def __init__(self, text: str):
+        literals = set(match.group(2)
+                       for match in QUOTED_PLACEHOLDER.finditer(text))
+        inline = set(PLACEHOLDER.findall(QUOTED_PLACEHOLDER.sub("", text)))
+        self.bound = literals - inline
+        self.text = QUOTED_PLACEHOLDER.sub(
+            lambda match: match.group(2) if match.group(2) in self.bound
+            else match.group(0), text)
+
+    def bind(self, params: Dict[str, Any]) -> Tuple[str, Dict[str, str]]:
+        query = self.text
+        # unused placeholders keep their literal value as before
+        bindings = {var: var for var in self.bound}
+        for var, val in params.items():
+            if var in self.bound:
+                bindings[var] = str(val)
+            else:
+                query = query.replace(var, str(val))
+        return query, bindings
+
+
+class Script():
+    def __init__(self, name: str, filename: str):
+        self.name = name
+        self.filename = filename
+        self.statements = []
 
-
-class Client():
-    def __init__(self,
-                 host: Optional[str] = None,
-                 timeout: Optional[float] = None):
-        if host is None:
-            host = CONFIG["hostname"]
-        self.addr = "ws://{}:8182/gremlin".format(host)
-
-        self.client = gremlin_client.Client(self.addr, "g")
-        sys.stderr.write("Connected to {}\n".format(self.addr))
-
-        if timeout is None:
-            timeout = CONFIG["timeout"]
-        self.timeout = timeout * 1000
-
-        # memoize
-        self.model_to_class = dict()
-
-    def close(self):
-        if self.client:
-            sys.stderr.write("Closed connection\n")
-            self.client.close()
-            self.client = None
-
-    def submit_query(self, query: str) -> Any:
-        result = self.client.submit(
-            query, request_options={'evaluationTimeout': self.timeout})
-        result = result.all().result()
-        return result
-
-    def submit_script(self, script: str, **params) -> List[Any]:
-        for dir in CONFIG["script_dirs"]:
-            filename = os.path.join(dir, script)
-            if os.path.exists(filename):
-                break
-        else:
-            raise ValueError("script {} not found".format(script))
-
-        results = []
         with open(filename, "r") as file:
             lines = list(file.readlines())
             lines.append("")
@@ -83,85 +98,281 @@ class Client():
                     continue
 
                 if query:
-                    for var, val in params.items():
-                        query = query.replace(var, str(val))
-                    # print(query)
-                    results.append(self.submit_query(query))
+                    self.statements.append(Statement(query))
 
                 query = line
             assert query == ""
 
-        return results
+    def bind(self, params: Dict[str, Any]) -> List[Tuple[str, Dict[str, str]]]:
+        return [stmt.bind(params) for stmt in self.statements]
 
-    def get_design_names(self) -> List[str]:
-        results = self.submit_script("info_designList.groovy")
-        return sorted(results[0])
 
-    def get_component_map(self, design: str) -> List[Dict[str, Any]]:
-        results = self.submit_script("info_componentMap.groovy",
-                                     __SOURCEDESIGN__=design)
-        return sorted(results[0], key=lambda x: x["FROM_COMP"])
+# parsed scripts, each script file is read only once per process
+SCRIPTS: Dict[str, Script] = dict()
 
-    def get_connection_map(self, design: str) -> List[Dict[str, Any]]:
-        results = self.submit_script("info_connectionMap.groovy",
-                                     __SOURCEDESIGN__=design)
-        return sorted(results[0], key=lambda x: (x["FROM_COMP"], x["TO_COMP"]))
 
-    def get_parameter_map(self, design: str) -> List[Dict[str, Any]]:
-        results = self.submit_script("info_paramMap.groovy",
-                                     __SOURCEDESIGN__=design)
-        return sorted(results[0], key=lambda x: (
-            (x["COMPONENT_NAME"], x["COMPONENT_PARAM"])))
+def load_script(script: str) -> Script:
+    if script in SCRIPTS:
+        return SCRIPTS[script]
 
-    def get_corpus_components(self) -> List[Dict[str, Any]]:
-        results = self.submit_script("info_corpusComponents.groovy")
-        return sorted(results[0], key=lambda x: (
-            x["Classification"], x["Component"]))
+    for dir in CONFIG["script_dirs"]:
+        filename = os.path.join(dir, script)
+        if os.path.exists(filename):
+            break
+    else:
+        raise ValueError("script {} not found".format(script))
 
-    def get_design_data(self, design: str) -> List[Dict[str, Any]]:
-        results = self.submit_script("design_data.groovy",
-                                     __SOURCEDESIGN__=design)
-        return results[0]
+    SCRIPTS[script] = Script(script, filename)
+    return SCRIPTS[script]
 
-    def get_corpus_data(self) -> List[Dict[str, Any]]:
-        results = self.submit_script("corpus_data.groovy")
-        return results[0]
 
-    def get_corpus_model(self, model: str) -> Dict[str, Any]:
-        results = self.submit_script("corpus_model.groovy",
-                                     __MODELNAME__=model)
-        return results[0]
+class ConnectionPool():
+    """
+    Keeps the gremlin connections of closed clients open (at most
+    CONFIG["pool_size"] per server address) and hands them out to new
+    clients, so runs that create many designs one after the other do not
+    pay for the connection setup every time. Each connection is leased to
+    a single client at a time.
+    """
 
-    def get_property_table(self, classification: str) -> List[Dict[str, Any]]:
-        results = self.submit_script("property_table.groovy",
-                                     __CLASSIFICATION__=classification)
-        return results[0]
+    def __init__(self):
+        self.idle = dict()
+        self.lock = threading.Lock()
+
+    def acquire(self, addr: str) -> gremlin_client.Client:
+        with self.lock:
+            if self.idle.get(addr):
+                return self.idle[addr].pop()
+
+        conn = gremlin_client.Client(addr, "g")
+        sys.stderr.write("Connected to {}\n".format(addr))
+        return conn
+
+    def release(self, addr: str, conn: gremlin_client.Client):
+        with self.lock:
+            idle = self.idle.setdefault(addr, [])
+            if len(idle) < CONFIG["pool_size"]:
+                idle.append(conn)
+                return
+
+        sys.stderr.write("Closed connection\n")
+        conn.close()
+
+    def close(self):
+        with self.lock:
+            conns = [conn for idle in self.idle.values() for conn in idle]
+            self.idle = dict()
+
+        for conn in conns:
+            sys.stderr.write("Closed connection\n")
+            conn.close()
+
+
+POOL = ConnectionPool()
+atexit.register(POOL.close)
+
+
+class Recorder():
+    """
+    Appends a json line to the trace file for every submitted script, with
+    the time of the submission (in seconds from the start of the
+    recording), the script name and parameters, the size of the json
+    form of the result in bytes, the latency in seconds and the error
+    if the script failed. The traces can be replayed with the replay
+    command.
+    """
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.file = open(filename, "a")
+        self.lock = threading.Lock()
+        self.start = time.time()
+
+    def record(self, entry: Dict[str, Any]):
+        line = json.dumps(entry, default=str)
+        with self.lock:
+            self.file.write(line + "\n")
+            self.file.flush()
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+
+RECORDER: Optional[Recorder] = None
+
+
+def get_recorder() -> Optional[Recorder]:
+    """
+    Returns the recorder of the CONFIG["record"] trace file, or None if
+    the scripts are not recorded.
+    """
+    global RECORDER
+    if not CONFIG["record"]:
+        return None
+    if RECORDER is None or RECORDER.filename != CONFIG["record"]:
+        if RECORDER is not None:
+            RECORDER.close()
+        RECORDER = Recorder(CONFIG["record"])
+        atexit.register(RECORDER.close)
+    return RECORDER
+
+
+class ScriptStats():
+    """
+    Latencies, result sizes (of the json form, in bytes) and errors of the
+    submitted scripts by script name. The result sizes are only measured
+    when CONFIG["stats"] is set or the scripts are recorded, since it takes
+    a full serialization of every result.
+    """
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = dict()
+        self.sizes: Dict[str, int] = dict()
+        self.errors: Dict[str, int] = dict()
+        self.lock = threading.Lock()
+
+    def add(self, script: str, latency: float, size: int = 0, error: bool = False):
+        with self.lock:
+            self.latencies.setdefault(script, []).append(latency)
+            self.sizes[script] = self.sizes.get(script, 0) + size
+            self.errors[script] = self.errors.get(script, 0) + int(error)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """
+        Returns the number of calls, errors and result bytes, the total
+        and the 50th, 95th and 99th percentile latency in milliseconds
+        for each script.
+        """
+        def percentile(values: List[float], p: int) -> float:
+            return values[max(math.ceil(len(values) * p / 100) - 1, 0)]
+
+        result = dict()
+        with self.lock:
+            for script, latencies in self.latencies.items():
+                latencies = sorted(latencies)
+                result[script] = {
+                    "count": len(latencies),
+                    "errors": self.errors[script],
+                    "bytes": self.sizes[script],
+                    "total_ms": sum(latencies) * 1000,
+                    "p50_ms": percentile(latencies, 50) * 1000,
+                    "p95_ms": percentile(latencies, 95) * 1000,
+                    "p99_ms": percentile(latencies, 99) * 1000,
+                }
+        return result
+
+
+# the statistics of all clients of the process
+STATS = ScriptStats()
+
+
+def print_stats(stats: Optional[ScriptStats] = None, file=sys.stderr):
+    """
+    Prints the script statistics (of all clients by default), the scripts
+    with the largest total latency first.
+    """
+    summary = (stats or STATS).summary()
+    file.write("{:36} {:>7} {:>6} {:>12} {:>10} {:>9} {:>9} {:>9}\n".format(
+        "script", "count", "errors", "result bytes", "total ms", "p50 ms", "p95 ms", "p99 ms"))
+    for script, entry in sorted(summary.items(), key=lambda item: -item[1]["total_ms"]):
+        file.write("{:36} {:7} {:6} {:12} {:10.1f} {:9.2f} {:9.2f} {:9.2f}\n".format(
+            script, entry["count"], entry["errors"], entry["bytes"], entry["total_ms"],
+            entry["p50_ms"], entry["p95_ms"], entry["p99_ms"]))
+
+
+class ScriptCall():
+    """
+    The statistics, recording and tracing of a single submit_script call.
+    """
+
+    def __init__(self, client: Any, script: str, params: Dict[str, Any]):
+        self.client = client
+        self.name = os.path.splitext(os.path.basename(script))[0]
+
+        self.recorder = get_recorder()
+        if self.recorder is not None:
+            self.entry = {
+                "time": time.time() - self.recorder.start,
+                "client": type(client).__name__,
+                "script": script,
+                "params": {var: str(val) for var, val in params.items()},
+            }
+
+        self.span = span(self.name, client=type(client).__name__)
+        self.start = time.perf_counter()
+
+    def finish(self, results: Any = None, error: Optional[Exception] = None):
+        latency = time.perf_counter() - self.start
+        size = 0
+        if error is None and (CONFIG["stats"] or self.recorder is not None):
+            size = len(json.dumps(results, default=str))
+        self.client.statistics.add(self.name, latency, size, error is not None)
+        STATS.add(self.name, latency, size, error is not None)
+        if self.recorder is not None:
+            self.entry["size"] = size
+            if error is not None:
+                self.entry["error"] = repr(error)
+            self.entry["latency"] = latency
+            self.recorder.record(self.entry)
+
+
+def instrumented(submit_script):
+    """
+    Adds the calls of a submit_script method (or coroutine) to the
+    statistics of the object and of the process, and records them when
+    recording is enabled.
+    """
+    if asyncio.iscoroutinefunction(submit_script):
+        @functools.wraps(submit_script)
+        async def async_wrapper(self, script: str, **params) -> List[Any]:
+            call = ScriptCall(self, script, params)
+            try:
+                with call.span:
+                    results = await submit_script(self, script, **params)
+            except Exception as error:
+                call.finish(error=error)
+                raise
+            call.finish(results)
+            return results
+
+        return async_wrapper
+
+    @functools.wraps(submit_script)
+    def wrapper(self, script: str, **params) -> List[Any]:
+        call = ScriptCall(self, script, params)
+        try:
+            with call.span:
+                results = submit_script(self, script, **params)
+        except Exception as error:
+            call.finish(error=error)
+            raise
+        call.finish(results)
+        return results
+
+    return wrapper
+
+
+class DesignWriter():
+    """
+    The design modifying operations. Subclasses provide the actual
+    submit_script method, which either talks to the server directly
+    or collects the scripts for later submission. Its return value is
+    passed back, so for AsyncClient these methods return awaitables.
+    """
 
     def delete_design(self, design: str):
-        self.submit_script("clearDesign.groovy", __DESTDESIGN__=design)
+        return self.submit_script("clearDesign.groovy", __DESTDESIGN__=design)
 
     def create_design(self, design: str):
         self.submit_script("clearDesign.groovy", __DESTDESIGN__=design)
         self.submit_script("addBlankDesign.groovy", __DESTDESIGN__=design)
 
-    def get_model_class(self, model: str) -> str:
-        if model in self.model_to_class:
-            return self.model_to_class[model]
-
-        results = self.submit_script("get_model_class.groovy",
-                                     __MODELNAME__=model)
-        if results[0]:
-            class_name = results[0][0]
-        else:
-            class_name = model
-        self.model_to_class[model] = class_name
-        return class_name
-
     def create_instance(self, design: str, model: str, instance: str):
-        self.submit_script("instantiateComponent.groovy",
-                           __DESIGN__=design,
-                           __COMPONENT_INSTANCE__=instance,
-                           __COMPONENT__=model)
+        return self.submit_script("instantiateComponent.groovy",
+                                  __DESIGN__=design,
+                                  __COMPONENT_INSTANCE__=instance,
+                                  __COMPONENT__=model)
 
     def create_connection(self, design: str,
                           instance1: str, connector1: str,
@@ -169,12 +380,12 @@ class Client():
         """
         Make sure to connect the two instances only once in any direction!
         """
-        self.submit_script("addConn.groovy",
-                           __SOURCEDESIGN__=design,
-                           __SOURCECOMP__=instance1,
-                           __SOURCECONN__=connector1,
-                           __DESTCOMP__=instance2,
-                           __DESTCONN__=connector2)
+        return self.submit_script("addConn.groovy",
+                                  __SOURCEDESIGN__=design,
+                                  __SOURCECOMP__=instance1,
+                                  __SOURCECONN__=connector1,
+                                  __DESTCOMP__=instance2,
+                                  __DESTCONN__=connector2)
 
     def create_parameter(self, design: str, parameter: str, value: str):
         upper = parameter.upper()
@@ -183,22 +394,362 @@ class Client():
             script = 'addNewPropMM.groovy'
         else:
             script = 'addNewPropx.groovy'
-        self.submit_script(script,
-                           __SOURCEDESIGN__=design,
-                           __PROPNAME__=parameter,
-                           __PROPVAL__=value)
+        return self.submit_script(script,
+                                  __SOURCEDESIGN__=design,
+                                  __PROPNAME__=parameter,
+                                  __PROPVAL__=value)
 
     def assign_parameter(self, design: str, instance: str, model_param: str, parameter: str):
-        self.submit_script('addPropConnl.groovy',
-                           __SOURCEDESIGN__=design,
-                           __DESTCOMP__=instance,
-                           __DESTPI__=model_param,
-                           __SOURCEPROP__=parameter)
+        return self.submit_script('addPropConnl.groovy',
+                                  __SOURCEDESIGN__=design,
+                                  __DESTCOMP__=instance,
+                                  __DESTPI__=model_param,
+                                  __SOURCEPROP__=parameter)
 
     def orient_design(self, design: str, instance: str):
-        self.submit_script('addRefCoordSysx.groovy',
-                           __SOURCEDESIGN__=design,
-                           __ORIENTNAME__=instance)
+        return self.submit_script('addRefCoordSysx.groovy',
+                                  __SOURCEDESIGN__=design,
+                                  __ORIENTNAME__=instance)
+
+
+class DesignReader():
+    """
+    The design and corpus queries. Subclasses provide the read_script
+    method, which submits the script and passes its results through the
+    given function, and the result method, which returns a value in the
+    form the queries return it. For AsyncClient these are awaitables.
+    """
+
+    def get_design_names(self) -> List[str]:
+        return self.read_script(
+            lambda results: sorted(results[0]),
+            "info_designList.groovy")
+
+    def get_component_map(self, design: str) -> List[Dict[str, Any]]:
+        return self.read_script(
+            lambda results: sorted(results[0], key=lambda x: x["FROM_COMP"]),
+            "info_componentMap.groovy", __SOURCEDESIGN__=design)
+
+    def get_connection_map(self, design: str) -> List[Dict[str, Any]]:
+        return self.read_script(
+            lambda results: sorted(results[0], key=lambda x: (
+                x["FROM_COMP"], x["TO_COMP"])),
+            "info_connectionMap.groovy", __SOURCEDESIGN__=design)
+
+    def get_parameter_map(self, design: str) -> List[Dict[str, Any]]:
+        return self.read_script(
+            lambda results: sorted(results[0], key=lambda x: (
+                x["COMPONENT_NAME"], x["COMPONENT_PARAM"])),
+            "info_paramMap.groovy", __SOURCEDESIGN__=design)
+
+    def get_corpus_components(self) -> List[Dict[str, Any]]:
+        return self.read_script(
+            lambda results: sorted(results[0], key=lambda x: (
+                x["Classification"], x["Component"])),
+            "info_corpusComponents.groovy")
+
+    def get_design_data(self, design: str) -> List[Dict[str, Any]]:
+        return self.read_script(
+            lambda results: results[0],
+            "design_data.groovy", __SOURCEDESIGN__=design)
+
+    def get_corpus_data(self) -> List[Dict[str, Any]]:
+        return self.read_script(
+            lambda results: results[0],
+            "corpus_data.groovy")
+
+    def get_corpus_model(self, model: str) -> Dict[str, Any]:
+        return self.read_script(
+            lambda results: results[0],
+            "corpus_model.groovy", __MODELNAME__=model)
+
+    def get_property_table(self, classification: str) -> List[Dict[str, Any]]:
+        return self.read_script(
+            lambda results: results[0],
+            "property_table.groovy", __CLASSIFICATION__=classification)
+
+    def get_model_class(self, model: str) -> str:
+        if model in self.model_to_class:
+            return self.result(self.model_to_class[model])
+
+        def process(results: List[Any]) -> str:
+            if results[0]:
+                class_name = results[0][0]
+            else:
+                class_name = model
+            self.model_to_class[model] = class_name
+            return class_name
+
+        return self.read_script(process, "get_model_class.groovy",
+                                __MODELNAME__=model)
+
+
+class Client(DesignReader, DesignWriter):
+    def __init__(self,
+                 host: Optional[str] = None,
+                 timeout: Optional[float] = None):
+        if host is None:
+            host = CONFIG["hostname"]
+        self.addr = "ws://{}:8182/gremlin".format(host)
+
+        self.client = POOL.acquire(self.addr)
+        self.broken = False
+
+        if timeout is None:
+            timeout = CONFIG["timeout"]
+        self.timeout = timeout * 1000
+        self.statistics = ScriptStats()
+
+        # memoize
+        self.model_to_class = dict()
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        Returns the statistics of the scripts submitted by this client,
+        see ScriptStats.summary.
+        """
+        return self.statistics.summary()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        if self.client:
+            if self.broken:
+                sys.stderr.write("Closed connection\n")
+                self.client.close()
+            else:
+                POOL.release(self.addr, self.client)
+            self.client = None
+
+    def submit_query(self, query: str,
+                     bindings: Optional[Dict[str, Any]] = None) -> Any:
+        try:
+            result = self.client.submit(
+                query, bindings=bindings or None,
+                request_options={'evaluationTimeout': self.timeout})
+            result = result.all().result()
+        except GremlinServerError:
+            raise
+        except Exception:
+            # do not hand out a connection in an unknown state
+            self.broken = True
+            raise
+        return result
+
+    @instrumented
+    def submit_script(self, script: str, **params) -> List[Any]:
+        results = []
+        for query, bindings in load_script(script).bind(params):
+            # print(query, bindings)
+            results.append(self.submit_query(query, bindings))
+        return results
+
+    def read_script(self, process, script: str, **params) -> Any:
+        return process(self.submit_script(script, **params))
+
+    def result(self, value: Any) -> Any:
+        return value
+
+
+def connect(host: Optional[str] = None,
+            timeout: Optional[float] = None) -> Client:
+    """
+    Returns a Client for the given (or configured) host, or the in-memory
+    MemoryClient stand-in when the host is "memory".
+    """
+    if host is None:
+        host = CONFIG["hostname"]
+    if host == MEMORY_HOST:
+        from .offline import MemoryClient
+        return MemoryClient(host, timeout)
+    return Client(host, timeout)
+
+
+class Batch(DesignWriter):
+    """
+    Collects the statements of the design modifying scripts and submits
+    them as a single groovy script once batch_size operations are pending
+    (or the script grew over max_bytes, CONFIG["batch_bytes"] by default),
+    or when flush is called.
+    Every statement is sent unchanged as the body of its own closure,
+    so its local variables stay local, and the value of its last
+    expression is iterated when it is a traversal, just like the server
+    does for a single submitted statement. The effect is the same as
+    submitting them one by one, only with far fewer round trips.
+    """
+
+    def __init__(self, client: Client, batch_size: int,
+                 max_bytes: Optional[int] = None):
+        if max_bytes is None:
+            max_bytes = CONFIG["batch_bytes"]
+        self.client = client
+        self.batch_size = batch_size
+        self.max_bytes = max_bytes
+
+        self.operations = 0
+        self.statements = []
+        self.bindings = dict()
+        self.size = 0
+        self.statistics = ScriptStats()
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        Returns the statistics of the operations of this batch, the
+        submitted batches are counted as the batch script.
+        """
+        return self.statistics.summary()
+
+    def submit_script(self, script: str, **params) -> List[Any]:
+        results = self.add_script(script, **params)
+        # the flush is timed as the batch script, not as the operation
+        # that happened to fill the batch
+        if self.operations >= self.batch_size or self.size >= self.max_bytes:
+            self.flush()
+        return results
+
+    @instrumented
+    def add_script(self, script: str, **params) -> List[Any]:
+        for query, bindings in load_script(script).bind(params):
+            # every statement gets its own copy of the bound variables
+            for var, val in bindings.items():
+                name = "{}{}".format(var, len(self.statements))
+                query = re.sub(r"(?<!\w){}(?!\w)".format(re.escape(var)),
+                               name, query)
+                self.bindings[name] = val
+                self.size += len(name) + len(val)
+            self.statements.append("__iter {{ ->\n{}\n}}".format(query))
+            self.size += len(query)
+
+        self.operations += 1
+        return []
+
+    def flush(self):
+        if not self.statements:
+            return
+
+        query = "\n".join([
+            "def __iter = { body -> def it = body(); if (it instanceof Traversal) { it.iterate() }; null }"
+        ] + self.statements + ["null"])
+        print("Submitting batch of {} operations".format(self.operations))
+        start = time.perf_counter()
+        failed = True
+        try:
+            with span("batch", operations=self.operations):
+                self.client.submit_query(query, self.bindings)
+            failed = False
+        finally:
+            latency = time.perf_counter() - start
+            self.statistics.add("batch", latency, error=failed)
+            STATS.add("batch", latency, error=failed)
+
+        self.operations = 0
+        self.statements = []
+        self.bindings = dict()
+        self.size = 0
+
+
+class AsyncClient(DesignReader, DesignWriter):
+    """
+    The same interface as Client, but all methods return awaitables.
+    At most max_concurrency requests are in flight at any time, each on
+    its own connection leased from the connection pool, so independent
+    queries can overlap instead of waiting on each other. Statements of
+    a single script are still submitted in order.
+    """
+
+    def __init__(self,
+                 host: Optional[str] = None,
+                 timeout: Optional[float] = None,
+                 max_concurrency: int = 4):
+        if host is None:
+            host = CONFIG["hostname"]
+        self.addr = "ws://{}:8182/gremlin".format(host)
+
+        # connections are leased from the pool when first needed
+        self.idle = []
+        self.max_concurrency = max_concurrency
+        self.semaphores = dict()
+
+        if timeout is None:
+            timeout = CONFIG["timeout"]
+        self.timeout = timeout * 1000
+        self.statistics = ScriptStats()
+
+        # memoize
+        self.model_to_class = dict()
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        Returns the statistics of the scripts submitted by this client,
+        see ScriptStats.summary.
+        """
+        return self.statistics.summary()
+
+    def close(self):
+        for conn in self.idle:
+            POOL.release(self.addr, conn)
+        self.idle = []
+
+    def semaphore(self) -> asyncio.Semaphore:
+        # a semaphore cannot be shared between event loops
+        loop = asyncio.get_running_loop()
+        for other in list(self.semaphores):
+            if other is not loop and other.is_closed():
+                del self.semaphores[other]
+        if loop not in self.semaphores:
+            self.semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        return self.semaphores[loop]
+
+    async def submit_query(self, query: str,
+                           bindings: Optional[Dict[str, Any]] = None) -> Any:
+        loop = asyncio.get_running_loop()
+        async with self.semaphore():
+            if self.idle:
+                conn = self.idle.pop()
+            else:
+                # connecting blocks, so do it outside of the event loop
+                conn = await loop.run_in_executor(None, POOL.acquire, self.addr)
+
+            broken = False
+            try:
+                future = await loop.run_in_executor(None, functools.partial(
+                    conn.submitAsync, query, bindings=bindings or None,
+                    request_options={'evaluationTimeout': self.timeout}))
+                result = await asyncio.wrap_future(future)
+                return await asyncio.wrap_future(result.all())
+            except GremlinServerError:
+                raise
+            except BaseException:
+                # do not hand out a connection in an unknown state
+                broken = True
+                raise
+            finally:
+                if broken:
+                    sys.stderr.write("Closed connection\n")
+                    conn.close()
+                else:
+                    self.idle.append(conn)
+
+    @instrumented
+    async def submit_script(self, script: str, **params) -> List[Any]:
+        results = []
+        for query, bindings in load_script(script).bind(params):
+            results.append(await self.submit_query(query, bindings))
+        return results
+
+    async def read_script(self, process, script: str, **params) -> Any:
+        return process(await self.submit_script(script, **params))
+
+    async def result(self, value: Any) -> Any:
+        return value
+
+    async def create_design(self, design: str):
+        await self.submit_script("clearDesign.groovy", __DESTDESIGN__=design)
+        await self.submit_script("addBlankDesign.groovy", __DESTDESIGN__=design)
 
 
 def run(args=None):
@@ -235,7 +786,7 @@ def run(args=None):
     for i in range(0, len(args.params), 2):
         params[args.params[i]] = args.params[i+1]
 
-    client = Client()
+    client = connect()
 
     if args.design_names:
         data = client.get_design_names()
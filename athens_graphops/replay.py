@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# Copyright (C) 2022, Miklos Maroti
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#===============================================================================
+# Replays the script traces recorded with the --record option against a
+# gremlin server or the in-memory stand-in (--host memory). The scripts are
+# submitted at their recorded times (optionally sped up) with an added
+# synthetic latency, so the wall clock time of a workload can be compared
+# under different round trip times without a production server.
+
+from typing import Any, Dict, List, Optional
+
+import json
+import statistics
+import time
+
+from .query import connect
+
+
+def read_trace(filename: str) -> List[Dict[str, Any]]:
+    entries = []
+    with open(filename) as file:
+        for line in file:
+            if line.strip():
+                entries.append(json.loads(line))
+    return entries
+
+
+def replay(entries: List[Dict[str, Any]], host: Optional[str] = None,
+           speed: float = 1.0, latency: float = 0.0) -> Dict[str, Any]:
+    """
+    Submits the scripts of the trace entries in order. With a positive
+    speed each script waits for its recorded time divided by the speed,
+    with zero speed the scripts are submitted back to back. The latency
+    (in seconds) is slept before each request to simulate the round trip
+    time. Returns the wall clock time, the recorded and replayed latencies
+    (in seconds) and the number of failed scripts.
+    """
+    client = connect(host)
+
+    latencies = []
+    errors = 0
+    start = time.perf_counter()
+    for entry in entries:
+        if speed > 0:
+            delay = entry["time"] / speed - (time.perf_counter() - start)
+            if delay > 0:
+                time.sleep(delay)
+
+        submitted = time.perf_counter()
+        if latency > 0:
+            time.sleep(latency)
+        try:
+            client.submit_script(entry["script"], **entry["params"])
+        except Exception as error:
+            print("Failed {}: {}".format(entry["script"], error))
+            errors += 1
+        latencies.append(time.perf_counter() - submitted)
+
+    wall_time = time.perf_counter() - start
+    client.close()
+
+    recorded = [entry.get("latency", 0.0) for entry in entries]
+    return {
+        "scripts": len(entries),
+        "errors": errors,
+        "wall_time": wall_time,
+        "recorded_latency": sum(recorded),
+        "replayed_latency": sum(latencies),
+        "median_recorded_latency": statistics.median(recorded) if recorded else 0.0,
+        "median_replayed_latency": statistics.median(latencies) if latencies else 0.0,
+    }
+
+
+def run(args=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('trace', help="a json lines trace recorded with --record")
+    parser.add_argument('--host', metavar='IP',
+                        help="the gremlin server to replay against (memory for the in-memory stand-in)")
+    parser.add_argument('--speed', type=float, metavar='X', default=1.0,
+                        help="speed up factor of the recorded timing, 0 submits the scripts back to back")
+    parser.add_argument('--latency', type=float, metavar='MS', default=0.0,
+                        help="synthetic latency added to each request in milliseconds")
+    parser.add_argument('--output', metavar='FILE',
+                        help="saves the results as json to this file")
+    args = parser.parse_args(args)
+
+    entries = read_trace(args.trace)
+    results = replay(entries, args.host, args.speed, args.latency / 1000.0)
+
+    print("Replayed {} scripts with {} errors in {:.3f} s".format(
+        results["scripts"], results["errors"], results["wall_time"]))
+    print("Total latency {:.3f} s recorded, {:.3f} s replayed".format(
+        results["recorded_latency"], results["replayed_latency"]))
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# Copyright (C) 2022, Miklos Maroti
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#===============================================================================
+# A local cache of the uam_direct2cad results of single study rows, so that
+# rerunning overlapping parameter sweeps of the same design only evaluates
+# the new rows. The results of study row i (counting from zero) are the
+# archive/result_<i+1>/ files of the data.zip of the Jenkins run.
+
+from typing import Any, Dict, List, Optional, Tuple
+
+import csv
+import gzip
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import zipfile
+
+RESULT_DIR = re.compile(r"^archive/result_(\d+)/(.*)$")
+
+
+def design_fingerprint(design_json: Any) -> str:
+    """
+    Hash of the canonical json form of the design data (as returned by
+    Client.get_design_data), independent of key order.
+    """
+    text = json.dumps(design_json, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def row_fingerprint(fieldnames: List[str], row: List[str]) -> str:
+    """
+    Hash of a study row as written into the study csv file, independent of
+    the order of the columns.
+    """
+    entry = {name: str(value) for name, value in zip(fieldnames, row)}
+    text = json.dumps(entry, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def read_study_file(study_filename: str) -> Tuple[List[str], List[List[str]]]:
+    # the study files written with --compress are gzipped
+    opener = gzip.open if study_filename.endswith(".gz") else open
+    with opener(study_filename, "rt", newline="") as study_file:
+        reader = csv.reader(study_file)
+        fieldnames = next(reader)
+        return fieldnames, list(reader)
+
+
+def write_study_file(study_filename: str, fieldnames: List[str], rows: List[List[str]]):
+    with open(study_filename, "w", newline="") as study_file:
+        writer = csv.writer(study_file)
+        writer.writerow(fieldnames)
+        writer.writerows(rows)
+
+
+class ResultCache():
+    """
+    SQLite index of the result files of study rows, keyed by the design
+    fingerprint and the row fingerprint.
+    """
+
+    def __init__(self, filename: str):
+        dirname = os.path.dirname(filename)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+        # a cache is handed from the thread preparing a run to the thread
+        # waiting for its build, but it is never used by both at once
+        self.conn = sqlite3.connect(filename, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "design TEXT, row TEXT, name TEXT, content BLOB, "
+            "PRIMARY KEY (design, row, name))")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS evaluated ("
+            "design TEXT, row TEXT, PRIMARY KEY (design, row))")
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def contains(self, design: str, row: str) -> bool:
+        cursor = self.conn.execute(
+            "SELECT 1 FROM evaluated WHERE design = ? AND row = ?", (design, row))
+        return cursor.fetchone() is not None
+
+    def lookup(self, design: str, row: str) -> Optional[Dict[str, bytes]]:
+        """
+        Returns the result files (name relative to the result folder and
+        content) of the given row, or None if it was not evaluated yet.
+        """
+        if not self.contains(design, row):
+            return None
+        cursor = self.conn.execute(
+            "SELECT name, content FROM results WHERE design = ? AND row = ?",
+            (design, row))
+        return {name: bytes(content) for name, content in cursor}
+
+    def store(self, design: str, row: str, files: Dict[str, bytes]):
+        with self.conn:
+            self.conn.execute(
+                "DELETE FROM results WHERE design = ? AND row = ?", (design, row))
+            self.conn.executemany(
+                "INSERT INTO results VALUES (?, ?, ?, ?)",
+                [(design, row, name, content) for name, content in files.items()])
+            self.conn.execute(
+                "INSERT OR REPLACE INTO evaluated VALUES (?, ?)", (design, row))
+
+    def split_rows(self, design: str, fieldnames: List[str],
+                   rows: List[List[str]]) -> Tuple[List[int], List[int]]:
+        """
+        Returns the indices of the rows with cached results and of the rows
+        that still need to be evaluated. Repeated rows are evaluated once.
+        """
+        cached = []
+        missing = []
+        seen = set()
+        for index, row in enumerate(rows):
+            key = row_fingerprint(fieldnames, row)
+            if self.contains(design, key) or key in seen:
+                cached.append(index)
+            else:
+                missing.append(index)
+                seen.add(key)
+        return cached, missing
+
+    def store_results(self, design: str, fieldnames: List[str],
+                      rows: List[List[str]], zip_filename: str):
+        """
+        Stores the results of the given rows (in the order of the study
+        file of the Jenkins run) from the data.zip of the run.
+        """
+        results = dict()
+        with zipfile.ZipFile(zip_filename) as zip_file:
+            for info in zip_file.infolist():
+                match = RESULT_DIR.match(info.filename)
+                if match and match.group(2) and not info.is_dir():
+                    results.setdefault(int(match.group(1)), dict())[
+                        match.group(2)] = zip_file.read(info)
+
+        for index, row in enumerate(rows):
+            if index + 1 in results:
+                self.store(design, row_fingerprint(fieldnames, row),
+                           results[index + 1])
+
+    def merge_results(self, design: str, fieldnames: List[str],
+                      rows: List[List[str]], evaluated: List[int],
+                      zip_filename: Optional[str], output_filename: str):
+        """
+        Creates the data.zip of the full study: the results of the evaluated
+        rows (their positions in the full study) are renumbered from the
+        data.zip of the Jenkins run, the other rows are filled in from the
+        cache. The other files of the Jenkins data.zip are kept.
+        """
+        renumber = {position + 1: index + 1
+                    for position, index in enumerate(evaluated)}
+        present = set()
+        temp_filename = output_filename + ".tmp"
+        with zipfile.ZipFile(temp_filename, "w", zipfile.ZIP_DEFLATED) as output:
+            if zip_filename is not None:
+                with zipfile.ZipFile(zip_filename) as zip_file:
+                    for info in zip_file.infolist():
+                        name = info.filename
+                        match = RESULT_DIR.match(name)
+                        if match:
+                            number = renumber.get(int(match.group(1)))
+                            if number is None:
+                                continue
+                            present.add(number)
+                            name = "archive/result_{}/{}".format(
+                                number, match.group(2))
+                        output.writestr(name, zip_file.read(info))
+
+            for index, row in enumerate(rows):
+                if index + 1 in present:
+                    continue
+                files = self.lookup(design, row_fingerprint(fieldnames, row))
+                for name, content in (files or {}).items():
+                    output.writestr(
+                        "archive/result_{}/{}".format(index + 1, name), content)
+
+        os.replace(temp_filename, output_filename)
@@ -0,0 +1,432 @@
+#!/usr/bin/env python3
+# Copyright (C) 2022, Miklos Maroti
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#===============================================================================
+# A queryable store of the uam_direct2cad results. The <design>_data.zip
+# archives are ingested into an SQLite database with one row per study run:
+# the json files of each archive/result_N folder are flattened into values
+# named <file>.<key>.<key> (e.g. designParameters.Fuse.LENGTH), and the
+# study parameters of the run (when the study file is given) into values
+# named study.<name>. The values are kept in the long run_values table with
+# one (design, run, name, value) row each, since the archives have far more
+# distinct names than the number of columns SQLite allows in a table. The
+# design json, partMass.json and partLocs.json of the archive are kept per
+# design.
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .result_cache import design_fingerprint, read_study_file, row_fingerprint
+
+RESULT_FILE = re.compile(r"^archive/result_(\d+)/(.+)$")
+
+DEFAULT_STORE = os.path.join(
+    os.path.dirname(__file__), "results", "results.sqlite")
+
+# the columns of the runs table, all other values are in run_values
+RUN_COLUMNS = ["design", "run", "row_hash", "files"]
+
+
+def quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def flatten_json(prefix: str, value: Any, columns: Dict[str, Any]):
+    """
+    Adds the scalar leaves of the json value as prefix.key.key columns,
+    lists are kept as json text.
+    """
+    if isinstance(value, dict):
+        for key, item in value.items():
+            flatten_json(prefix + "." + str(key), item, columns)
+    elif isinstance(value, list):
+        columns[prefix] = json.dumps(value)
+    elif isinstance(value, bool):
+        columns[prefix] = int(value)
+    else:
+        columns[prefix] = value
+
+
+def to_number(value: str) -> Any:
+    for cast in (int, float):
+        try:
+            return cast(value)
+        except ValueError:
+            pass
+    return value
+
+
+def read_archive(zip_filename: str) -> Dict[str, Any]:
+    """
+    Parses the json files of a data.zip, returns the top level json files
+    by name and the columns of each run by run number.
+    """
+    files = dict()
+    runs = dict()
+    with zipfile.ZipFile(zip_filename) as zip_file:
+        for info in zip_file.infolist():
+            if info.is_dir():
+                continue
+            match = RESULT_FILE.match(info.filename)
+            if match:
+                run = runs.setdefault(int(match.group(1)), {"files": []})
+                run["files"].append(match.group(2))
+                if match.group(2).endswith(".json"):
+                    try:
+                        value = json.loads(zip_file.read(info))
+                    except ValueError:
+                        print("Invalid json file {} in {}".format(
+                            info.filename, zip_filename))
+                        continue
+                    flatten_json(match.group(2)[:-len(".json")], value, run)
+            elif "/" not in info.filename and info.filename.endswith(".json"):
+                files[info.filename] = zip_file.read(info).decode("utf-8")
+
+    for run in runs.values():
+        run["files"] = json.dumps(sorted(run["files"]))
+    return {"files": files, "runs": runs}
+
+
+def archive_hash(zip_filename: str) -> str:
+    digest = hashlib.sha256()
+    with open(zip_filename, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_archive_with_hash(zip_filename: str, hash: Optional[str] = None) \
+        -> Tuple[str, Dict[str, Any]]:
+    # executed in the worker processes of ingest_many, the hash is computed
+    # only when it is not known yet
+    if hash is None:
+        hash = archive_hash(zip_filename)
+    return hash, read_archive(zip_filename)
+
+
+def design_of_archive(zip_filename: str) -> str:
+    design = os.path.basename(zip_filename)
+    if design.endswith("_data.zip"):
+        design = design[:-len("_data.zip")]
+    return design
+
+
+def study_of_archive(zip_filename: str,
+                     study_dirs: Optional[List[str]] = None) -> Optional[str]:
+    """
+    Returns the <design>_study.csv (or the compressed .csv.gz) file of the
+    <design>_data.zip archive, looked up next to the archive and then in the
+    study directories (the current directory by default, where the platform
+    command writes the study files). Returns None if there is no such file.
+    """
+    if study_dirs is None:
+        study_dirs = [os.curdir]
+    design = design_of_archive(zip_filename)
+    for dirname in [os.path.dirname(zip_filename)] + study_dirs:
+        for extension in [".csv", ".csv.gz"]:
+            study_filename = os.path.join(dirname, design + "_study" + extension)
+            if os.path.isfile(study_filename):
+                return study_filename
+    return None
+
+
+class ResultStore():
+    """
+    SQLite store of the study runs of the ingested data.zip archives.
+
+    Example usage:
+        store = ResultStore()
+        store.ingest("results/TestQuad_data.zip", "TestQuad_study.csv")
+        rows = store.select(["run", "designParameters.Fuse.LENGTH"],
+                            design="TestQuad")
+    """
+
+    def __init__(self, filename: str = DEFAULT_STORE):
+        dirname = os.path.dirname(filename)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+        self.conn = sqlite3.connect(filename)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS designs ("
+            "design TEXT PRIMARY KEY, archive TEXT, fingerprint TEXT, "
+            "design_data TEXT, part_mass TEXT, part_locs TEXT, runs INTEGER, "
+            "archive_hash TEXT)")
+        if "archive_hash" not in [row[1] for row in self.conn.execute(
+                "PRAGMA table_info(designs)")]:
+            self.conn.execute("ALTER TABLE designs ADD COLUMN archive_hash TEXT")
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS designs_archive_hash ON designs (archive_hash)")
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(runs)")]
+        if columns and columns != RUN_COLUMNS:
+            # stores of the earlier one column per value layout are ingested again
+            print("Dropping the runs of the old result store layout")
+            with self.conn:
+                self.conn.execute("DROP TABLE runs")
+                self.conn.execute("DELETE FROM designs")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS runs ("
+            "design TEXT, run INTEGER, row_hash TEXT, files TEXT, "
+            "PRIMARY KEY (design, run))")
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS runs_row_hash ON runs (row_hash)")
+        # the value column has no type, so numbers and text are kept as given
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS run_values ("
+            "design TEXT, run INTEGER, name TEXT, value, "
+            "PRIMARY KEY (design, run, name)) WITHOUT ROWID")
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS run_values_name ON run_values (name, value)")
+        self.column_names = self.read_columns()
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def read_columns(self) -> List[str]:
+        return RUN_COLUMNS + [row[0] for row in self.conn.execute(
+            "SELECT DISTINCT name FROM run_values ORDER BY name")]
+
+    def ingest(self, zip_filename: str, study_filename: Optional[str] = None,
+               design: Optional[str] = None) -> int:
+        """
+        Stores the runs of a data.zip, replacing earlier runs of the design.
+        The design name defaults to the <design>_data.zip file name. When the
+        study file of the run is given, the study parameters and the row hash
+        (see result_cache) of result_N are taken from row N of the file.
+        Returns the number of runs stored.
+        """
+        if design is None:
+            design = design_of_archive(zip_filename)
+        return self.store_archive(design, zip_filename, read_archive(zip_filename),
+                                  archive_hash(zip_filename), study_filename)
+
+    def ingested(self, hash: str) -> bool:
+        cursor = self.conn.execute(
+            "SELECT 1 FROM designs WHERE archive_hash = ?", (hash,))
+        return cursor.fetchone() is not None
+
+    def ingest_many(self, zip_filenames: List[str], workers: Optional[int] = None,
+                    force: bool = False, study_dirs: Optional[List[str]] = None) -> int:
+        """
+        Ingests many data.zip files, hashing and parsing them in a pool of
+        worker processes (one per core by default) while this process stores
+        the parsed runs as they arrive. The study parameters and row hashes
+        of the runs are taken from the study file of each archive, if there
+        is one (see study_of_archive). Archives whose hash was already
+        ingested are skipped unless force is set, archives that cannot be
+        read are reported and left out. Returns the number of ingested
+        archives.
+        """
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            hashes = dict()
+            if not force:
+                futures = {executor.submit(archive_hash, filename): filename
+                           for filename in zip_filenames}
+                for future in as_completed(futures):
+                    try:
+                        hashes[futures[future]] = future.result()
+                    except Exception as error:
+                        print("Failed to read {}: {}".format(futures[future], error))
+                skipped = set(filename for filename, hash in hashes.items()
+                              if self.ingested(hash))
+                if skipped:
+                    print("Skipping {} already ingested archives".format(len(skipped)))
+                zip_filenames = [f for f in zip_filenames
+                                 if f in hashes and f not in skipped]
+
+            ingested = 0
+            futures = {executor.submit(read_archive_with_hash, filename,
+                                       hashes.get(filename)): filename
+                       for filename in zip_filenames}
+            for future in as_completed(futures):
+                filename = futures[future]
+                try:
+                    hash, archive = future.result()
+                except Exception as error:
+                    print("Failed to read {}: {}".format(filename, error))
+                    continue
+                self.store_archive(design_of_archive(filename), filename, archive,
+                                   hash, study_of_archive(filename, study_dirs))
+                ingested += 1
+
+        return ingested
+
+    def store_archive(self, design: str, zip_filename: str, archive: Dict[str, Any],
+                      hash: str, study_filename: Optional[str] = None) -> int:
+        runs = archive["runs"]
+
+        if study_filename is not None:
+            fieldnames, rows = read_study_file(study_filename)
+            for number, run in runs.items():
+                if number <= len(rows):
+                    row = rows[number - 1]
+                    run["row_hash"] = row_fingerprint(fieldnames, row)
+                    for name, value in zip(fieldnames, row):
+                        run["study." + name] = to_number(value)
+
+        design_data = archive["files"].get(design + "_design_data.json")
+        fingerprint = None
+        if design_data is not None:
+            # the archive has the single element of the design data list,
+            # the result cache fingerprints the whole list
+            fingerprint = design_fingerprint([json.loads(design_data)])
+
+        names = set(name for run in runs.values() for name in run
+                    if name not in RUN_COLUMNS)
+        with self.conn:
+            self.conn.execute("DELETE FROM runs WHERE design = ?", (design,))
+            self.conn.execute("DELETE FROM run_values WHERE design = ?", (design,))
+            self.conn.executemany(
+                "INSERT INTO runs VALUES (?, ?, ?, ?)",
+                [(design, number, run.get("row_hash"), run.get("files"))
+                 for number, run in sorted(runs.items())])
+            self.conn.executemany(
+                "INSERT INTO run_values VALUES (?, ?, ?, ?)",
+                ((design, number, name, value)
+                 for number, run in runs.items()
+                 for name, value in run.items() if name not in RUN_COLUMNS))
+            self.conn.execute(
+                "INSERT OR REPLACE INTO designs VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (design, os.path.abspath(zip_filename), fingerprint, design_data,
+                 archive["files"].get("partMass.json"),
+                 archive["files"].get("partLocs.json"), len(runs), hash))
+        self.column_names = RUN_COLUMNS + sorted(
+            names.union(self.column_names[len(RUN_COLUMNS):]))
+
+        print("Ingested {} runs of design {}".format(len(runs), design))
+        return len(runs)
+
+    def designs(self) -> List[str]:
+        return [row[0] for row in self.conn.execute(
+            "SELECT design FROM designs ORDER BY design")]
+
+    def select(self, columns: Optional[List[str]] = None,
+               design: Optional[str] = None,
+               where: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        Returns the given columns (all by default) of the runs of the design
+        (or of all designs) whose columns have the values given in where.
+        The columns of the runs table are filtered directly, the other values
+        through the (name, value) index of run_values.
+        """
+        conditions = dict(where or {})
+        if design is not None:
+            conditions["design"] = design
+
+        filters = []
+        args = []
+        for name, value in conditions.items():
+            if name in RUN_COLUMNS:
+                filters.append("{} = ?".format(quote(name)))
+                args.append(value)
+            else:
+                filters.append("(design, run) IN (SELECT design, run FROM "
+                               "run_values WHERE name = ? AND value = ?)")
+                args.extend([name, value])
+        condition = " WHERE " + " AND ".join(filters) if filters else ""
+
+        rows = dict()
+        for row in self.conn.execute(
+                "SELECT {} FROM runs{} ORDER BY design, run".format(
+                    ", ".join(RUN_COLUMNS), condition), args):
+            rows[row[:2]] = dict(zip(RUN_COLUMNS, row))
+
+        wanted = None if columns is None else set(columns)
+        if wanted is None or not wanted.issubset(RUN_COLUMNS):
+            for design_name, run, name, value in self.conn.execute(
+                    "SELECT design, run, name, value FROM run_values WHERE "
+                    "(design, run) IN (SELECT design, run FROM runs{})".format(
+                        condition), args):
+                if wanted is None or name in wanted:
+                    rows[(design_name, run)][name] = value
+
+        if columns is None:
+            columns = self.column_names
+        return [{name: row.get(name) for name in columns}
+                for row in rows.values()]
+
+    def sql(self, query: str, args: Sequence[Any] = ()) -> List[Any]:
+        return self.conn.execute(query, args).fetchall()
+
+def run(args=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('--store', metavar='FILE', default=DEFAULT_STORE,
+                        help="the sqlite file of the result store")
+    parser.add_argument('--ingest', metavar='ZIP', nargs='+', default=[],
+                        help="ingests the given <design>_data.zip files, or all of them in the given directories")
+    parser.add_argument('--workers', metavar='NUM', type=int,
+                        help="number of processes reading the ingested files (default: number of cores)")
+    parser.add_argument('--force', action='store_true',
+                        help="ingests archives again even if they are unchanged")
+    parser.add_argument('--study', metavar='CSV',
+                        help="the study file of the ingested data.zip (single file only)")
+    parser.add_argument('--study-dirs', metavar='DIR', nargs='+',
+                        help="directories of the <design>_study.csv files, when they are not next to the archives (default: current directory)")
+    parser.add_argument('--designs', action='store_true',
+                        help="prints the names of the ingested designs")
+    parser.add_argument('--columns', action='store_true',
+                        help="prints the column and value names of the runs")
+    parser.add_argument('--sql', metavar='QUERY',
+                        help="executes the given sql query on the store")
+    args = parser.parse_args(args)
+
+    zip_filenames = []
+    for path in args.ingest:
+        if os.path.isdir(path):
+            zip_filenames.extend(sorted(
+                os.path.join(path, name) for name in os.listdir(path)
+                if name.endswith("_data.zip")))
+        else:
+            zip_filenames.append(path)
+
+    if args.study and len(zip_filenames) != 1:
+        raise ValueError("--study can be used with a single ingested file")
+
+    with ResultStore(args.store) as store:
+        if args.study:
+            store.ingest(zip_filenames[0], args.study)
+        elif zip_filenames:
+            store.ingest_many(zip_filenames, args.workers, args.force,
+                              args.study_dirs)
+
+        if args.designs:
+            print(json.dumps(store.designs(), indent=2))
+
+        if args.columns:
+            print(json.dumps(store.column_names, indent=2))
+
+        if args.sql:
+            for row in store.sql(args.sql):
+                print(json.dumps(row))
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# Copyright (C) 2022, Miklos Maroti
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#===============================================================================
+# Columnar tables of the numeric component properties, so that selecting
+# components (e.g. propellers over a given diameter) is done with numpy
+# array operations instead of python loops over the corpus.
+
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+
+class ComponentTable():
+    """
+    The models of a component class with one float array per numeric
+    property. Missing values are NaN, so comparisons with them are false.
+    Filtering, sorting and top-k selection return new tables sharing the
+    same columns.
+
+    Example usage:
+        props = component_table("Propeller")
+        large = props.select(props["DIAMETER"] > 300)
+        print(large.top_k("Weight", 5, largest=False).models)
+    """
+
+    def __init__(self, classification: str, models: np.ndarray,
+                 columns: Dict[str, np.ndarray]):
+        self.classification = classification
+        self.models = models
+        self.columns = columns
+
+    @staticmethod
+    def from_typed(classification: str, typed_models: List['TypedModel']) -> 'ComponentTable':
+        models = np.array([typed.model for typed in typed_models], dtype=object)
+
+        columns = dict()
+        for row, typed in enumerate(typed_models):
+            for name, value in typed.properties.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    if name not in columns:
+                        columns[name] = np.full(len(typed_models), np.nan)
+                    columns[name][row] = value
+
+        return ComponentTable(classification, models, columns)
+
+    def __len__(self) -> int:
+        return len(self.models)
+
+    def __getitem__(self, prop: str) -> np.ndarray:
+        return self.columns[prop]
+
+    def __contains__(self, prop: str) -> bool:
+        return prop in self.columns
+
+    def take(self, rows: np.ndarray) -> 'ComponentTable':
+        """
+        Returns the table of the given rows, which can be a boolean mask
+        or an array of row indices.
+        """
+        return ComponentTable(
+            self.classification,
+            self.models[rows],
+            {name: column[rows] for name, column in self.columns.items()})
+
+    def select(self, mask: np.ndarray) -> 'ComponentTable':
+        assert mask.dtype == bool and mask.shape == self.models.shape
+        return self.take(mask)
+
+    def restrict(self, models: Iterable[str]) -> 'ComponentTable':
+        """Returns the rows of the given models, in table order."""
+        models = set(models)
+        return self.take(np.array([model in models for model in self.models],
+                                  dtype=bool).reshape(self.models.shape))
+
+    def between(self, prop: str, minimum: float = -np.inf,
+                maximum: float = np.inf) -> 'ComponentTable':
+        column = self.columns[prop]
+        return self.take((column >= minimum) & (column <= maximum))
+
+    def sort(self, prop: str, descending: bool = False) -> 'ComponentTable':
+        """
+        Sorts the rows by the given property, the order of equal values is
+        kept. Rows with a missing value are placed last.
+        """
+        column = self.columns[prop]
+        order = np.argsort(-column if descending else column, kind="stable")
+        return self.take(order)
+
+    def top_k(self, prop: str, k: int, largest: bool = True) -> 'ComponentTable':
+        """
+        Returns the k rows with the largest (or smallest) values of the
+        given property in sorted order, without sorting the whole table.
+        Rows with a missing value are never selected. Ties are resolved
+        in table order, as with sort.
+        """
+        column = self.columns[prop]
+        rows = np.flatnonzero(~np.isnan(column))
+        keys = -column[rows] if largest else column[rows]
+        if k <= 0:
+            rows = rows[:0]
+        elif k < len(rows):
+            kth = np.partition(keys, k - 1)[k - 1]
+            better = np.flatnonzero(keys < kth)
+            equal = np.flatnonzero(keys == kth)[:k - len(better)]
+            part = np.sort(np.concatenate((better, equal)))
+            rows, keys = rows[part], keys[part]
+        return self.take(rows[np.argsort(keys, kind="stable")])
+
+    def random_model(self, rng: Optional[np.random.Generator] = None) -> str:
+        assert len(self.models) > 0, "no models to select from"
+        if rng is None:
+            rng = np.random.default_rng()
+        return self.models[rng.integers(len(self.models))]
+
+    def to_dicts(self) -> List[Dict[str, float]]:
+        result = []
+        for row, model in enumerate(self.models):
+            entry = {name: float(column[row])
+                     for name, column in self.columns.items()
+                     if not np.isnan(column[row])}
+            entry["MODEL"] = model
+            result.append(entry)
+        return result
@@ -0,0 +1,195 @@
+import json
+import os
+import pickle
+
+import numpy as np
+import pytest
+
+from athens_graphops import dataset
+from athens_graphops.dataset import (
+    CORPUS_DATA,
+    CORPUS_INDEX,
+    TYPED_CORPUS,
+    component_table,
+    get_component_min_max,
+    get_component_parameters,
+    get_model_data,
+    get_typed_model,
+    random_component_selection,
+    randomize_parameters,
+)
+
+
+class TestCorpusIndex:
+    def test_model_lookup_matches_linear_scan(self):
+        for data in CORPUS_DATA[::50]:
+            expected = next(d for d in CORPUS_DATA if d["model"] == data["model"])
+            assert get_model_data(data["model"]) is expected
+
+    def test_unknown_model(self):
+        with pytest.raises(ValueError):
+            get_model_data("no such model")
+
+    def test_class_lookup(self):
+        motors = [d for d in CORPUS_DATA if d["class"] == "Motor"]
+        assert CORPUS_INDEX.get_class("Motor") == motors
+        assert CORPUS_INDEX.get_class("NoSuchClass") == []
+
+    def test_component_parameters(self):
+        data = CORPUS_INDEX.get_class("Propeller")[0]
+        params = get_component_parameters("Propeller", data["model"])
+        assert params == [data["parameters"]]
+        assert get_component_parameters("Motor", data["model"]) == []
+
+    def test_property_index(self):
+        index = CORPUS_INDEX.property_index("Motor", "SHAFT_DIAMETER")
+        assert sum(len(models) for models in index.values()) == \
+            len(CORPUS_INDEX.get_class("Motor"))
+        for value, models in index.items():
+            assert all(m["properties"]["SHAFT_DIAMETER"] == value for m in models)
+            assert CORPUS_INDEX.with_property(
+                "Motor", "SHAFT_DIAMETER", value) is models
+
+
+class TestTypedModel:
+    def test_corpus_values_convert(self):
+        assert len(TYPED_CORPUS) == len(CORPUS_DATA)
+        assert all(not typed.invalid for typed in TYPED_CORPUS)
+
+    def test_typed_values(self):
+        data = CORPUS_INDEX.get_class("Motor")[0]
+        typed = get_typed_model(data["model"])
+        assert typed.data is data
+        assert typed.get_property("CAN_DIAMETER") == \
+            float(data["properties"]["CAN_DIAMETER"])
+        assert typed.get_property("MODEL") == data["properties"]["MODEL"]
+
+    def test_typed_parameters(self):
+        data = CORPUS_INDEX.get_class("Propeller")[0]
+        params = get_component_parameters("Propeller", data["model"], typed=True)
+        assert isinstance(params[0]["Direction"]["assigned"], int)
+        assert get_component_min_max("Wing", "Wing_horiz_hole", "SPAN") == \
+            (1.0, 1000.0)
+
+
+class TestComponentTable:
+    def test_columns_match_typed_values(self):
+        table = component_table("Propeller")
+        assert len(table) == len(CORPUS_INDEX.get_class("Propeller"))
+        for row in range(0, len(table), 100):
+            typed = get_typed_model(table.models[row])
+            assert table["DIAMETER"][row] == typed.get_property("DIAMETER")
+
+    def test_filter_matches_linear_scan(self):
+        table = component_table("Propeller")
+        large = table.select(table["DIAMETER"] > 300)
+        expected = [d["model"] for d in CORPUS_INDEX.get_class("Propeller")
+                    if float(d["properties"]["DIAMETER"]) > 300]
+        assert list(large.models) == expected
+        assert list(table.between("DIAMETER", minimum=300.0001).models) == expected
+
+    def test_sort_and_top_k(self):
+        table = component_table("Motor")
+        ordered = table.sort("WEIGHT", descending=True)
+        top = table.top_k("WEIGHT", 5)
+        assert list(top.models) == list(ordered.models[:5])
+        lightest = table.top_k("WEIGHT", 3, largest=False)
+        assert list(lightest["WEIGHT"]) == sorted(table["WEIGHT"])[:3]
+
+    def test_random_selection(self):
+        for classification in ["Battery", "Motor", "Propeller"]:
+            model = random_component_selection(classification)
+            assert model in component_table(classification).models
+
+    def test_random_battery_selection(self):
+        # only the UAM batteries without a MODEL property are selected
+        uam = set(d["model"] for d in CORPUS_INDEX.get_class("Battery")
+                  if "MODEL" not in d["properties"])
+        assert len(uam) == 81
+        assert len(component_table("Battery").restrict(uam)) == 81
+        for _ in range(200):
+            assert random_component_selection("Battery") in uam
+
+    def test_seeded_random_model(self):
+        table = component_table("Motor")
+        first = [table.random_model(np.random.default_rng(3)) for _ in range(3)]
+        assert first == [table.random_model(np.random.default_rng(3))] * 3
+        assert first[0] in table.models
+
+    def test_randomize_parameters(self):
+        def params():
+            return [{"LENGTH": {"assigned": "50"},
+                     "CHORD": {"assigned": "10", "minimum": "5", "maximum": "20"},
+                     "LOAD": {"assigned": 4.0, "minimum": 1.0},
+                     "CHANNEL": {"assigned": "0", "minimum": "1"}}]
+
+        first = randomize_parameters(params(), np.random.default_rng(7))[0]
+        second = randomize_parameters(params(), np.random.default_rng(7))[0]
+        assert first == second
+        assert 1 <= float(first["LENGTH"]["assigned"]) <= 50
+        assert 5 <= float(first["CHORD"]["assigned"]) <= 20
+        assert 1 <= first["LOAD"]["assigned"] <= 8
+        assert first["CHANNEL"]["assigned"] == "0.0"
+
+
+class TestLoadJson:
+    @pytest.fixture
+    def dirs(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(dataset, "DATA_DIR", str(tmp_path / "data"))
+        monkeypatch.setattr(dataset, "CACHE_DIR", str(tmp_path / "cache"))
+        os.makedirs(dataset.DATA_DIR)
+        return tmp_path
+
+    def write(self, dirs, data):
+        with open(dirs / "data" / "test.json", "w") as file:
+            json.dump(data, file)
+
+    def test_cache_is_reused(self, dirs, monkeypatch):
+        self.write(dirs, {"a": 1})
+        assert dataset.load_json("test.json") == {"a": 1}
+        assert (dirs / "cache" / "test.pickle").exists()
+
+        def no_parse(file):
+            raise AssertionError("the json file is parsed again")
+
+        monkeypatch.setattr(dataset.json, "load", no_parse)
+        assert dataset.load_json("test.json") == {"a": 1}
+
+    def test_cache_is_invalidated(self, dirs):
+        self.write(dirs, {"a": 1})
+        assert dataset.load_json("test.json") == {"a": 1}
+
+        # different size
+        self.write(dirs, {"a": 10})
+        assert dataset.load_json("test.json") == {"a": 10}
+
+        # same size, different modification time
+        self.write(dirs, {"a": 20})
+        stat = os.stat(dirs / "data" / "test.json")
+        os.utime(dirs / "data" / "test.json",
+                 ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        assert dataset.load_json("test.json") == {"a": 20}
+
+    def test_corrupt_cache(self, dirs):
+        self.write(dirs, [1, 2])
+        os.makedirs(dirs / "cache")
+        (dirs / "cache" / "test.pickle").write_bytes(b"not a pickle")
+        assert dataset.load_json("test.json") == [1, 2]
+
+        # the corrupt cache file is replaced
+        with open(dirs / "cache" / "test.pickle", "rb") as file:
+            _, data = pickle.load(file)
+        assert data == [1, 2]
+
+    def test_lazy_data(self, monkeypatch):
+        calls = []
+        monkeypatch.setitem(dataset.LAZY_DATA, "TEST_DATA",
+                            lambda: calls.append(1) or ["loaded"])
+        monkeypatch.delitem(vars(dataset), "TEST_DATA", raising=False)
+        assert calls == []
+        assert dataset.TEST_DATA == ["loaded"]
+        assert dataset.TEST_DATA == ["loaded"]
+        assert calls == [1]
+        monkeypatch.delitem(vars(dataset), "TEST_DATA")
+        with pytest.raises(AttributeError):
+            dataset.NO_SUCH_DATA
@@ -5,7 +5,7 @@ from deepdiff import DeepDiff
 
 from athens_graphops import CONFIG
 from athens_graphops.json_designer import JSONUAVDesign
-from athens_graphops.query import Client
+from athens_graphops.query import Client, connect
 from athens_graphops.tests.utils import get_design_dict
 
 TEST_DESIGNS = [
@@ -27,6 +27,18 @@ class TestDesign:
         diff = DeepDiff(old_dict, new_dict)
         assert diff == {}
 
+    @pytest.mark.parametrize("design_name", TEST_DESIGNS)
+    def test_deep_equality_in_memory(self, design_name, monkeypatch):
+        monkeypatch.setitem(CONFIG, "hostname", "memory")
+        old_dict = get_design_dict(design_name)
+        design = JSONUAVDesign.from_dict(old_dict)
+        design.instantiate(new_name=design_name + "_2", overwrite=True)
+        client = connect()
+        new_dict = client.get_design_data(design_name + "_2")[0]
+        client.delete_design(design_name + "_2")
+        client.close()
+        assert DeepDiff(old_dict, new_dict, exclude_paths="root['design']") == {}
+
     @pytest.mark.skipif(
         condition=os.environ.get("GRAPH_DB_ADDR") is None,
         reason="Cannot communicate with graphdb",
@@ -0,0 +1,119 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from athens_graphops import CONFIG
+from athens_graphops.designer import Designer
+from athens_graphops.export import autograph
+from athens_graphops.json_designer import JSONUAVDesign
+from athens_graphops.offline import DESIGNS, MemoryClient, OfflineClient, write_design_data
+from athens_graphops.platform.minimal_uav import create_minimal_uav
+from athens_graphops.query import connect
+
+DEMO_DESIGNS = Path(__file__).resolve().parent.parent.parent / "designs-demo1"
+
+
+@pytest.fixture
+def offline(monkeypatch):
+    monkeypatch.setitem(CONFIG, "offline", True)
+    yield OfflineClient()
+    DESIGNS.clear()
+
+
+@pytest.fixture
+def memory(monkeypatch):
+    monkeypatch.setitem(CONFIG, "hostname", "memory")
+    yield connect()
+    DESIGNS.clear()
+
+
+class TestOfflineClient:
+    def test_platform_design(self, offline):
+        design_name = create_minimal_uav()[0]
+        assert offline.get_design_names() == [design_name]
+
+        design = offline.get_design_data(design_name)[0]
+        assert design["design"] == design_name
+        names = [instance["name"] for instance in design["instances"]]
+        assert names == sorted(names) and "Orient" in names
+
+        connections = set((c["instance1"], c["connector1"], c["instance2"], c["connector2"])
+                          for c in design["connections"])
+        assert all((i2, c2, i1, c1) in connections for i1, c1, i2, c2 in connections)
+
+        for instance in design["instances"]:
+            for param in instance["assignment"].values():
+                assert isinstance(design["parameters"][param], str)
+
+        # the form read by the json designer
+        assert JSONUAVDesign.from_dict(design).to_dict() == design
+
+    def test_design_operations(self, offline):
+        designer = Designer()
+        designer.create_design("Offline")
+        battery = designer.add_instance("TurnigyGraphene6000mAh6S75C", "battery")
+        designer.set_parameter(battery, "ROTATION", 90)
+        length = designer.set_study_param("Length", 200.5)
+        designer.set_parameter(battery, "LENGTH", length)
+
+        with pytest.raises(ValueError):
+            offline.assign_parameter("Offline", "battery", "WIDTH", "Width")
+        with pytest.raises(ValueError):
+            offline.create_connection("Offline", "battery", "PowerBus", "missing", "Power")
+
+        assert offline.get_design_data("Offline") == [{
+            "design": "Offline",
+            "instances": [{
+                "name": "battery",
+                "model": "TurnigyGraphene6000mAh6S75C",
+                "assignment": {"ROTATION": "battery_ROTATION", "LENGTH": "Length"},
+            }],
+            "parameters": {"battery_ROTATION": "90", "Length": "200.5"},
+            "connections": [],
+        }]
+
+        offline.delete_design("Offline")
+        assert offline.get_design_names() == []
+
+    def test_write_design_data(self, offline, tmp_path):
+        design_name = create_minimal_uav()[0]
+        filename = write_design_data(design_name, str(tmp_path / "design.json"))
+        design = JSONUAVDesign.from_json_file(filename)
+        with open(filename) as file:
+            assert design.to_dict() == json.load(file)[0]
+
+
+class TestMemoryClient:
+    def test_designer(self, memory, monkeypatch):
+        monkeypatch.setitem(CONFIG, "stats", True)
+        assert isinstance(memory, MemoryClient)
+        design_name = create_minimal_uav()[0]
+        assert memory.get_design_names() == [design_name]
+        assert memory.get_design_data(design_name) == \
+            OfflineClient().get_design_data(design_name)
+        assert memory.get_model_class("t_motor_AT4130KV300") == "Motor"
+        stats = memory.stats()
+        assert stats["design_data"]["count"] == 1
+        assert stats["get_model_class"]["bytes"] == len('[["Motor"]]')
+
+        # the result sizes are only measured with the statistics enabled
+        monkeypatch.setitem(CONFIG, "stats", False)
+        memory.get_design_data(design_name)
+        assert memory.stats()["design_data"]["count"] == 2
+        assert memory.stats()["design_data"]["bytes"] == stats["design_data"]["bytes"]
+
+        memory.delete_design(design_name)
+        assert memory.get_design_data(design_name) == []
+
+    @pytest.mark.parametrize("design_name", ["Trowel", "TailSitter3JoyRide"])
+    def test_autograph(self, memory, design_name):
+        autograph(str(DEMO_DESIGNS / (design_name + ".csv")))
+        with open(DEMO_DESIGNS / (design_name + ".json")) as file:
+            assert memory.get_design_data(design_name) == json.load(file)
+
+    def test_unsupported_queries(self, memory):
+        with pytest.raises(ValueError):
+            memory.submit_query("g.V().count()")
+        with pytest.raises(ValueError):
+            memory.get_component_map("Trowel")
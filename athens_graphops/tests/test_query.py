@@ -0,0 +1,278 @@
+import asyncio
+import concurrent.futures
+import json
+import threading
+import time
+
+import pytest
+
+from athens_graphops import CONFIG, query
+from athens_graphops.query import AsyncClient, Batch, Statement, load_script
+
+
+class TestScript:
+    def test_quoted_placeholders_become_bindings(self):
+        stmt = Statement("g.V().has('[]Name', '__SOURCEDESIGN__')")
+        query, bindings = stmt.bind({"__SOURCEDESIGN__": "Rake"})
+        assert query == "g.V().has('[]Name', __SOURCEDESIGN__)"
+        assert bindings == {"__SOURCEDESIGN__": "Rake"}
+
+    def test_embedded_placeholders_are_substituted(self):
+        stmt = Statement(
+            "g.V().has('a', '__NAME__').has('b', 'x__NAME__').property('c', __VAL__)")
+        query, bindings = stmt.bind({"__NAME__": "n", "__VAL__": 3})
+        assert query == "g.V().has('a', 'n').has('b', 'xn').property('c', 3)"
+        assert bindings == {}
+
+    def test_missing_params_keep_literal_value(self):
+        stmt = Statement("g.V().has('[]Name', '__MODELNAME__')")
+        _, bindings = stmt.bind({})
+        assert bindings == {"__MODELNAME__": "__MODELNAME__"}
+
+    def test_scripts_are_parsed_once(self):
+        script = load_script("design_data.groovy")
+        assert load_script("design_data.groovy") is script
+        assert len(script.statements) == 1
+        assert script.statements[0].bound == {"__SOURCEDESIGN__"}
+
+
+class RecordingClient:
+    def __init__(self):
+        self.queries = []
+
+    def submit_query(self, query, bindings=None):
+        self.queries.append((query, bindings))
+
+
+class TestBatch:
+    def test_operations_are_flushed_in_batches(self):
+        client = RecordingClient()
+        batch = Batch(client, batch_size=2)
+        batch.submit_script("design_data.groovy", __SOURCEDESIGN__="A")
+        assert client.queries == []
+        batch.submit_script("design_data.groovy", __SOURCEDESIGN__="B")
+        batch.submit_script("design_data.groovy", __SOURCEDESIGN__="C")
+        assert len(client.queries) == 1
+        batch.flush()
+        assert len(client.queries) == 2
+
+        query, bindings = client.queries[0]
+        assert bindings == {"__SOURCEDESIGN__0": "A", "__SOURCEDESIGN__1": "B"}
+        assert query.count("__iter { ->") == 2
+        assert "has('[]Name', __SOURCEDESIGN__1)" in query
+
+    def test_statements_are_sent_unchanged(self, tmp_path, monkeypatch):
+        (tmp_path / "multi.groovy").write_text(
+            "// comment\n"
+            "def design = g.V().has('[]Name', '__DESIGN__').next()\n"
+            "def count = 0; count += 1\n"
+            "g.V().has('[]Name', '__DESIGN__').property('[]Count', 1)\n"
+            "  .property('[]Name', '__NAME__')\n")
+        monkeypatch.setitem(CONFIG, "script_dirs", [str(tmp_path)])
+        monkeypatch.delitem(query.SCRIPTS, "multi.groovy", raising=False)
+
+        client = RecordingClient()
+        batch = Batch(client, batch_size=1)
+        batch.submit_script("multi.groovy", __DESIGN__="A", __NAME__="B")
+        text, bindings = client.queries[0]
+        assert bindings == {"__DESIGN__0": "A", "__DESIGN__2": "A",
+                            "__NAME__2": "B"}
+
+        # every statement is the whole body of its own closure
+        body = text.split("\n", 1)[1]
+        assert body == "\n".join([
+            "__iter { ->",
+            "def design = g.V().has('[]Name', __DESIGN__0).next()",
+            "}",
+            "__iter { ->",
+            "def count = 0; count += 1",
+            "}",
+            "__iter { ->",
+            "g.V().has('[]Name', __DESIGN__2).property('[]Count', 1)",
+            "  .property('[]Name', __NAME__2)",
+            "}",
+            "null",
+        ])
+
+    def test_same_shape_batches_share_the_script_text(self):
+        client = RecordingClient()
+        batch = Batch(client, batch_size=1)
+        batch.submit_script("design_data.groovy", __SOURCEDESIGN__="A")
+        batch.submit_script("design_data.groovy", __SOURCEDESIGN__="B")
+        assert client.queries[0][0] == client.queries[1][0]
+
+    def test_batches_fit_the_default_server_request_size(self):
+        client = RecordingClient()
+        batch = Batch(client, batch_size=100000)
+        for index in range(5000):
+            batch.submit_script("design_data.groovy",
+                                __SOURCEDESIGN__="Design{}".format(index))
+        batch.flush()
+        assert len(client.queries) > 1
+        for text, bindings in client.queries:
+            size = len(json.dumps({"gremlin": text, "bindings": bindings}))
+            assert size < 65536
+
+
+class FakeConnection:
+    def __init__(self, addr, traversal_source):
+        self.addr = addr
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class TestConnectionPool:
+    def test_connections_are_reused(self, monkeypatch):
+        monkeypatch.setattr(query.gremlin_client, "Client", FakeConnection)
+        monkeypatch.setitem(CONFIG, "pool_size", 1)
+        pool = query.ConnectionPool()
+
+        conn1 = pool.acquire("ws://a")
+        conn2 = pool.acquire("ws://a")
+        assert conn1 is not conn2
+
+        pool.release("ws://a", conn1)
+        pool.release("ws://a", conn2)
+        assert not conn1.closed and conn2.closed
+        assert pool.acquire("ws://a") is conn1
+        assert pool.acquire("ws://b") is not conn1
+
+        pool.release("ws://a", conn1)
+        pool.close()
+        assert conn1.closed
+
+
+class TestScriptStats:
+    def test_percentiles(self):
+        stats = query.ScriptStats()
+        for i in range(1, 101):
+            stats.add("addConn", i / 1000.0, size=10)
+        stats.add("design_data", 0.5, error=True)
+
+        summary = stats.summary()
+        assert summary["addConn"]["count"] == 100
+        assert summary["addConn"]["bytes"] == 1000
+        assert summary["addConn"]["p50_ms"] == pytest.approx(50)
+        assert summary["addConn"]["p95_ms"] == pytest.approx(95)
+        assert summary["addConn"]["p99_ms"] == pytest.approx(99)
+        assert summary["design_data"] == {
+            "count": 1, "errors": 1, "bytes": 0, "total_ms": 500,
+            "p50_ms": 500, "p95_ms": 500, "p99_ms": 500}
+
+    def test_batch_stats(self):
+        client = RecordingClient()
+        batch = Batch(client, batch_size=2)
+        for design in ["A", "B", "C"]:
+            batch.submit_script("design_data.groovy", __SOURCEDESIGN__=design)
+        batch.flush()
+
+        stats = batch.stats()
+        assert stats["design_data"]["count"] == 3
+        assert stats["batch"]["count"] == 2
+        assert stats["batch"]["errors"] == 0
+
+    def test_flush_is_not_counted_in_operations(self):
+        class SlowClient(RecordingClient):
+            def submit_query(self, query, bindings=None):
+                time.sleep(0.2)
+
+        batch = Batch(SlowClient(), batch_size=2)
+        for design in ["A", "B"]:
+            batch.submit_script("design_data.groovy", __SOURCEDESIGN__=design)
+
+        stats = batch.stats()
+        assert stats["batch"]["total_ms"] >= 200
+        assert stats["design_data"]["total_ms"] < 100
+
+
+class FakeResultSet:
+    def __init__(self, result):
+        self.result = result
+
+    def all(self):
+        future = concurrent.futures.Future()
+        future.set_result(self.result)
+        return future
+
+
+class AsyncConnection(FakeConnection):
+    """Answers the info_designList script after a short delay."""
+
+    lock = threading.Lock()
+    active = 0
+    peak = 0
+
+    def submitAsync(self, message, bindings=None, request_options=None):
+        future = concurrent.futures.Future()
+
+        def answer():
+            with AsyncConnection.lock:
+                AsyncConnection.active += 1
+                AsyncConnection.peak = max(AsyncConnection.peak, AsyncConnection.active)
+            threading.Event().wait(0.05)
+            with AsyncConnection.lock:
+                AsyncConnection.active -= 1
+            future.set_result(FakeResultSet(["B", "A"]))
+
+        threading.Thread(target=answer).start()
+        return future
+
+
+class TestAsyncClient:
+    @pytest.fixture
+    def pool(self, monkeypatch, tmp_path):
+        (tmp_path / "info_designList.groovy").write_text(
+            "g.V().has('VertexLabel', '[avm]Design').values('[]Name').fold()\n")
+        monkeypatch.setitem(CONFIG, "script_dirs", [str(tmp_path)])
+        monkeypatch.setattr(query, "SCRIPTS", dict())
+        monkeypatch.setattr(query.gremlin_client, "Client", AsyncConnection)
+        monkeypatch.setattr(query, "POOL", query.ConnectionPool())
+        monkeypatch.setitem(CONFIG, "pool_size", 8)
+        AsyncConnection.peak = 0
+        return query.POOL
+
+    def test_concurrent_queries(self, pool):
+        client = AsyncClient(host="a", max_concurrency=2)
+
+        async def main():
+            return await asyncio.gather(*[
+                client.get_design_names() for _ in range(6)])
+
+        assert asyncio.run(main()) == [["A", "B"]] * 6
+        assert AsyncConnection.peak == 2
+        assert client.stats()["info_designList"]["count"] == 6
+
+        # the semaphore of a closed loop is not reused
+        assert asyncio.run(main()) == [["A", "B"]] * 6
+        assert AsyncConnection.peak == 2
+
+        client.close()
+        assert len(pool.idle["ws://a:8182/gremlin"]) == 2
+        assert not any(conn.closed for conn in pool.idle["ws://a:8182/gremlin"])
+
+    def test_memoized_model_class(self, pool):
+        client = AsyncClient(host="a")
+        client.model_to_class["Motor1"] = "Motor"
+        assert asyncio.run(client.get_model_class("Motor1")) == "Motor"
+        assert client.stats() == {}
+        client.close()
+
+    def test_concurrent_spans(self, pool, monkeypatch, tmp_path):
+        from athens_graphops import tracing
+        monkeypatch.setitem(CONFIG, "trace", str(tmp_path / "trace.json"))
+        monkeypatch.setattr(tracing, "TRACER", tracing.Tracer())
+        client = AsyncClient(host="a", max_concurrency=2)
+
+        async def main():
+            with tracing.span("export"):
+                await asyncio.gather(client.get_design_names(),
+                                     client.get_design_names())
+
+        asyncio.run(main())
+        client.close()
+        events = tracing.TRACER.chrome_events()
+        assert [event["name"] for event in events] == \
+            ["export", "info_designList", "info_designList"]
+        assert [event["args"].get("parent_id") for event in events] == [None, 1, 1]
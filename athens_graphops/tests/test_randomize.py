@@ -0,0 +1,212 @@
+import gzip
+
+import numpy as np
+import pytest
+
+from athens_graphops.designer import StudyParam
+from athens_graphops.platform import (
+    align_study_params,
+    greedy_sample_order,
+    iter_study_rows,
+    order_study_params,
+    structural_changes,
+    unique_study_names,
+    write_study_params,
+)
+from athens_graphops.platform.randomize_design import (
+    spawn_generators,
+    structural_bounds,
+)
+from athens_graphops.platform.sampling import SAMPLING_METHODS, sample_bounds
+
+PARAMS = [
+    StudyParam("Flight_Path", [1, 3], "FDM"),
+    StudyParam("arm_length", [{"max": 200}, {"min": 500}], "Structural"),
+    StudyParam("leg_length", [{"min": 10}, {"max": 20}], "Structural"),
+]
+
+
+class TestRandomSamples:
+    def test_bounds(self):
+        names, low, high = structural_bounds(PARAMS)
+        assert names == ["arm_length", "leg_length"]
+        assert list(low) == [200, 10] and list(high) == [500, 20]
+
+        for method in SAMPLING_METHODS:
+            samples = sample_bounds(method, low, high, 64, np.random.default_rng(0))
+            assert samples.shape == (64, 2)
+            assert np.all((samples >= low) & (samples <= high))
+
+    def test_seeded_streams(self):
+        _, low, high = structural_bounds(PARAMS)
+        first = [sample_bounds("random", low, high, 10, rng)
+                 for rng in spawn_generators(42, 2)]
+        second = [sample_bounds("random", low, high, 10, rng)
+                  for rng in spawn_generators(42, 2)]
+        assert np.array_equal(first[0], second[0])
+        assert np.array_equal(first[1], second[1])
+        assert not np.array_equal(first[0], first[1])
+
+    def test_random_configs_get_own_streams(self, tmp_path, monkeypatch):
+        from athens_graphops.platform import randomize_design
+        monkeypatch.setattr(randomize_design, "load_config_file", lambda configfile: (
+            "Quad", "", "uam", 5,
+            [StudyParam("arm_length", [{"min": 0}, {"max": 1000}], "Structural")],
+            "random"))
+        rngs = spawn_generators(11, 2)
+        first = randomize_design.create_random_design("a.yaml", rngs[0])[3][0].value
+        second = randomize_design.create_random_design("b.yaml", rngs[1])[3][0].value
+        again = randomize_design.create_random_design(
+            "a.yaml", spawn_generators(11, 2)[0])[3][0].value
+        assert first == again
+        assert first != second
+
+
+def strata(samples, low, high, count):
+    return np.floor((samples - low) / (high - low) * count).astype(int)
+
+
+class TestSampling:
+    low = np.array([0.0, 5.0, 10.0, 0.0])
+    high = np.array([1.0, 5.0, 20.0, 100.0])
+
+    def test_fixed_parameters(self):
+        samples = sample_bounds("sobol", self.low, self.high, 16,
+                                np.random.default_rng(1))
+        assert np.all(samples[:, 1] == 5.0)
+
+    def test_lhs_covers_every_interval(self):
+        samples = sample_bounds("lhs", self.low, self.high, 50,
+                                np.random.default_rng(1))
+        for d in [0, 2, 3]:
+            cells = strata(samples[:, d], self.low[d], self.high[d], 50)
+            assert sorted(cells) == list(range(50))
+
+    def test_sobol_is_balanced(self):
+        samples = sample_bounds("sobol", self.low, self.high, 64,
+                                np.random.default_rng(1))
+        for d in [0, 2, 3]:
+            cells = strata(samples[:, d], self.low[d], self.high[d], 64)
+            assert sorted(cells) == list(range(64))
+        # the first two dimensions form a (0, 6, 2)-net
+        for bits in range(7):
+            cells = set(zip(strata(samples[:, 0], 0.0, 1.0, 2 ** bits),
+                            strata(samples[:, 2], 10.0, 20.0, 2 ** (6 - bits))))
+            assert len(cells) == 64
+
+    def test_grid(self):
+        samples = sample_bounds("grid", self.low, self.high, 30,
+                                np.random.default_rng(1))
+        assert samples.shape == (27, 4)
+        assert sorted(set(samples[:, 3])) == [0.0, 50.0, 100.0]
+
+    def test_grid_larger_than_samples(self):
+        low = np.zeros(20)
+        high = np.ones(20)
+        with pytest.raises(ValueError, match="Full factorial grid"):
+            sample_bounds("grid", low, high, 1000, np.random.default_rng(1))
+
+    def test_unknown_method(self):
+        with pytest.raises(ValueError, match="Unknown sampling method"):
+            sample_bounds("globals", self.low, self.high, 10,
+                          np.random.default_rng(1))
+
+
+class TestSampleOrder:
+    def test_grid_order(self):
+        grid = np.array(np.meshgrid([1, 2, 3], [4, 5, 6], [7, 8], indexing="ij"))
+        samples = grid.reshape(3, -1).T
+        shuffled = samples[np.random.default_rng(0).permutation(len(samples))]
+        order = greedy_sample_order(shuffled)
+        assert sorted(order) == list(range(len(samples)))
+        assert structural_changes(shuffled[order]) < structural_changes(shuffled)
+        # every step of the greedy order changes a single parameter at first
+        assert structural_changes(shuffled[order][:3]) == 2
+
+    def test_greedy_order_in_blocks(self):
+        samples = np.round(np.random.default_rng(0).random((500, 4)) * 3)
+        order = greedy_sample_order(samples, block_size=64)
+        assert sorted(order) == list(range(len(samples)))
+        assert structural_changes(samples[order]) < structural_changes(samples) / 2
+
+    def test_params_reordered_together(self):
+        params = [
+            StudyParam("a", [1, 2, 1, 2], "Structural"),
+            StudyParam("b", [5, 6, 5, 6], "Structural"),
+            StudyParam("c", 7, "Structural"),
+            StudyParam("Flight_Path", [1, 3], "FDM"),
+        ]
+        order_study_params(params)
+        assert params[0].value == [1, 1, 2, 2]
+        assert params[1].value == [5, 5, 6, 6]
+        assert params[2].value == 7
+        assert params[3].value == [1, 3]
+
+
+class TestStudyRows:
+    params = [
+        StudyParam("CargoMass", [0.5, 0.001], "CargoMass"),
+        StudyParam("Flight_Path", [1, 3], "FDM"),
+        StudyParam("Q_Angles", 0.01, "FDM"),
+        StudyParam("arm_length", [200, 300], "Structural"),
+        StudyParam("leg_length", 10, "Structural"),
+    ]
+
+    def test_row_order(self):
+        fieldnames, rows = iter_study_rows(self.params)
+        assert fieldnames == ["CargoMass", "Flight_Path", "Q_Angles",
+                              "arm_length", "leg_length"]
+        rows = list(rows)
+        assert len(rows) == 8
+        assert rows[:3] == [[0.5, 1, 0.01, 200, 10],
+                            [0.5, 3, 0.01, 200, 10],
+                            [0.001, 1, 0.01, 200, 10]]
+        assert rows[4] == [0.5, 1, 0.01, 300, 10]
+
+        aligned = align_study_params(self.params)
+        assert aligned["arm_length"] == [200] * 4 + [300] * 4
+        assert aligned["leg_length"] == [10] * 8
+
+    def test_compressed_file(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        filename = write_study_params("Test", self.params, compress=True)
+        assert filename == "Test_study.csv.gz"
+        with gzip.open(filename, "rt") as file:
+            lines = file.read().splitlines()
+        assert lines[0] == "CargoMass,Flight_Path,Q_Angles,arm_length,leg_length"
+        assert lines[1] == "0.5,1,0.01,200,10"
+        assert len(lines) == 9
+
+
+class TestStudyNames:
+    def test_shared_design_names_are_suffixed(self):
+        studies = [
+            ("TestQuadVU", [], "TestQuadVU_config.yaml"),
+            ("TestQuadVU", [], "RandomTestQuadVU_config.yaml"),
+            ("Falcon", [], None),
+            ("Minimal", [], "Minimal_config.yaml"),
+            ("Minimal", [], "Minimal_config.yaml"),
+        ]
+        assert unique_study_names(studies) == [
+            "TestQuadVU_TestQuadVU_config",
+            "TestQuadVU_RandomTestQuadVU_config",
+            "Falcon",
+            "Minimal_Minimal_config",
+            "Minimal_Minimal_config_5",
+        ]
+
+    def test_concurrent_studies_of_one_design(self, tmp_path, monkeypatch):
+        from athens_graphops import platform
+        from athens_graphops.platform import randomize_design
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.setattr(randomize_design, "load_config_file", lambda configfile: (
+            "TestQuadVU", "", "uav", 2,
+            [StudyParam("arm_length", [{"min": 0}, {"max": 1000}], "Structural")],
+            "random"))
+        args = ["random_design", "--configfile", "a.yaml", "b.yaml", "--seed", "1"]
+        with pytest.raises(ValueError, match="several concurrent studies"):
+            platform.run(args + ["--run"])
+
+        platform.run(args)
+        assert sorted(p.name for p in tmp_path.iterdir()) == \
+            ["TestQuadVU_a_study.csv", "TestQuadVU_b_study.csv"]
@@ -0,0 +1,51 @@
+import pytest
+
+from athens_graphops import CONFIG, query
+from athens_graphops.offline import DESIGNS
+from athens_graphops.platform.minimal_uav import create_minimal_uav
+from athens_graphops.replay import read_trace, replay
+
+
+@pytest.fixture
+def memory(monkeypatch):
+    monkeypatch.setitem(CONFIG, "hostname", "memory")
+    yield
+    DESIGNS.clear()
+
+
+def record_minimal_uav(monkeypatch, filename):
+    monkeypatch.setitem(CONFIG, "record", filename)
+    design_name = create_minimal_uav()[0]
+    query.connect().get_design_data(design_name)
+    monkeypatch.setitem(CONFIG, "record", None)
+    query.RECORDER.close()
+    query.RECORDER = None
+    return design_name
+
+
+class TestReplay:
+    def test_record(self, memory, monkeypatch, tmp_path):
+        design_name = record_minimal_uav(monkeypatch, str(tmp_path / "trace.jsonl"))
+        entries = read_trace(str(tmp_path / "trace.jsonl"))
+
+        assert entries[0]["script"] == "clearDesign.groovy"
+        assert entries[0]["params"] == {"__DESTDESIGN__": design_name}
+        assert entries[-1]["script"] == "design_data.groovy"
+        assert entries[-1]["size"] > 1000
+        times = [entry["time"] for entry in entries]
+        assert times == sorted(times)
+        assert all(entry["latency"] >= 0 and "error" not in entry for entry in entries)
+
+    def test_replay(self, memory, monkeypatch, tmp_path):
+        design_name = record_minimal_uav(monkeypatch, str(tmp_path / "trace.jsonl"))
+        entries = read_trace(str(tmp_path / "trace.jsonl"))
+        design_json = query.connect().get_design_data(design_name)
+        DESIGNS.clear()
+
+        results = replay(entries, speed=0)
+        assert results["scripts"] == len(entries) and results["errors"] == 0
+        assert query.connect().get_design_data(design_name) == design_json
+
+        results = replay(entries[:20], speed=0, latency=0.005)
+        assert results["wall_time"] >= 20 * 0.005
+        assert results["median_replayed_latency"] >= 0.005
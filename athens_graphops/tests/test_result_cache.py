@@ -0,0 +1,58 @@
+import zipfile
+
+from athens_graphops.result_cache import (
+    ResultCache,
+    design_fingerprint,
+    row_fingerprint,
+)
+
+FIELDNAMES = ["Flight_Path", "arm_length"]
+
+
+def write_results(filename, rows):
+    with zipfile.ZipFile(filename, "w") as zip_file:
+        zip_file.writestr("info.json", "{}")
+        for index, row in enumerate(rows):
+            zip_file.writestr("archive/result_{}/output.csv".format(index + 1),
+                              ",".join(row))
+
+
+def read_results(filename):
+    with zipfile.ZipFile(filename) as zip_file:
+        return {name: zip_file.read(name).decode() for name in zip_file.namelist()}
+
+
+class TestResultCache:
+    def test_fingerprints(self):
+        assert design_fingerprint({"a": 1, "b": [2]}) == \
+            design_fingerprint({"b": [2], "a": 1})
+        assert row_fingerprint(["a", "b"], ["1", "2"]) == \
+            row_fingerprint(["b", "a"], ["2", "1"])
+        assert row_fingerprint(["a"], [1]) == row_fingerprint(["a"], ["1"])
+
+    def test_overlapping_studies(self, tmp_path):
+        cache = ResultCache(str(tmp_path / "results" / "cache.sqlite"))
+        first = [["1", "200"], ["3", "200"]]
+        assert cache.split_rows("D", FIELDNAMES, first) == ([], [0, 1])
+        write_results(str(tmp_path / "run1.zip"), first)
+        cache.store_results("D", FIELDNAMES, first, str(tmp_path / "run1.zip"))
+
+        second = [["1", "200"], ["1", "300"], ["3", "200"], ["1", "300"]]
+        cached, evaluated = cache.split_rows("D", FIELDNAMES, second)
+        assert (cached, evaluated) == ([0, 2, 3], [1])
+        assert cache.split_rows("E", FIELDNAMES, second)[0] == [3]
+
+        run = [second[i] for i in evaluated]
+        write_results(str(tmp_path / "run2.zip"), run)
+        cache.store_results("D", FIELDNAMES, run, str(tmp_path / "run2.zip"))
+        cache.merge_results("D", FIELDNAMES, second, evaluated,
+                            str(tmp_path / "run2.zip"), str(tmp_path / "run2.zip"))
+
+        assert read_results(str(tmp_path / "run2.zip")) == {
+            "info.json": "{}",
+            "archive/result_1/output.csv": "1,200",
+            "archive/result_2/output.csv": "1,300",
+            "archive/result_3/output.csv": "3,200",
+            "archive/result_4/output.csv": "1,300",
+        }
+        cache.close()
@@ -0,0 +1,128 @@
+import gzip
+import json
+import zipfile
+
+from athens_graphops.result_store import ResultStore, read_archive_with_hash
+
+
+def write_archive(filename, lengths):
+    with zipfile.ZipFile(filename, "w") as zip_file:
+        zip_file.writestr("Quad_design_data.json", json.dumps({"design": "Quad"}))
+        zip_file.writestr("partMass.json", json.dumps({"Fuse": 1.5}))
+        for index, length in enumerate(lengths):
+            folder = "archive/result_{}/".format(index + 1)
+            zip_file.writestr(folder + "designParameters.json", json.dumps(
+                {"Fuse": {"LENGTH": length, "WIDTH": 100}, "Tags": ["a"]}))
+            zip_file.writestr(folder + "output.csv", "x")
+
+
+class TestResultStore:
+    def test_ingest_and_query(self, tmp_path):
+        write_archive(str(tmp_path / "Quad_data.zip"), [200, 300, 400])
+        study = tmp_path / "Quad_study.csv"
+        study.write_text("Flight_Path,arm_length\n1,200\n3,300\n1,400\n")
+
+        with ResultStore(str(tmp_path / "store.sqlite")) as store:
+            assert store.ingest(str(tmp_path / "Quad_data.zip"), str(study)) == 3
+            assert store.designs() == ["Quad"]
+            assert "designParameters.Fuse.LENGTH" in store.column_names
+
+            rows = store.select(["run", "designParameters.Fuse.LENGTH",
+                                 "designParameters.Tags", "files"],
+                                design="Quad", where={"study.Flight_Path": 1})
+            assert rows == [
+                {"run": 1, "designParameters.Fuse.LENGTH": 200,
+                 "designParameters.Tags": '["a"]',
+                 "files": '["designParameters.json", "output.csv"]'},
+                {"run": 3, "designParameters.Fuse.LENGTH": 400,
+                 "designParameters.Tags": '["a"]',
+                 "files": '["designParameters.json", "output.csv"]'},
+            ]
+            assert store.sql(
+                'SELECT part_mass FROM designs WHERE design = ?', ["Quad"]) == \
+                [('{"Fuse": 1.5}',)]
+
+            # ingesting again replaces the runs of the design
+            write_archive(str(tmp_path / "Quad_data.zip"), [500])
+            store.ingest(str(tmp_path / "Quad_data.zip"))
+            assert store.select(["run", "designParameters.Fuse.LENGTH"]) == \
+                [{"run": 1, "designParameters.Fuse.LENGTH": 500}]
+
+    def test_ingest_many(self, tmp_path):
+        for name, lengths in [("A", [1, 2]), ("B", [3]), ("C", [4, 5, 6])]:
+            write_archive(str(tmp_path / (name + "_data.zip")), lengths)
+        filenames = [str(tmp_path / (name + "_data.zip")) for name in "ABC"]
+        (tmp_path / "A_study.csv").write_text("Flight_Path,arm_length\n1,200\n3,300\n")
+
+        with ResultStore(str(tmp_path / "store.sqlite")) as store:
+            assert store.ingest_many(filenames, workers=2) == 3
+            assert store.designs() == ["A", "B", "C"]
+            assert len(store.select(["run"])) == 6
+
+            # the study file next to the archive is used
+            rows = store.select(["design", "run", "study.arm_length"],
+                                where={"study.Flight_Path": 3})
+            assert rows == [{"design": "A", "run": 2, "study.arm_length": 300}]
+            assert all(row["row_hash"] for row in store.select(["row_hash"], design="A"))
+            assert store.select(["row_hash", "study.arm_length"], design="C")[0] == \
+                {"row_hash": None, "study.arm_length": None}
+
+            write_archive(filenames[1], [7, 8])
+            assert store.ingest_many(filenames, workers=2) == 1
+            assert store.select(["run", "designParameters.Fuse.LENGTH"],
+                                design="B") == [
+                {"run": 1, "designParameters.Fuse.LENGTH": 7},
+                {"run": 2, "designParameters.Fuse.LENGTH": 8}]
+            assert store.ingest_many(filenames, workers=2, force=True) == 3
+
+    def test_known_hash_is_not_recomputed(self, tmp_path):
+        write_archive(str(tmp_path / "Quad_data.zip"), [200])
+        hash, archive = read_archive_with_hash(str(tmp_path / "Quad_data.zip"), "known")
+        assert hash == "known"
+        assert list(archive["runs"]) == [1]
+
+    def test_many_values(self, tmp_path):
+        # more distinct values than the 2000 columns an SQLite table can have
+        filename = str(tmp_path / "Wide_data.zip")
+        with zipfile.ZipFile(filename, "w") as zip_file:
+            for run in [1, 2]:
+                zip_file.writestr(
+                    "archive/result_{}/output.json".format(run), json.dumps(
+                        {"Part{}".format(i): {"MASS": i * run} for i in range(2500)}))
+
+        with ResultStore(str(tmp_path / "store.sqlite")) as store:
+            assert store.ingest(filename) == 2
+            assert len(store.column_names) == 4 + 2500
+            assert store.select(["run", "output.Part7.MASS"],
+                                where={"output.Part2499.MASS": 4998}) == \
+                [{"run": 2, "output.Part7.MASS": 14}]
+            assert len(store.select(design="Wide")[0]) == 4 + 2500
+            assert store.sql("SELECT COUNT(*) FROM run_values") == [(5000,)]
+
+    def test_study_files_and_unreadable_archives(self, tmp_path, monkeypatch):
+        results = tmp_path / "results"
+        results.mkdir()
+        for name in "ABC":
+            write_archive(str(results / (name + "_data.zip")), [1, 2])
+        (results / "broken_data.zip").write_text("not a zip file")
+        filenames = [str(results / (name + "_data.zip"))
+                     for name in ["A", "B", "C", "broken", "missing"]]
+
+        # the platform command writes the study files into the current directory
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "A_study.csv").write_text("arm_length\n200\n300\n")
+        with gzip.open(str(tmp_path / "B_study.csv.gz"), "wt") as file:
+            file.write("arm_length\n400\n500\n")
+        (results / "C_study.csv").write_text("arm_length\n600\n700\n")
+
+        with ResultStore(str(tmp_path / "store.sqlite")) as store:
+            assert store.ingest_many(filenames, workers=2) == 3
+            assert store.select(["design", "study.arm_length"]) == [
+                {"design": "A", "study.arm_length": 200},
+                {"design": "A", "study.arm_length": 300},
+                {"design": "B", "study.arm_length": 400},
+                {"design": "B", "study.arm_length": 500},
+                {"design": "C", "study.arm_length": 600},
+                {"design": "C", "study.arm_length": 700},
+            ]
+            assert store.ingest_many(filenames, workers=2, force=True) == 3
@@ -0,0 +1,47 @@
+import subprocess
+import sys
+
+import pytest
+
+from athens_graphops.__main__ import command_position
+
+CHECK_SCRIPT = """
+import sys
+from athens_graphops.__main__ import import_command
+import_command(sys.argv[1])
+print(" ".join(sorted(sys.modules)))
+"""
+
+
+def imported_modules(command):
+    output = subprocess.run(
+        [sys.executable, "-c", CHECK_SCRIPT, command],
+        check=True, stdout=subprocess.PIPE, universal_newlines=True)
+    return set(output.stdout.split())
+
+
+class TestStartup:
+    @pytest.mark.parametrize("command", ["query", "dataset", "autograph"])
+    def test_no_workflow_stack(self, command):
+        modules = imported_modules(command)
+        assert "athens_graphops.workflow" not in modules
+        assert "api4jenkins" not in modules
+        assert "minio" not in modules
+
+    def test_query_does_not_load_corpus(self):
+        modules = imported_modules("query")
+        assert "athens_graphops.dataset" not in modules
+
+    def test_corpus_is_loaded_on_first_use(self):
+        output = subprocess.run(
+            [sys.executable, "-c",
+             "import athens_graphops.dataset as d; print('CORPUS_DATA' in vars(d));"
+             "d.CORPUS_INDEX; print('CORPUS_DATA' in vars(d))"],
+            check=True, stdout=subprocess.PIPE, universal_newlines=True)
+        assert output.stdout.split() == ["False", "True"]
+
+    def test_command_name_as_subcommand_argument(self):
+        assert command_position(["athens-graphops", "benchmark", "--startup", "query"]) == 2
+        assert command_position(["athens-graphops", "--host", "a", "query", "--script",
+                                 "x", "--params", "platform", "dataset"]) == 4
+        assert command_position(["athens-graphops", "--help"]) == 2
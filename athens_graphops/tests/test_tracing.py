@@ -0,0 +1,81 @@
+import json
+import threading
+
+import pytest
+
+from athens_graphops import CONFIG, tracing
+from athens_graphops.tracing import NULL_SPAN, Tracer, current_span, span, traced
+
+
+@pytest.fixture
+def tracer(monkeypatch, tmp_path):
+    monkeypatch.setitem(CONFIG, "trace", str(tmp_path / "trace.json"))
+    monkeypatch.setattr(tracing, "TRACER", Tracer())
+    return tracing.TRACER
+
+
+class TestTracing:
+    def test_disabled(self, monkeypatch):
+        monkeypatch.setitem(CONFIG, "trace", None)
+        with span("design") as design_span:
+            design_span.set("design", "A")
+        assert design_span is NULL_SPAN
+        assert current_span() is None
+
+    def test_nested_spans(self, tracer):
+        @traced("inner")
+        def inner():
+            raise ValueError("failed")
+
+        with span("outer", design="A") as outer:
+            outer.set("rows", 3)
+            with pytest.raises(ValueError):
+                inner()
+            assert current_span() is outer
+
+            parent = current_span()
+            thread = threading.Thread(
+                target=lambda: span("build", parent=parent).start().stop())
+            thread.start()
+            thread.join()
+        open_span = span("open").start()
+
+        events = {event["name"]: event for event in tracer.chrome_events()}
+        assert events["outer"]["args"] == {"design": "A", "rows": 3, "span_id": 1}
+        assert events["inner"]["args"]["parent_id"] == 1
+        assert "ValueError" in events["inner"]["args"]["error"]
+        assert events["build"]["args"]["parent_id"] == 1
+        assert events["build"]["tid"] != events["outer"]["tid"]
+        assert events["open"]["args"]["unfinished"]
+        assert "parent_id" not in events["open"]["args"]
+        assert events["outer"]["ts"] <= events["inner"]["ts"]
+        assert events["inner"]["ts"] + events["inner"]["dur"] <= \
+            events["outer"]["ts"] + events["outer"]["dur"]
+        open_span.stop()
+
+    def test_write_trace(self, tracer):
+        with span("outer"):
+            pass
+        open_span = span("open").start()
+        tracing.write_trace()
+        open_span.stop()
+        with open(CONFIG["trace"]) as file:
+            trace = json.load(file)
+        assert [event["name"] for event in trace["traceEvents"]] == ["outer", "open"]
+        assert [event["ph"] for event in trace["traceEvents"]] == ["X", "X"]
+        assert trace["traceEvents"][1]["args"]["unfinished"]
+
+    def test_finished_spans_are_streamed(self, tracer):
+        with span("outer"):
+            for index in range(1000):
+                with span("script", index=index):
+                    pass
+            assert len(tracer.open_spans) == 1
+        assert tracer.open_spans == {}
+        assert tracer.written == 1001
+
+        tracing.write_trace()
+        with open(CONFIG["trace"]) as file:
+            trace = json.load(file)
+        assert len(trace["traceEvents"]) == 1001
+        assert trace["traceEvents"][-1]["name"] == "outer"
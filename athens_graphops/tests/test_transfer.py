@@ -0,0 +1,117 @@
+import gzip
+import hashlib
+import io
+import threading
+
+from athens_graphops.transfer import MinioTransfer, object_etag
+
+
+class FakeObject:
+    def __init__(self, object_name, data, metadata):
+        self.object_name = object_name
+        self.size = len(data)
+        self.metadata = metadata or {}
+        self.etag = '"{}"'.format(object_etag_bytes(data))
+
+
+def object_etag_bytes(data, part_size=1024):
+    digests = [hashlib.md5(data[i:i + part_size]).digest()
+               for i in range(0, len(data), part_size)]
+    if len(digests) == 1:
+        return digests[0].hex()
+    return "{}-{}".format(hashlib.md5(b"".join(digests)).hexdigest(), len(digests))
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = io.BytesIO(data)
+
+    def stream(self, amt, decode_content=None):
+        for chunk in iter(lambda: self.data.read(amt), b""):
+            yield chunk
+
+    def close(self):
+        pass
+
+    def release_conn(self):
+        pass
+
+
+class FakeMinio:
+    """In-memory stand-in for the parts of the Minio client used."""
+
+    def __init__(self):
+        self.objects = dict()
+        self.uploads = 0
+        self.ranges = []
+        self.lock = threading.Lock()
+
+    def stat_object(self, bucket, name):
+        data, metadata = self.objects[(bucket, name)]
+        return FakeObject(name, data, metadata)
+
+    def fput_object(self, bucket, name, filename, metadata=None,
+                    part_size=0, num_parallel_uploads=3):
+        with open(filename, "rb") as file:
+            self.objects[(bucket, name)] = (file.read(), metadata)
+        self.uploads += 1
+
+    def get_object(self, bucket, name, offset=0, length=0):
+        with self.lock:
+            self.ranges.append((offset, length))
+        data = self.objects[(bucket, name)][0]
+        return FakeResponse(data[offset:offset + length])
+
+    def list_objects(self, bucket, prefix=None, recursive=False):
+        return [FakeObject(name, data, metadata)
+                for (b, name), (data, metadata) in sorted(self.objects.items())
+                if b == bucket and name.startswith(prefix)]
+
+
+class TestMinioTransfer:
+    def test_upload_skipped_when_unchanged(self, tmp_path):
+        minio = FakeMinio()
+        transfer = MinioTransfer(minio, "bucket", part_size=1024)
+        filename = tmp_path / "study.csv"
+        filename.write_bytes(b"a,b\n" * 1000)
+
+        assert transfer.upload_file(str(filename))
+        assert object_etag(str(filename), 1024).endswith("-4")
+        assert not transfer.upload_file(str(filename))
+        filename.write_bytes(b"a,b\n" * 1001)
+        assert transfer.upload_file(str(filename))
+        assert minio.uploads == 2
+
+    def test_compressed_round_trip(self, tmp_path):
+        minio = FakeMinio()
+        transfer = MinioTransfer(minio, "bucket", part_size=1024,
+                                 compress_size=100)
+        content = b"Flight_Path,arm_length\n" + b"1,200\n" * 2000
+        (tmp_path / "study.csv").write_bytes(content)
+
+        transfer.upload_file(str(tmp_path / "study.csv"), "study.csv",
+                             compress=True)
+        data, metadata = minio.objects[("bucket", "study.csv")]
+        assert metadata == {"Content-Encoding": "gzip"}
+        assert gzip.decompress(data) == content
+        assert not transfer.upload_file(str(tmp_path / "study.csv"), "study.csv",
+                                        compress=True)
+
+        transfer.download_file("study.csv", str(tmp_path / "copy.csv"))
+        assert (tmp_path / "copy.csv").read_bytes() == content
+
+    def test_download_prefix_in_parts(self, tmp_path):
+        minio = FakeMinio()
+        contents = {"run/result_1/out.json": bytes(range(256)) * 20,
+                    "run/result_2/out.json": b"{}",
+                    "other.csv": b"x"}
+        for name, data in contents.items():
+            minio.objects[("bucket", name)] = (data, None)
+
+        transfer = MinioTransfer(minio, "bucket", part_size=1000)
+        filenames = transfer.download_prefix("run/", str(tmp_path))
+        assert len(filenames) == 2
+        assert (tmp_path / "result_1" / "out.json").read_bytes() == \
+            contents["run/result_1/out.json"]
+        assert (tmp_path / "result_2" / "out.json").read_bytes() == b"{}"
+        assert len(minio.ranges) == 7
@@ -0,0 +1,412 @@
+import hashlib
+import http.server
+import io
+import json
+import os
+import socket
+import threading
+import time
+import urllib.parse
+import zipfile
+
+import pytest
+import requests
+
+from athens_graphops import workflow
+from athens_graphops.workflow import (
+    AdaptivePoller,
+    BuildOrchestrator,
+    JenkinsClient,
+    download_file,
+)
+
+
+class FakeJenkinsClient:
+    def __init__(self, executors):
+        self.executors = executors
+        self.running = 0
+        self.max_running = 0
+        self.lock = threading.Lock()
+
+    def online_executors(self):
+        return self.executors
+
+    def build_and_wait(self, job_name, parameters, stream_console=True):
+        assert not stream_console
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(0.05 if parameters["slow"] else 0.01)
+        with self.lock:
+            self.running -= 1
+        if parameters["fail"]:
+            raise RuntimeError("build failed")
+        return parameters["id"]
+
+
+class TestBuildOrchestrator:
+    def test_builds_limited_to_executors(self):
+        client = FakeJenkinsClient(executors=3)
+        finished = []
+        with BuildOrchestrator(client) as orchestrator:
+            for i in range(9):
+                orchestrator.submit(
+                    "uam_direct2cad", {"id": i, "slow": i == 0, "fail": i == 4},
+                    on_finished=lambda build: finished.append(build) or build * 10)
+            results = orchestrator.wait()
+
+        assert client.max_running == 3
+        assert results == [0, 10, 20, 30, None, 50, 60, 70, 80]
+        # results are handled as the builds finish, not in submission order
+        assert finished.index(0) > 0
+
+    def test_explicit_limit(self):
+        client = FakeJenkinsClient(executors=0)
+        with BuildOrchestrator(client, max_builds=2) as orchestrator:
+            for i in range(4):
+                orchestrator.submit("job", {"id": i, "slow": False, "fail": False})
+            assert orchestrator.wait() == [0, 1, 2, 3]
+        assert client.max_running == 2
+
+
+class StubJenkins(http.server.ThreadingHTTPServer):
+    """
+    A local Jenkins stand-in with a single job, serving the parts of the
+    REST API that JenkinsClient uses. Queued builds start when an executor
+    is free, run for duration seconds while their console log grows, and
+    their data.zip artifact appears artifact_delay seconds after the end.
+    """
+
+    def __init__(self, executors=2, duration=0.3, result="SUCCESS",
+                 artifact_delay=0.0, artifacts=True):
+        super().__init__(("127.0.0.1", 0), StubJenkinsHandler)
+        self.url = "http://127.0.0.1:%d/" % self.server_port
+        self.executors = executors
+        self.duration = duration
+        self.result = result
+        self.artifact_delay = artifact_delay
+        self.artifacts = artifacts
+        self.lock = threading.Lock()
+        self.queue = []
+        self.builds = []
+        self.max_running = 0
+        self.max_in_flight = 0
+
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w") as zip_file:
+            zip_file.writestr("output.csv", "Flight_Path,Score\n1,2\n")
+        self.artifact = buffer.getvalue()
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
+
+    def running(self, now):
+        return sum(1 for build in self.builds if now < build["start"] + self.duration)
+
+    def in_flight(self, now):
+        return sum(1 for item in self.queue if item["build"] is None or
+                   now < self.builds[item["build"] - 1]["start"] + self.duration)
+
+    def start_builds(self):
+        now = time.monotonic()
+        for item in self.queue:
+            if item["build"] is None and self.running(now) < self.executors:
+                item["build"] = len(self.builds) + 1
+                self.builds.append({"start": now, "parameters": item["parameters"]})
+        self.max_running = max(self.max_running, self.running(now))
+
+    def build_json(self, number):
+        build = self.builds[number - 1]
+        elapsed = time.monotonic() - build["start"]
+        finished = elapsed >= self.duration
+        data = {
+            "_class": "hudson.model.FreeStyleBuild",
+            "number": number,
+            "url": "%sjob/uam_direct2cad/%d/" % (self.url, number),
+            "result": self.result if finished else None,
+            "duration": int(self.duration * 1000) if finished else 0,
+            "artifacts": [],
+            "fingerprint": [],
+        }
+        if finished and self.artifacts and elapsed >= self.duration + self.artifact_delay:
+            data["artifacts"] = [{"relativePath": "data.zip", "fileName": "data.zip"}]
+            data["fingerprint"] = [{"fileName": "data.zip",
+                                    "hash": hashlib.md5(self.artifact).hexdigest()}]
+        return data
+
+    def console(self, number):
+        build = self.builds[number - 1]
+        lines = ["step %d" % i for i in range(10)]
+        elapsed = time.monotonic() - build["start"]
+        visible = min(len(lines), int(len(lines) * elapsed / self.duration))
+        return "".join(line + "\n" for line in lines[:visible]).encode()
+
+
+class StubJenkinsHandler(http.server.BaseHTTPRequestHandler):
+    def send(self, status, body=b"", headers=()):
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body).encode()
+        self.send_response(status)
+        for key, value in headers:
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        url = urllib.parse.urlparse(self.path)
+        stub = self.server
+        if url.path == "/job/uam_direct2cad/buildWithParameters":
+            with stub.lock:
+                stub.queue.append({
+                    "parameters": dict(urllib.parse.parse_qsl(url.query)),
+                    "build": None})
+                stub.max_in_flight = max(stub.max_in_flight, stub.in_flight(time.monotonic()))
+                location = "%squeue/item/%d/" % (stub.url, len(stub.queue))
+            self.send(201, headers=[("Location", location)])
+        else:
+            self.send(404)
+
+    def do_GET(self):
+        url = urllib.parse.urlparse(self.path)
+        query = dict(urllib.parse.parse_qsl(url.query))
+        parts = url.path.strip("/").split("/")
+        stub = self.server
+        with stub.lock:
+            stub.start_builds()
+            if url.path == "/crumbIssuer/api/json":
+                self.send(200, {"crumbRequestField": "Jenkins-Crumb", "crumb": "0"})
+            elif url.path == "/api/json":
+                self.send(200, {"_class": "hudson.model.Hudson", "jobs": [{
+                    "_class": "hudson.model.FreeStyleProject",
+                    "name": "uam_direct2cad",
+                    "url": stub.url + "job/uam_direct2cad/"}]})
+            elif url.path == "/computer/api/json":
+                computers = [{"_class": "hudson.model.Hudson$MasterComputer",
+                              "displayName": "(built-in)", "offline": False}]
+                computers += [{"_class": "hudson.slaves.SlaveComputer",
+                               "displayName": "agent%d" % i, "offline": False}
+                              for i in range(stub.executors)]
+                computers.append({"_class": "hudson.slaves.SlaveComputer",
+                                  "displayName": "down", "offline": True})
+                self.send(200, {"computer": computers})
+            elif url.path == "/job/uam_direct2cad/api/json":
+                self.send(200, {"_class": "hudson.model.FreeStyleProject", "builds": [
+                    stub.build_json(number) for number in range(1, len(stub.builds) + 1)]})
+            elif parts[:2] == ["queue", "item"] and parts[3:] == ["api", "json"]:
+                item = stub.queue[int(parts[2]) - 1]
+                if item["build"] is None:
+                    self.send(200, {"_class": "hudson.model.Queue$BlockedItem",
+                                    "id": int(parts[2])})
+                else:
+                    self.send(200, {"_class": "hudson.model.Queue$LeftItem",
+                                    "id": int(parts[2]),
+                                    "executable": stub.build_json(item["build"])})
+            elif parts[:1] == ["job"] and parts[3:] == ["api", "json"]:
+                self.send(200, stub.build_json(int(parts[2])))
+            elif parts[:1] == ["job"] and parts[3:] == ["logText", "progressiveText"]:
+                text = stub.console(int(parts[2]))
+                start = int(query.get("start", 0))
+                self.send(200, text[start:], [("X-Text-Size", str(len(text)))])
+            elif parts[:1] == ["job"] and parts[3:] == ["artifact", "data.zip"]:
+                if stub.build_json(int(parts[2]))["artifacts"]:
+                    self.send(200, stub.artifact)
+                else:
+                    self.send(404)
+            else:
+                self.send(404)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeMinio:
+    def __init__(self, host, access_key, secret_key, secure):
+        pass
+
+    def bucket_exists(self, bucket):
+        return True
+
+
+@pytest.fixture
+def stub_client(monkeypatch, tmp_path):
+    """Returns a function connecting a JenkinsClient to a stub server."""
+    monkeypatch.setattr(workflow, "Minio", FakeMinio)
+    # poll the stub server quickly
+    monkeypatch.setattr(AdaptivePoller, "sleep", lambda self: time.sleep(0.02))
+    clients = []
+
+    def connect(stub):
+        client = JenkinsClient(stub.url.rstrip("/"))
+        client.results_dir = str(tmp_path)
+        clients.append(client)
+        return client
+
+    yield connect
+    for client in clients:
+        client.close()
+
+
+class TestStubJenkins:
+    def test_builds_limited_to_online_executors(self, stub_client, tmp_path):
+        with StubJenkins(executors=2, duration=0.3) as stub:
+            client = stub_client(stub)
+            assert client.online_executors() == 2
+
+            def on_finished(name):
+                def finish(build):
+                    assert client.wait_for_artifacts(build)
+                    return client.save_results_from_build(build, name)
+                return finish
+
+            with BuildOrchestrator(client) as orchestrator:
+                for i in range(5):
+                    orchestrator.submit("uam_direct2cad", {"paramFile": "study%d.csv" % i},
+                                        on_finished("Design%d" % i))
+                results = orchestrator.wait()
+
+        assert results == [True] * 5
+        assert stub.max_in_flight == 2 and stub.max_running == 2
+        assert sorted(build["parameters"]["paramFile"] for build in stub.builds) == \
+            ["study%d.csv" % i for i in range(5)]
+        for i in range(5):
+            with zipfile.ZipFile(str(tmp_path / ("Design%d_data.zip" % i))) as zip_file:
+                assert zip_file.namelist() == ["output.csv"]
+
+
+class TestBuildPolling:
+    def test_console_is_streamed(self, stub_client, capsys):
+        with StubJenkins(duration=0.3) as stub:
+            client = stub_client(stub)
+            build = client.build_and_wait("uam_direct2cad", {"paramFile": "study.csv"})
+            assert build.result == "SUCCESS"
+
+        lines = [line for line in capsys.readouterr().out.splitlines()
+                 if line.startswith("[uam_direct2cad #1] ")]
+        assert lines == ["[uam_direct2cad #1] step %d" % i for i in range(10)]
+
+    def test_print_console_offsets(self, stub_client, capsys):
+        with StubJenkins(duration=0.2) as stub:
+            client = stub_client(stub)
+            build = client.build_and_wait("uam_direct2cad", {"paramFile": "study.csv"},
+                                           stream_console=False)
+            capsys.readouterr()
+            offset = client.print_console(build, 0)
+            assert offset == len(stub.console(1))
+            assert client.print_console(build, offset) == offset
+        assert capsys.readouterr().out.splitlines() == ["step %d" % i for i in range(10)]
+
+    def test_expected_duration(self, stub_client):
+        with StubJenkins(duration=0.2) as stub:
+            client = stub_client(stub)
+            job = client.server.get_job("uam_direct2cad")
+            assert client.expected_duration(job) is None
+            client.build_and_wait("uam_direct2cad", {"paramFile": "study.csv"},
+                                  stream_console=False)
+            assert client.expected_duration(job) == pytest.approx(0.2)
+
+    def test_artifacts_of_unstable_builds(self, stub_client, tmp_path):
+        with StubJenkins(duration=0.1, result="UNSTABLE", artifact_delay=0.3) as stub:
+            client = stub_client(stub)
+            build = client.build_and_wait("uam_direct2cad", {"paramFile": "study.csv"},
+                                           stream_console=False)
+            assert build.result == "UNSTABLE"
+            assert client.wait_for_artifacts(build)
+            assert client.save_results_from_build(build, "Unstable")
+        assert zipfile.is_zipfile(str(tmp_path / "Unstable_data.zip"))
+
+    def test_missing_artifacts(self, stub_client):
+        with StubJenkins(duration=0.1, result="FAILURE", artifacts=False) as stub:
+            client = stub_client(stub)
+            build = client.build_and_wait("uam_direct2cad", {"paramFile": "study.csv"},
+                                           stream_console=False)
+            start = time.monotonic()
+            assert not client.wait_for_artifacts(build, failed_timeout=0.2)
+            assert time.monotonic() - start < 5.0
+            assert not client.save_results_from_build(build, "Failed")
+
+
+class TestAdaptivePoller:
+    def test_exponential_backoff(self):
+        poller = AdaptivePoller(initial=1.0, factor=2.0, maximum=5.0)
+        intervals = [poller.next_interval(0.0) for _ in range(5)]
+        assert intervals == [1.0, 2.0, 4.0, 5.0, 5.0]
+
+    def test_expected_duration(self):
+        poller = AdaptivePoller(expected=100.0, initial=1.0, factor=2.0,
+                                maximum=30.0)
+        assert poller.next_interval(0.0) == 30.0
+        assert poller.next_interval(90.0) == 5.0
+        assert poller.next_interval(96.0) == 4.0
+        # past the expected end the backoff starts again
+        assert poller.next_interval(101.0) == 1.0
+        assert poller.next_interval(102.0) == 2.0
+
+
+class RangeHandler(http.server.BaseHTTPRequestHandler):
+    content = bytes(range(256)) * 400
+    requests = []
+
+    def do_GET(self):
+        start = 0
+        if "Range" in self.headers:
+            start = int(self.headers["Range"][len("bytes="):-1])
+        self.requests.append(start)
+        data = self.content[start:]
+        self.send_response(206 if start else 200)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        if len(self.requests) == 1:
+            # drop the connection in the middle of the first download
+            self.wfile.write(data[:len(data) // 3])
+            self.wfile.flush()
+            self.connection.shutdown(socket.SHUT_RDWR)
+        else:
+            self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestDownload:
+    def test_interrupted_download_is_resumed(self, tmp_path):
+        RangeHandler.requests = []
+        server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), RangeHandler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            url = "http://127.0.0.1:%d/data.zip" % server.server_port
+            filename = str(tmp_path / "data.zip")
+            md5 = hashlib.md5(RangeHandler.content).hexdigest()
+            with requests.Session() as session:
+                size = download_file(session, url, filename, md5, chunk_size=1000)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        assert size == len(RangeHandler.content)
+        with open(filename, "rb") as file:
+            assert file.read() == RangeHandler.content
+        assert RangeHandler.requests[0] == 0 and RangeHandler.requests[1] > 0
+        assert not os.path.exists(filename + ".part")
+
+    def test_checksum_mismatch(self, tmp_path):
+        RangeHandler.requests = [None]
+        server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), RangeHandler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            url = "http://127.0.0.1:%d/data.zip" % server.server_port
+            filename = str(tmp_path / "data.zip")
+            with requests.Session() as session:
+                with pytest.raises(ValueError):
+                    download_file(session, url, filename, "0" * 32)
+        finally:
+            server.shutdown()
+            server.server_close()
+        assert not os.path.exists(filename)
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+# Copyright (C) 2022, Miklos Maroti
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#===============================================================================
+# Lightweight tracing of the stages of a design campaign (design creation,
+# study files, MinIO transfers, Jenkins builds, result processing). Spans are
+# only collected when CONFIG["trace"] is set. Each span is written into that
+# file in the Chrome trace event format as soon as it finishes (so long runs
+# with millions of script spans keep only the open spans in memory), and the
+# file is completed at exit. It can be opened in chrome://tracing or
+# https://ui.perfetto.dev to see where the time goes.
+
+from typing import Any, Dict, List, Optional
+
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+
+from . import CONFIG
+
+
+class Span():
+    """
+    A named time interval with attributes. Spans started on the same thread
+    (or asyncio task) while this span is open become its children, spans on
+    other threads can name it as their parent explicitly.
+    """
+
+    def __init__(self, tracer: 'Tracer', name: str, attributes: Dict[str, Any],
+                 parent: Optional['Span']):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+        self.parent = parent
+        self.id = None
+        self.thread = None
+        self.start_time = None
+        self.end_time = None
+
+    def set(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def start(self) -> 'Span':
+        self.tracer.start_span(self)
+        return self
+
+    def stop(self):
+        if self.end_time is None:
+            self.tracer.stop_span(self)
+
+    def __enter__(self) -> 'Span':
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.set("error", repr(exc_value))
+        self.stop()
+
+
+class NullSpan():
+    """The span returned when tracing is disabled, it does nothing."""
+
+    def set(self, key: str, value: Any):
+        pass
+
+    def start(self) -> 'NullSpan':
+        return self
+
+    def stop(self):
+        pass
+
+    def __enter__(self) -> 'NullSpan':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+
+NULL_SPAN = NullSpan()
+
+
+class Tracer():
+    """
+    Keeps the open spans and streams the finished ones into the trace file,
+    which is CONFIG["trace"] unless another filename is given.
+    """
+
+    def __init__(self, filename: Optional[str] = None):
+        self.filename = filename
+        self.file = None
+        self.closed = False
+        self.written = 0
+        self.open_spans: Dict[int, Span] = dict()
+        self.last_id = 0
+        self.lock = threading.Lock()
+        # the open spans, new threads and asyncio tasks get their own copy
+        self.stack = contextvars.ContextVar("stack", default=())
+        self.origin = time.perf_counter()
+        self.pid = os.getpid()
+
+    def current(self) -> Optional[Span]:
+        stack = self.stack.get()
+        return stack[-1] if stack else None
+
+    def start_span(self, span: Span):
+        if span.parent is None:
+            span.parent = self.current()
+        span.thread = threading.get_ident()
+        with self.lock:
+            self.last_id += 1
+            span.id = self.last_id
+            self.open_spans[span.id] = span
+        self.stack.set(self.stack.get() + (span,))
+        span.start_time = time.perf_counter()
+
+    def stop_span(self, span: Span):
+        span.end_time = time.perf_counter()
+        stack = self.stack.get()
+        if span in stack:
+            self.stack.set(tuple(other for other in stack if other is not span))
+        event = self.chrome_event(span, span.end_time)
+        with self.lock:
+            del self.open_spans[span.id]
+            self.write_event(event)
+        # the finished span is not needed by its children any more
+        span.parent = None
+
+    def chrome_event(self, span: Span, end_time: float) -> Dict[str, Any]:
+        args = dict(span.attributes)
+        args["span_id"] = span.id
+        if span.parent is not None:
+            args["parent_id"] = span.parent.id
+        if span.end_time is None:
+            args["unfinished"] = True
+        return {
+            "name": span.name,
+            "ph": "X",
+            "ts": (span.start_time - self.origin) * 1e6,
+            "dur": (end_time - span.start_time) * 1e6,
+            "pid": self.pid,
+            "tid": span.thread,
+            "args": args,
+        }
+
+    def open_file(self):
+        # called with the lock held
+        if self.file is None:
+            self.file = open(self.filename or CONFIG["trace"], "w")
+            self.file.write('{"traceEvents": [')
+
+    def write_event(self, event: Dict[str, Any]):
+        # called with the lock held
+        if self.closed:
+            return
+        self.open_file()
+        if self.written:
+            self.file.write(",")
+        self.file.write("\n" + json.dumps(event, default=str))
+        self.written += 1
+
+    def chrome_events(self) -> List[Dict[str, Any]]:
+        """
+        Returns the spans written so far and the open spans (ending at the
+        current time) as complete events of the Chrome trace format, in the
+        order they were started.
+        """
+        now = time.perf_counter()
+        with self.lock:
+            open_spans = list(self.open_spans.values())
+            if self.file is not None:
+                self.file.flush()
+                with open(self.file.name) as file:
+                    text = file.read()
+                events = json.loads(text + ("" if self.closed else "]}"))["traceEvents"]
+            else:
+                events = []
+        events.extend(self.chrome_event(span, now) for span in open_spans)
+        return sorted(events, key=lambda event: event["args"]["span_id"])
+
+    def close(self):
+        """
+        Writes the still open spans as unfinished and completes the trace
+        file, later spans are not written.
+        """
+        now = time.perf_counter()
+        with self.lock:
+            if self.closed:
+                return
+            for span in list(self.open_spans.values()):
+                self.write_event(self.chrome_event(span, now))
+            self.open_file()
+            self.file.write('\n], "displayTimeUnit": "ms"}\n')
+            self.file.close()
+            self.closed = True
+        print("Trace of {} spans written to {}".format(self.written, self.file.name))
+
+
+TRACER = Tracer()
+
+
+def span(name: str, parent: Optional[Span] = None, **attributes) -> Any:
+    """
+    Returns a new span (to be used as a context manager or started and
+    stopped explicitly), or a span doing nothing when tracing is disabled.
+
+    Example usage:
+        with span("upload", filename=study_filename):
+            ...
+    """
+    if not CONFIG["trace"]:
+        return NULL_SPAN
+    return Span(TRACER, name, attributes, parent)
+
+
+def current_span() -> Optional[Span]:
+    if not CONFIG["trace"]:
+        return None
+    return TRACER.current()
+
+
+def traced(name: str):
+    """
+    Decorator that runs the function in a span of the given name.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def write_trace():
+    """Completes the CONFIG["trace"] file with the spans that are still open."""
+    if CONFIG["trace"]:
+        TRACER.close()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# Copyright (C) 2022, Miklos Maroti
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#===============================================================================
+# Parallel transfers of study files and results to and from a MinIO bucket.
+# Large objects are uploaded and downloaded in parts by several threads,
+# uploads are skipped when the object in the bucket already has the same
+# content, and whole prefixes (e.g. the results of a run) are fetched at once.
+
+from typing import Any, List, Optional
+
+import gzip
+import hashlib
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+PART_SIZE = 16 * 1024 * 1024
+
+
+def object_etag(filename: str, part_size: int = PART_SIZE) -> str:
+    """
+    The S3 ETag of the file when uploaded in parts of part_size bytes: the
+    md5 hash for a single part, otherwise the md5 hash of the md5 hashes
+    of the parts followed by the number of parts.
+    """
+    digests = []
+    with open(filename, "rb") as file:
+        for chunk in iter(lambda: file.read(part_size), b""):
+            digests.append(hashlib.md5(chunk).digest())
+    if not digests:
+        return hashlib.md5(b"").hexdigest()
+    if len(digests) == 1:
+        return digests[0].hex()
+    return "{}-{}".format(hashlib.md5(b"".join(digests)).hexdigest(), len(digests))
+
+
+class MinioTransfer():
+    """
+    Transfers files between the local disk and a bucket of a Minio client.
+    Uploads of files larger than compress_size are gzip compressed when
+    compress is requested, and are stored with a gzip Content-Encoding.
+    """
+
+    def __init__(self, minio: Any, bucket: str, part_size: int = PART_SIZE,
+                 workers: int = 4, compress_size: int = 1024 * 1024):
+        self.minio = minio
+        self.bucket = bucket
+        self.part_size = part_size
+        self.workers = workers
+        self.compress_size = compress_size
+
+    def remote_etag(self, object_name: str) -> Optional[str]:
+        try:
+            return self.minio.stat_object(self.bucket, object_name).etag.strip('"')
+        except Exception:
+            return None
+
+    def upload_file(self, filename: str, object_name: Optional[str] = None,
+                    compress: bool = False) -> bool:
+        """
+        Uploads the file unless the object already has the same content,
+        returns True if the file was uploaded.
+        """
+        if object_name is None:
+            object_name = os.path.basename(filename)
+
+        metadata = None
+        upload_filename = filename
+        if compress and os.path.getsize(filename) > self.compress_size:
+            # no name and timestamp, so the same content gives the same ETag
+            with tempfile.NamedTemporaryFile(suffix=".gz", delete=False) as temp:
+                with open(filename, "rb") as source, \
+                        gzip.GzipFile(filename="", fileobj=temp, mode="wb",
+                                      mtime=0) as target:
+                    shutil.copyfileobj(source, target, self.part_size)
+            upload_filename = temp.name
+            metadata = {"Content-Encoding": "gzip"}
+
+        try:
+            if self.remote_etag(object_name) == object_etag(upload_filename, self.part_size):
+                print(f"MinIO {self.bucket}/{object_name} is up to date.")
+                return False
+
+            self.minio.fput_object(
+                self.bucket, object_name, upload_filename, metadata=metadata,
+                part_size=self.part_size, num_parallel_uploads=self.workers)
+            print(f"Uploaded to MinIO {self.bucket}/{object_name}.")
+            return True
+        finally:
+            if upload_filename != filename:
+                os.remove(upload_filename)
+
+    def download_file(self, object_name: str, filename: str) -> int:
+        """
+        Downloads the object into filename, large objects are fetched in
+        parts by several threads. Compressed uploads are decompressed.
+        Returns the size of the object in the bucket.
+        """
+        stat = self.minio.stat_object(self.bucket, object_name)
+        size = stat.size
+        dirname = os.path.dirname(filename)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+
+        part_filename = filename + ".part"
+        with open(part_filename, "wb") as file:
+            file.truncate(size)
+
+        def fetch(offset: int):
+            response = self.minio.get_object(
+                self.bucket, object_name, offset=offset,
+                length=min(self.part_size, size - offset))
+            try:
+                with open(part_filename, "r+b") as file:
+                    file.seek(offset)
+                    for chunk in response.stream(1024 * 1024, decode_content=False):
+                        file.write(chunk)
+            finally:
+                response.close()
+                response.release_conn()
+
+        offsets = list(range(0, size, self.part_size))
+        if len(offsets) > 1:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                list(executor.map(fetch, offsets))
+        elif offsets:
+            fetch(0)
+
+        metadata = stat.metadata or {}
+        if metadata.get("Content-Encoding", metadata.get("content-encoding")) == "gzip":
+            with gzip.open(part_filename, "rb") as source, \
+                    open(filename, "wb") as target:
+                shutil.copyfileobj(source, target, self.part_size)
+            os.remove(part_filename)
+        else:
+            os.replace(part_filename, filename)
+        return size
+
+    def download_prefix(self, prefix: str, directory: str) -> List[str]:
+        """
+        Downloads all objects under the prefix into the directory (keeping
+        their relative paths) at the same time, returns the local filenames.
+        """
+        names = [obj.object_name for obj in self.minio.list_objects(
+            self.bucket, prefix=prefix, recursive=True)]
+        filenames = [os.path.join(directory, *name[len(prefix):].lstrip("/").split("/"))
+                     for name in names]
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            list(executor.map(self.download_file, names, filenames))
+        print(f"Downloaded {len(names)} objects from MinIO {self.bucket}/{prefix}.")
+        return filenames
@@ -20,8 +20,8 @@
 # it into the design
 
 
-from .dataset import CORPUS_DATA, CORPUS_SCHEMA
-from .query import Client
+from .dataset import CORPUS_DATA, CORPUS_INDEX, CORPUS_SCHEMA, TYPED_CORPUS, get_typed_model
+from .query import connect
 from .designer import Designer
 import json
 import os
@@ -58,7 +58,8 @@ def validate_corpus_data(check_type='corpus'):
               for cls in CORPUS_SCHEMA.keys()}
     ids = set()
 
-    for model in CORPUS_DATA:
+    for typed in TYPED_CORPUS:
+        model = typed.data
         if check_type == "corpus":
             if model["id"] in ids:
                 print("ERROR: Multiple models with the same id {}".format(model["id"]))
@@ -102,14 +103,11 @@ def validate_corpus_data(check_type='corpus'):
                         prop_name, model["model"], model["class"]))
                 # assert prop_name in model["properties"], "property {} is missing in {}".format(
                 #    prop_name, model["model"])
+                elif prop_name in typed.invalid:
+                    print("ERROR: Property {} of {} ({}) is not a valid {}".format(
+                        prop_name, model["model"], model["class"], prop_type))
                 else:
-                    prop_val = model["properties"][prop_name]
-                    if prop_type == "float":
-                        float(prop_val)
-                    elif prop_type == "int":
-                        int(prop_val)
-                    else:
-                        assert prop_type == "str"
+                    assert prop_type in ["float", "int", "str"]
 
         # See if corpus data model has any properties not defined in the schema
         if check_type == "schema":
@@ -128,26 +126,22 @@ def validate_corpus_data(check_type='corpus'):
 
                 assert param_type in ["float", "int", "str"]
 
-                for param_val in model["parameters"][param_name].values():
-                    if param_type == "float":
-                        float(param_val)
-                    elif param_type == "int":
-                        int(param_val)
+                if param_name in typed.invalid:
+                    print("ERROR: Parameter {} of {} ({}) has values that are not a valid {}".format(
+                        param_name, model["model"], model["class"], param_type))
+                    continue
 
                 if param_type in ["float", "int"]:
-                    minimum = float(model["parameters"][param_name].get(
-                        "minimum", "-inf"))
-                    maximum = float(model["parameters"][param_name].get(
-                        "maximum", "inf"))
+                    fields = typed.parameters[param_name]
+                    minimum = fields.get("minimum", float("-inf"))
+                    maximum = fields.get("maximum", float("inf"))
 
                     if minimum > maximum:
                         print("WARNING: Invalid minimum {} and maximum {} values of parameter {} in {} ({})".
                               format(minimum, maximum, param_name, model["model"], model["class"]))
 
-                    assigned = model["parameters"][param_name].get("assigned")
+                    assigned = fields.get("assigned")
                     if assigned is not None:
-                        assigned = float(assigned)
-
                         if assigned < minimum:
                             print("WARNING: Invalid assigned {} and minimum {} values of parameter {} in {} ({})".
                                   format(assigned, minimum, param_name, model["model"], model["class"]))
@@ -194,7 +188,7 @@ def validate_create_instances():
     the reloaded instance data matches what we expect. Do not assert, print
     out errors
     """
-    client = Client()
+    client = connect()
 
     print("Testing Tattu19AhLi")
     design_name = 'ValidationDesign'
@@ -308,8 +302,8 @@ def create_all_motors():
             num_motors += 1
 
             # Add a cylinder
-            cylinder_length = float(
-                model["properties"]["CAN_DIAMETER"]) + length_pad
+            cylinder_length = get_typed_model(
+                model["model"]).get_property("CAN_DIAMETER") + length_pad
             cylinder_name = "cyl_" + designer.generate_name()
             cyl_instance = designer.add_cylinder(
                 name=cylinder_name,
@@ -374,16 +368,17 @@ def create_all_propellers():
     # Also, create a list of unique propeller shaft diameters.
     # Note: in the current (05/2022) UAM corpus, all propellers use the same
     # shaft size, but there are 11 different motor shaft sizes
-    diff_shaft_motors = []
-    unique_motors = []
-    diff_shaft_props = []
-    for model in CORPUS_DATA:
-        if model["class"] == "Motor" and not diff_shaft_motors.count(model["properties"]["SHAFT_DIAMETER"]):
-            diff_shaft_motors.append(model["properties"]["SHAFT_DIAMETER"])
-            unique_motors.append(model)
-
-        if model["class"] == "Propeller" and not diff_shaft_props.count(model["properties"]["SHAFT_DIAMETER"]):
-            diff_shaft_props.append(model["properties"]["SHAFT_DIAMETER"])
+    motor_shafts = CORPUS_INDEX.property_index("Motor", "SHAFT_DIAMETER")
+    diff_shaft_motors = list(motor_shafts.keys())
+    unique_motors = [models[0] for models in motor_shafts.values()]
+    diff_shaft_props = list(CORPUS_INDEX.property_index(
+        "Propeller", "SHAFT_DIAMETER").keys())
+
+    # Motors keyed by the numeric shaft diameter to match propellers
+    shaft_motors = dict()
+    for motor in unique_motors:
+        shaft_motors.setdefault(get_typed_model(
+            motor["model"]).get_property("SHAFT_DIAMETER"), motor)
 
     # For debugging
     # print(diff_shaft_motors)
@@ -420,59 +415,59 @@ def create_all_propellers():
     length_pad = 0.2
 
     current_designer = 0
-    for model in CORPUS_DATA:
-        if model["class"] == "Propeller":
-            num_props += 1
-            print("Designer Name: %s" %
-                  designer_names[current_designer].design)
-
-            # Select motor to use for design creation
-            # that matches propeller shaft diameter
-            for motor in unique_motors:
-                if float(motor["properties"]["SHAFT_DIAMETER"]) == float(model["properties"]["SHAFT_DIAMETER"]):
-                    #print("found motor")
-                    motor_model = motor["properties"]["MODEL"]
-                    motor_can_diameter = float(
-                        motor["properties"]["CAN_DIAMETER"])
-                    break
-
-            # Add a cylinder
-            cylinder_length = motor_can_diameter + length_pad
-            cylinder_name = "cyl_" + \
-                designer_names[current_designer].get_name()
-            cyl_instance = designer_names[current_designer].add_cylinder(
-                name=cylinder_name,
-                port_thickness=cylinder_thickness,
-                diameter=cylinder_diameter,
-                length=cylinder_length)
-            designer_names[current_designer].connect(previous[current_designer], "REAR_CONNECTOR",
-                                                     cyl_instance, "FRONT_CONNECTOR")
-            previous[current_designer] = cyl_instance
-
-            # Add motor
-            motor_name = "motor_" + designer_names[current_designer].get_name()
-            motor_instance = designer_names[current_designer].add_motor(
-                name=motor_name,
-                model=motor_model
-            )
-            designer_names[current_designer].connect(cyl_instance, "TOP_CONNECTOR",
-                                                     motor_instance, "Base_Connector")
-
-            # Add propeller
-            propeller_name = "prop_" + \
-                designer_names[current_designer].get_name()
-            propeller_instance = designer_names[current_designer].add_propeller(
-                name=propeller_name,
-                model=model["properties"]["MODEL"],
-                prop_type=int(model["parameters"]["Prop_type"]["assigned"]),
-                direction=int(model["parameters"]["Direction"]["assigned"])
-            )
-            designer_names[current_designer].connect(motor_instance, "Prop_Connector",
-                                                     propeller_instance, "MOTOR_CONNECTOR_CS_IN")
-
-            current_designer += 1
-            if current_designer == num_designs:
-                current_designer = 0
+    for model in CORPUS_INDEX.get_class("Propeller"):
+        num_props += 1
+        print("Designer Name: %s" %
+              designer_names[current_designer].design)
+
+        # Select motor to use for design creation
+        # that matches propeller shaft diameter
+        motor = shaft_motors.get(get_typed_model(
+            model["model"]).get_property("SHAFT_DIAMETER"))
+        if motor is not None:
+            #print("found motor")
+            motor_model = motor["properties"]["MODEL"]
+            motor_can_diameter = get_typed_model(
+                motor["model"]).get_property("CAN_DIAMETER")
+
+        # Add a cylinder
+        cylinder_length = motor_can_diameter + length_pad
+        cylinder_name = "cyl_" + \
+            designer_names[current_designer].get_name()
+        cyl_instance = designer_names[current_designer].add_cylinder(
+            name=cylinder_name,
+            port_thickness=cylinder_thickness,
+            diameter=cylinder_diameter,
+            length=cylinder_length)
+        designer_names[current_designer].connect(previous[current_designer], "REAR_CONNECTOR",
+                                                 cyl_instance, "FRONT_CONNECTOR")
+        previous[current_designer] = cyl_instance
+
+        # Add motor
+        motor_name = "motor_" + designer_names[current_designer].get_name()
+        motor_instance = designer_names[current_designer].add_motor(
+            name=motor_name,
+            model=motor_model
+        )
+        designer_names[current_designer].connect(cyl_instance, "TOP_CONNECTOR",
+                                                 motor_instance, "Base_Connector")
+
+        # Add propeller
+        typed_prop = get_typed_model(model["model"])
+        propeller_name = "prop_" + \
+            designer_names[current_designer].get_name()
+        propeller_instance = designer_names[current_designer].add_propeller(
+            name=propeller_name,
+            model=model["properties"]["MODEL"],
+            prop_type=typed_prop.get_parameter("Prop_type"),
+            direction=typed_prop.get_parameter("Direction")
+        )
+        designer_names[current_designer].connect(motor_instance, "Prop_Connector",
+                                                 propeller_instance, "MOTOR_CONNECTOR_CS_IN")
+
+        current_designer += 1
+        if current_designer == num_designs:
+            current_designer = 0
 
     print("Number of Propellers: %d" % num_props)
     for x in range(num_designs):
@@ -24,12 +24,14 @@
 
 
 from email import header
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional
+from concurrent.futures import Future, ThreadPoolExecutor
 import time
 from . import CONFIG
 import sys
 import os
 import json
+import hashlib
 import zipfile
 import requests
 import yaml
@@ -40,13 +42,114 @@ from minio import Minio
 from api4jenkins import Jenkins
 from api4jenkins.exceptions import ItemNotFoundError
 from .dataset import get_component_min_max
-from .query import Client
+from .query import connect
+from .tracing import current_span, span, traced
+from .transfer import MinioTransfer
 
 
 # class JobFailedError(Exception):
 #    """Error to be raised when a job fails."""
 
 
+def download_file(session: requests.Session, url: str, filename: str,
+                  md5: Optional[str] = None, part_filename: Optional[str] = None,
+                  chunk_size: int = 1 << 20, retries: int = 3) -> int:
+    """
+    Download the url into filename in chunks without holding it in memory.
+    The data is written into filename.part first, an interrupted download is
+    resumed with an HTTP Range request (on a later retry or call). When the
+    md5 hash is given, it is verified before the file is renamed in place.
+    Returns the size of the file.
+    """
+    if part_filename is None:
+        part_filename = filename + ".part"
+    for attempt in range(retries + 1):
+        offset = os.path.getsize(part_filename) if os.path.exists(part_filename) else 0
+        headers = {"Range": "bytes=%d-" % offset} if offset else {}
+        try:
+            with session.get(url, headers=headers, stream=True, timeout=60) as response:
+                if response.status_code == 416:
+                    # the part file is already complete
+                    pass
+                elif response.status_code == 206:
+                    with open(part_filename, "ab") as file:
+                        for chunk in response.iter_content(chunk_size):
+                            file.write(chunk)
+                elif response.status_code == 200:
+                    with open(part_filename, "wb") as file:
+                        for chunk in response.iter_content(chunk_size):
+                            file.write(chunk)
+                else:
+                    raise FileNotFoundError(
+                        "Download of %s failed with status %d" % (url, response.status_code))
+            break
+        except (requests.ConnectionError, requests.Timeout,
+                requests.exceptions.ChunkedEncodingError) as error:
+            if attempt == retries:
+                raise
+            print("Download of %s interrupted (%s), resuming" % (url, error))
+
+    if md5 is not None:
+        digest = hashlib.md5()
+        with open(part_filename, "rb") as file:
+            for chunk in iter(lambda: file.read(chunk_size), b""):
+                digest.update(chunk)
+        if digest.hexdigest() != md5:
+            os.remove(part_filename)
+            raise ValueError("Checksum of %s does not match, download removed" % url)
+
+    os.replace(part_filename, filename)
+    return os.path.getsize(filename)
+
+
+class AdaptivePoller:
+    """
+    Polling intervals that start short and grow exponentially up to maximum.
+    When the expected duration (e.g. of earlier builds of the same job) is 
+    known, half of the remaining expected time is waited at once, but never
+    more than maximum, so builds expected to take longer than twice the
+    maximum are polled every maximum seconds until they get close to their
+    expected end. The intervals start short again when the expected end is
+    reached.
+
+    Example usage:
+        poller = AdaptivePoller(expected=120.0)
+        while not done():
+            poller.sleep()
+    """
+
+    def __init__(self, expected: Optional[float] = None, initial: float = 0.5,
+                 factor: float = 1.5, maximum: float = 30.0):
+        self.expected = expected
+        self.initial = initial
+        self.factor = factor
+        self.maximum = maximum
+        self.interval = initial
+        self.start = time.monotonic()
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.start
+
+    def next_interval(self, elapsed: float) -> float:
+        interval = self.interval
+        self.interval = min(self.interval * self.factor, self.maximum)
+
+        if self.expected is not None:
+            remaining = self.expected - elapsed
+            if remaining > 0:
+                interval = max(interval, remaining / 2.0)
+            else:
+                # restart the backoff once after the expected end
+                self.expected = None
+                interval = self.initial
+                self.interval = min(self.initial * self.factor, self.maximum)
+
+        return min(interval, self.maximum)
+
+    def sleep(self):
+        time.sleep(self.next_interval(self.elapsed()))
+
+
 class JenkinsClient:
     """The client to the symbench athens server.
     Parameters
@@ -111,10 +214,19 @@ class JenkinsClient:
         if not found:
             print(f"Creating MinIO bucket {self.minio_bucket}")
             self.minio.make_bucket(self.minio_bucket)
+        self.transfer = MinioTransfer(self.minio, self.minio_bucket)
 
         #print("Server Address: %s" % self.jenkins_url)
         self.server = Jenkins(
             self.jenkins_url, auth=(username, password))
+
+        # pooled connections for artifact downloads, shared by the threads
+        # of concurrent builds
+        self.session = requests.Session()
+        self.session.auth = (username, password)
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=16)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
         print("User with username %s successfully logged in" % username)
 
         self.results_dir = os.path.join(os.path.dirname(__file__), 'results')
@@ -125,7 +237,7 @@ class JenkinsClient:
     def open_query_client(self):
         """Open a query client (gremlin) to grab the graph design information"""
         assert self.client is None
-        self.client = Client()
+        self.client = connect()
 
     def close_query_client(self):
         """Close a query client (gremlin) to grab the graph design information"""
@@ -137,6 +249,7 @@ class JenkinsClient:
         if self.server:
             sys.stderr.write("Deleted connection\n")
             self.server = None
+            self.session.close()
 
         if self.client:
             assert self.client is not None
@@ -190,15 +303,63 @@ class JenkinsClient:
 
         return not all(node.offline for node in executor_nodes)
 
+    def online_executors(self):
+        """
+        Return the number of worker nodes that are connected
+        """
+        computers = self.server.nodes.api_json(
+            tree="computer[displayName,offline]")["computer"]
+        return sum(1 for node in computers
+                   if node["displayName"] not in ("(master)", "(built-in)")
+                   and not node["offline"])
+
+    @traced("minio upload")
     def studyfile_to_minio(self, study_filename):
         """
         Copy the study CSV file to the Minio bucket setup by the default CONFIG
-        or `--miniobucket` option on the command line
+        or `--miniobucket` option on the command line, unless the bucket 
+        already has the same file. Large files are uploaded in parallel parts.
+        """
+        self.transfer.upload_file(study_filename, study_filename)
+
+    @traced("minio download")
+    def results_from_minio(self, prefix: str, directory: Optional[str] = None):
+        """
+        Download all objects with the given prefix from the Minio bucket into
+        the results directory (or the given directory) concurrently
         """
-        result = self.minio.fput_object(self.minio_bucket, study_filename, study_filename)
-        print(f"Uploaded to MinIO {self.minio_bucket}/{study_filename}.")
+        if directory is None:
+            directory = self.results_dir
+        return self.transfer.download_prefix(prefix, directory)
 
-    def build_and_wait(self, job_name, parameters):
+    def expected_duration(self, job, samples: int = 10) -> Optional[float]:
+        """
+        Return the median duration in seconds of the last successful builds
+        of the job, or None if there are none.
+        """
+        try:
+            builds = job.api_json(
+                tree="builds[duration,result]{0,%d}" % samples)["builds"]
+        except Exception:
+            return None
+        durations = sorted(build["duration"] / 1000.0 for build in builds
+                           if build.get("result") == "SUCCESS" and build.get("duration"))
+        if not durations:
+            return None
+        return durations[len(durations) // 2]
+
+    def print_console(self, build, start: int, prefix: str = "") -> int:
+        """
+        Print the console log of the build from the given offset using the
+        progressive text API, returns the offset of the next new text.
+        """
+        response = build.handle_req(
+            "GET", "logText/progressiveText", params={"start": start})
+        for line in response.text.splitlines():
+            print(prefix + line)
+        return int(response.headers.get("X-Text-Size", start))
+
+    def build_and_wait(self, job_name, parameters, stream_console=True):
         """
         Build a job and wait
         Parameters
@@ -207,7 +368,13 @@ class JenkinsClient:
             Name of the job
         parameters: dict
             Parameters for this build
+        stream_console: bool, default=True
+            If true, print the console log of the build as it is written
         """
+        with span("jenkins build", job=job_name) as build_span:
+            return self.run_build_and_wait(job_name, parameters, stream_console, build_span)
+
+    def run_build_and_wait(self, job_name, parameters, stream_console, build_span):
         job = self.server.get_job(job_name)
         if job is None:
             raise ItemNotFoundError(
@@ -215,23 +382,39 @@ class JenkinsClient:
 
         # job.url is respose location, we need to override it
         job.url = self.jenkins_url + "/job/" + job_name + "/"
+        expected = self.expected_duration(job)
         item = job.build(**parameters)
         print("Job %s is waiting to be built" % job_name)
 
-        while not item.get_build():
-            time.sleep(1)
+        with span("jenkins queue", job=job_name):
+            poller = AdaptivePoller(maximum=5.0)
+            while not item.get_build():
+                poller.sleep()
 
         print("Job %s is built" % job_name)
 
         build = item.get_build()
         print("Job %s is running. The build number is %d." %
               (job_name, build.number))
+        build_span.set("build", build.number)
         print("\nThe build parameters are %s" % parameters)
+        if expected is not None:
+            print("Earlier builds of job %s took %.0f seconds" % (job_name, expected))
+
+        poller = AdaptivePoller(expected=expected)
+        prefix = "[%s #%d] " % (job_name, build.number)
+        console_start = 0
         while not build.result:
-            time.sleep(5)
-            print("Still running the job %s" % job_name)
+            poller.sleep()
+            if stream_console:
+                console_start = self.print_console(build, console_start, prefix)
+            else:
+                print("Still running the job %s" % job_name)
+        if stream_console:
+            self.print_console(build, console_start, prefix)
         print("Job %s is finished. The result is %s" %
               (job_name, build.result))
+        build_span.set("result", build.result)
         if build.result != "SUCCESS":
             # For now, just mark the failure and go on
             # raise JobFailedError(
@@ -240,30 +423,61 @@ class JenkinsClient:
             print("Job %s FAILED, no data available" % job_name)
         return build
 
+    @traced("wait for artifacts")
+    def wait_for_artifacts(self, build, timeout: float = 60.0,
+                           failed_timeout: float = 10.0) -> bool:
+        """
+        Wait until the artifacts of a finished build are available (also 
+        for unstable or failed builds, which may have partial results),
+        returns False if there are none within the timeout. Builds that
+        did not succeed often have none, they are waited for at most
+        failed_timeout seconds.
+        """
+        if build.result != "SUCCESS":
+            timeout = min(timeout, failed_timeout)
+        poller = AdaptivePoller(initial=0.25, maximum=5.0)
+        while True:
+            if build.api_json(tree="artifacts[relativePath]")["artifacts"]:
+                return True
+            if poller.elapsed() >= timeout:
+                print("No artifacts available for build %d" % build.number)
+                return False
+            poller.sleep()
+
+    @traced("download artifacts")
     def save_results_from_build(self, build, design_name: str):
         """
         Get results from a particular build as a data.zip and save in 
-        results directory        
+        results directory. The artifact is streamed to disk and resumed if
+        the download is interrupted. Its md5 hash is verified when Jenkins
+        has a fingerprint of it, otherwise the zip file is checked.
         """
         retrieved_artifact = False
         if os.path.isdir(self.results_dir):
-            build_artifacts = build.api_json()["artifacts"]
+            build_json = build.api_json(
+                tree="artifacts[relativePath],fingerprint[fileName,hash]")
+            build_artifacts = build_json["artifacts"]
             if len(build_artifacts):
-                artifact_url = f'{build.url}artifact/{build_artifacts[0]["relativePath"]}'
-                response = requests.get(
-                    artifact_url,
-                    auth=(CONFIG["jenkinsuser"], CONFIG["jenkinspwd"]),
-                )
-                if response.status_code != 200:
-                    raise FileNotFoundError
-                else:
-                    print("Build artifacts retrieved")
-                    artifacts_content = response.content
-                    filename = f"{self.results_dir}\\{design_name}_data.zip"
-                    print(filename)
-                    with open(filename, "wb") as zip_artifact:
-                        zip_artifact.write(artifacts_content)
-                    retrieved_artifact = True
+                relative_path = build_artifacts[0]["relativePath"]
+                artifact_url = f'{build.url}artifact/{relative_path}'
+                md5 = None
+                for fingerprint in build_json.get("fingerprint") or []:
+                    if fingerprint.get("fileName") == os.path.basename(relative_path):
+                        md5 = fingerprint.get("hash")
+
+                filename = os.path.join(
+                    self.results_dir, f"{design_name}_data.zip")
+                # only resume downloads of the same build
+                part_filename = f"{filename}.{build.number}.part"
+                size = download_file(
+                    self.session, artifact_url, filename, md5, part_filename)
+                if md5 is None and zipfile.is_zipfile(filename):
+                    with zipfile.ZipFile(filename) as zip_file:
+                        if zip_file.testzip() is not None:
+                            raise ValueError("Corrupt build artifact %s" % filename)
+                print("Build artifacts retrieved (%d bytes)" % size)
+                print(filename)
+                retrieved_artifact = True
             else:
                 print("No artifacts retrieved")
         else:
@@ -271,6 +485,17 @@ class JenkinsClient:
 
         return retrieved_artifact
 
+    def save_results_from_builds(self, builds: List[Any], design_names: List[str],
+                                 max_downloads: int = 4) -> List[bool]:
+        """
+        Get the results of several builds at the same time, see 
+        save_results_from_build.
+        """
+        with ThreadPoolExecutor(max_workers=max_downloads) as executor:
+            return list(executor.map(
+                self.save_results_from_build, builds, design_names))
+
+    @traced("add design json")
     def add_design_json_to_results(self, design_name: str, design_json):
         """
         Add design json file to the results data.zip file for the specified 
@@ -328,6 +553,76 @@ class JenkinsClient:
             print("Design Result file (%s) not found" % design_zip_file)
 
 
+class BuildOrchestrator:
+    """
+    Runs several Jenkins builds at the same time, each tracked by a worker
+    thread running build_and_wait. The number of builds in flight is limited
+    to max_builds, by default the number of online executor nodes. The 
+    on_finished callback of a build (e.g. downloading its artifacts) runs 
+    in the worker thread as soon as that build is finished.
+
+    Example usage:
+        with BuildOrchestrator(jenkins_client) as orchestrator:
+            for params in studies:
+                orchestrator.submit("uam_direct2cad", params, on_finished)
+            builds = orchestrator.wait()
+    """
+
+    def __init__(self, jenkins_client: JenkinsClient, max_builds: Optional[int] = None):
+        self.jenkins_client = jenkins_client
+        if max_builds is None:
+            max_builds = jenkins_client.online_executors()
+        self.max_builds = max(1, max_builds)
+        self.executor = ThreadPoolExecutor(max_workers=self.max_builds)
+        self.futures = []
+        print("Running at most %d builds at the same time" % self.max_builds)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+    def submit(self, job_name: str, parameters: Dict[str, Any],
+               on_finished: Optional[Callable[[Any], Any]] = None) -> Future:
+        """
+        Queues a build, returns a future of the on_finished result (or of 
+        the build when on_finished is not given).
+        """
+        parent = current_span()
+
+        def run_build():
+            with span("orchestrated build", parent=parent, job=job_name):
+                # the console logs of concurrent builds would be interleaved
+                build = self.jenkins_client.build_and_wait(
+                    job_name, parameters, stream_console=False)
+                if on_finished is not None:
+                    return on_finished(build)
+                return build
+
+        future = self.executor.submit(run_build)
+        self.futures.append(future)
+        return future
+
+    def wait(self) -> List[Any]:
+        """
+        Waits for all submitted builds and returns their results in the
+        order of submission. Failed builds are reported and give None.
+        """
+        results = []
+        for future in self.futures:
+            try:
+                results.append(future.result())
+            except Exception as error:
+                print("Build FAILED with error: %s" % error)
+                results.append(None)
+        self.futures = []
+        return results
+
+
 def run(args=None):
     import argparse
 
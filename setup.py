@@ -23,7 +23,7 @@ setup(
     license='GPL 3',
     description="Sciprts to access the Athens graph database",
     long_description=open('README.md').read(),
-    python_requires='>3.6',
+    python_requires='>=3.7',
     # do not list standard packages
     install_requires=[
         "gremlinpython<=3.5",
@@ -31,6 +31,7 @@ setup(
         "creopyson",
         "pyyaml",
         "pydantic",
+        "numpy",
         "minio",
         "gql[all]",
         "python-dotenv",